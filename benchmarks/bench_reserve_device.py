@@ -0,0 +1,300 @@
+"""Measures how the device farm scales: a simulated fleet of N devices shared by M concurrent test workers
+
+Every worker loops over reserve -> hold the device -> release until the duration elapses, and the
+harness reports reservations/sec, p50/p99 reservation latency and the number of double bookings,
+i.e. a device handed to a worker while another worker still held it. A worker dying on an
+unexpected error fails the run, as the stats of the survivors would be misleading.
+
+Ex: python benchmarks/bench_reserve_device.py --mongo mongod --connection_string mongodb://localhost:27017/uaf_bench --devices 40 --workers 40
+Ex: python benchmarks/bench_reserve_device.py --mongo mongomock --via celery --devices 10 --workers 20
+
+    --mongo mongod      uses the database behind --connection_string, its device farm collections are wiped
+    --mongo mongomock   uses an in-memory mongomock database (pip install mongomock), handy on machines without
+                        mongod but its locking differs from a real server, so use mongod for double booking checks
+    --via direct        calls the tasks in the worker threads, like DeviceFarmClient in direct mode
+    --via celery        sends the tasks through an in-memory broker to an in-process celery worker
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+from unittest.mock import patch
+
+from uaf.device_farming import device_tasks
+from uaf.enums.device_status import DeviceStatus
+from uaf.enums.mobile_os import MobileOs
+from uaf.utilities.database.mongo_utils import MongoUtility
+
+
+def connect(mongo: str, connection_string: str, pool_size: int) -> MongoUtility:
+    """Connects the benchmark database and points the device farm tasks at it
+
+    Args:
+        mongo (str): mongod or mongomock
+        connection_string (str): connection string of the benchmark database
+        pool_size (int): connection pool size
+
+    Returns:
+        MongoUtility: connected mongo utility
+    """
+    mongo_client = MongoUtility(connection_string, pool_size=pool_size, shared=True)
+    if mongo == "mongomock":
+        import mongomock
+
+        with patch(
+            "uaf.utilities.database.mongo_utils.MongoClient", mongomock.MongoClient
+        ):
+            mongo_client.connect()
+    else:
+        mongo_client.connect()
+    device_tasks.mongo_client = mongo_client
+    return mongo_client
+
+
+def seed_fleet(mongo_client: MongoUtility, devices: int):
+    """Empties the device farm collections and fills device_stats with a fleet of available devices
+
+    Args:
+        mongo_client (MongoUtility): mongo utility pointing at the benchmark database
+        devices (int): number of fake devices to create
+    """
+    stat_collection = device_tasks.config.get_value("mongodb", "device_stat_collection")
+    session_collection = device_tasks.config.get_value(
+        "mongodb", "device_session_collection"
+    )
+    mongo_client.delete_many(stat_collection, {})
+    mongo_client.delete_many(session_collection, {})
+    mongo_client.delete_many(
+        device_tasks.config.get_value(
+            "mongodb", "device_queue_collection", "device_reservation_queue"
+        ),
+        {},
+    )
+    device_tasks.ensure_device_farm_indexes()
+    mongo_client.insert_many(
+        stat_collection,
+        [
+            {
+                "device_id": f"bench-device-{x}",
+                "device_os": MobileOs.ANDROID.value,
+                "status": DeviceStatus.AVAILABLE.value,
+            }
+            for x in range(devices)
+        ],
+    )
+
+
+def start_celery_worker(stack: ExitStack, workers: int):
+    """Runs an in-process celery worker consuming an in-memory broker
+
+    Args:
+        stack (ExitStack): stops the worker on exit
+        workers (int): worker threads, one per concurrent test worker so releases are never starved
+    """
+    from celery.contrib.testing.worker import start_worker
+
+    device_tasks.app.conf.update(
+        broker_url="memory://",
+        result_backend="cache+memory://",
+        broker_transport_options={"polling_interval": 0.01},
+        worker_concurrency=workers,
+    )
+    stack.enter_context(
+        start_worker(
+            device_tasks.app,
+            pool="threads",
+            concurrency=workers,
+            perform_ping_check=False,
+            loglevel="ERROR",
+        )
+    )
+
+
+def percentile(samples: list[float], percent: int) -> float:
+    """Computes a percentile of the latency samples
+
+    Args:
+        samples (list[float]): latency samples
+        percent (int): percentile, 1 to 99
+
+    Returns:
+        float: percentile value, 0 if there are less than 2 samples
+    """
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100)[percent - 1]
+
+
+def run(
+    mongo: str,
+    via: str,
+    connection_string: str,
+    devices: int,
+    workers: int,
+    duration: float,
+    hold: float,
+    max_wait: float,
+):
+    """Runs reserve/hold/release cycles from concurrent workers and prints the results
+
+    Args:
+        mongo (str): mongod or mongomock
+        via (str): direct or celery
+        connection_string (str): connection string of the benchmark database
+        devices (int): number of fake devices in the fleet
+        workers (int): number of concurrent test workers
+        duration (float): benchmark duration in seconds
+        hold (float): seconds a worker keeps a device before releasing it
+        max_wait (float): seconds a worker queues for a device before giving up
+    """
+    stack = ExitStack()
+    mongo_client = connect(mongo, connection_string, pool_size=workers * 2)
+    stack.callback(mongo_client.disconnect)
+    seed_fleet(mongo_client, devices)
+    stat_collection = device_tasks.config.get_value("mongodb", "device_stat_collection")
+    if via == "celery":
+        start_celery_worker(stack, workers)
+    # bind the tasks before the worker threads use them concurrently
+    device_tasks.finalize_tasks()
+
+    def reserve() -> tuple[str, str]:
+        if via == "celery":
+            return device_tasks.reserve_device.delay(
+                MobileOs.ANDROID.value, max_wait_seconds=max_wait
+            ).get(timeout=max_wait + 30)
+        return device_tasks.reserve_device.run(
+            MobileOs.ANDROID.value, max_wait_seconds=max_wait
+        )
+
+    def release(device_id: str, session_id: str):
+        if via == "celery":
+            device_tasks.release_device.delay(device_id, session_id).get(timeout=30)
+        else:
+            device_tasks.release_device.run(device_id, session_id)
+        # recycle straight away instead of waiting for the check_device beat task
+        mongo_client.update_one(
+            stat_collection,
+            {"device_id": device_id, "session_id": str(session_id)},
+            {"$set": {"status": DeviceStatus.AVAILABLE.value}},
+        )
+        # as check_device does once it recycled devices
+        device_tasks.device_availability.notify()
+
+    holders: dict[str, int] = {}
+    latencies: list[float] = []
+    lock = threading.Lock()
+    counters: Counter[str] = Counter()
+    failures: dict[int, str] = {}
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id: int):
+        try:
+            cycle(worker_id)
+        except Exception:
+            with lock:
+                failures[worker_id] = traceback.format_exc()
+
+    def cycle(worker_id: int):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                device_id, session_id = reserve()
+            except ValueError:
+                with lock:
+                    counters["unavailable"] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                counters["reserved"] += 1
+                if device_id in holders:
+                    counters["double_booked"] += 1
+                holders[device_id] = worker_id
+            time.sleep(hold)
+            with lock:
+                if holders.get(device_id) == worker_id:
+                    del holders[device_id]
+            release(device_id, session_id)
+
+    threads = [
+        threading.Thread(target=worker, args=(worker_id,))
+        for worker_id in range(workers)
+    ]
+    started = time.perf_counter()
+    with stack:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    print(
+        f"mongo={mongo} via={via} devices={devices} workers={workers} "
+        f"hold={hold}s duration={elapsed:.2f}s"
+    )
+    print(f"reservations/sec: {counters['reserved'] / elapsed:.1f}")
+    print(f"p50 latency: {percentile(latencies, 50) * 1000:.1f}ms")
+    print(f"p99 latency: {percentile(latencies, 99) * 1000:.1f}ms")
+    print(f"unavailable responses: {counters['unavailable']}")
+    print(f"double bookings: {counters['double_booked']}")
+    if mongo == "mongod":
+        print(f"connection pool: {mongo_client.pool_stats()}")
+    if failures:
+        for worker_id, error in sorted(failures.items()):
+            print(f"worker {worker_id} failed:\n{error}", file=sys.stderr)
+        raise SystemExit(f"{len(failures)} of {workers} workers failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the device farm")
+    parser.add_argument(
+        "--mongo",
+        choices=["mongod", "mongomock"],
+        default="mongod",
+        help="database to run against",
+    )
+    parser.add_argument(
+        "--via",
+        choices=["direct", "celery"],
+        default="direct",
+        help="call the tasks in process or through an in-memory celery broker",
+    )
+    parser.add_argument(
+        "--connection_string",
+        default="mongodb://localhost:27017/uaf_bench",
+        help="connection string of a scratch database, its device collections are wiped",
+    )
+    parser.add_argument("--devices", type=int, default=40, help="fleet size")
+    parser.add_argument(
+        "--workers", type=int, default=40, help="number of concurrent test workers"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="benchmark duration in seconds"
+    )
+    parser.add_argument(
+        "--hold",
+        type=float,
+        default=0.0,
+        help="seconds a worker keeps a device before releasing it",
+    )
+    parser.add_argument(
+        "--max_wait",
+        type=float,
+        default=0,
+        help="seconds a worker queues for a device, 0 counts it as unavailable right away",
+    )
+    args = parser.parse_args()
+    run(
+        args.mongo,
+        args.via,
+        args.connection_string,
+        args.devices,
+        args.workers,
+        args.duration,
+        args.hold,
+        args.max_wait,
+    )
@@ -0,0 +1,98 @@
+"""Compares message size and encode/decode latency of the device farm task payloads per serializer
+
+Payloads holding values a serializer cannot encode, ex: UUID and datetime with msgpack, are
+reported as unsupported for it.
+
+Ex: python benchmarks/bench_task_serialization.py --iterations 20000
+"""
+
+import argparse
+import time
+from datetime import datetime
+from typing import Any
+from uuid import uuid4
+
+from kombu.exceptions import EncodeError, SerializerNotInstalled
+from kombu.serialization import dumps, loads
+
+
+def sample_payloads() -> dict[str, Any]:
+    """Representative payloads of the device farm tasks, as sent on the wire
+
+    Returns:
+        dict[str, Any]: payload name => (args, kwargs) of a task or its result
+    """
+    session_id = uuid4()
+    return {
+        "reserve_device args": (
+            ["android"],
+            {
+                "capabilities": {"min_os_major_version": 13, "device_type": "physical"},
+                "max_wait_seconds": 300,
+                "ticket_id": str(uuid4()),
+                "requested_at": time.time(),
+                "preferred_app": "com.example.app",
+                "with_appium_url": True,
+            },
+        ),
+        "reserve_device result": ("R58M123ABC", session_id, "http://host-a:4723"),
+        "release_device args": (["R58M123ABC", session_id], {}),
+        "reap_expired_leases result": {"devices": 3, "sessions": 3},
+        "check_device result": {"matched": 12, "modified": 12, "at": datetime.utcnow()},
+    }
+
+
+def measure(serializer: str, payload: Any, iterations: int) -> tuple[int, float]:
+    """Measures one payload with one serializer
+
+    Args:
+        serializer (str): kombu serializer name
+        payload (Any): payload to serialize
+        iterations (int): number of encode/decode round trips
+
+    Returns:
+        tuple[int, float]: message size in bytes, microseconds per round trip
+    """
+    content_type, content_encoding, data = dumps(payload, serializer=serializer)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        content_type, content_encoding, data = dumps(payload, serializer=serializer)
+        loads(data, content_type, content_encoding, accept={content_type})
+    elapsed = time.perf_counter() - started
+    return len(data), elapsed / iterations * 1_000_000
+
+
+def run(serializers: list[str], iterations: int):
+    """Prints size and latency of every sample payload for every available serializer
+
+    Args:
+        serializers (list[str]): kombu serializer names
+        iterations (int): number of encode/decode round trips per measurement
+    """
+    print(f"{'payload':<28}{'serializer':<12}{'bytes':>8}{'us/round trip':>16}")
+    for name, payload in sample_payloads().items():
+        for serializer in serializers:
+            try:
+                size, latency = measure(serializer, payload, iterations)
+            except SerializerNotInstalled:
+                print(f"{name:<28}{serializer:<12}{'not installed':>24}")
+                continue
+            except EncodeError:
+                print(f"{name:<28}{serializer:<12}{'unsupported':>24}")
+                continue
+            print(f"{name:<28}{serializer:<12}{size:>8}{latency:>16.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark task serializers")
+    parser.add_argument(
+        "--serializers",
+        nargs="+",
+        default=["pickle", "json", "msgpack"],
+        help="kombu serializers to compare, msgpack requires the msgpack package",
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=10000, help="round trips per measurement"
+    )
+    args = parser.parse_args()
+    run(args.serializers, args.iterations)
@@ -1,22 +1,22 @@
 # global Celery options that apply to all configurations
 
 # Specify the serializer to use for task messages.
-# By default, Celery uses JSON, which is a lightweight and widely supported
-# format, but may not be suitable for all use cases. In this case, we use
-# the pickle serializer, which can handle more complex Python objects.
-task_serializer = "pickle"
+# The device farm tasks only exchange small payloads (an os name, capability filters,
+# a device id and a session UUID), so JSON is compact, fast and readable by non python
+# clients. kombu's JSON serializer round trips UUID, datetime and Decimal values as
+# typed objects, so reserve_device still hands back a real UUID.
+task_serializer = "json"
 # Specify the serializer to use for task results.
-# By default, Celery uses JSON to serialize task results, but this may not be
-# suitable for all use cases, as JSON has limitations when it comes to
-# serializing complex data structures and types. In this case, we use the
-# pickle serializer for consistency with the task serializer.
-result_serializer = "pickle"
+# Results use the same JSON serializer as the task messages.
+result_serializer = "json"
 # Specify the content types that the worker is willing to accept.
 # This is a security measure that helps protect against deserialization
 # attacks, which can occur when a malicious user sends a specially crafted
-# message to a worker. By default, Celery accepts a range of content types,
-# but we restrict it to the pickle serializer only to reduce the attack surface.
-accept_content = ["pickle"]
+# message to a worker. Unlike pickle, JSON cannot execute code while being
+# decoded, and everything else is rejected to reduce the attack surface.
+accept_content = ["json"]
+# Specify the content types accepted for task results, see accept_content.
+result_accept_content = ["json"]
 # Specify a list of modules to import when starting the worker.
 # This is necessary to ensure that the worker has access to the task functions
 # that it needs to execute. It's best practice to specify the full import path
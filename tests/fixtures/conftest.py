@@ -4,7 +4,9 @@ from typing import Any
 from uaf.decorators.loggers.logger import log
 from appium.webdriver.webdriver import WebDriver
 from tests.test_data.appium.capabilities import Capabilities
-from uaf.device_farming.device_tasks import release_device, reserve_device
+from uaf.device_farming.device_farm_client import DeviceFarmClient, DeviceReservation
+from uaf.device_farming.device_lease import LeaseHeartbeat
+from uaf.device_farming.device_tasks import lease_ttl_seconds
 from uaf.enums.appium_automation_name import AppiumAutomationName
 from uaf.enums.browser_make import MobileWebBrowserMake
 from uaf.enums.mobile_app_type import MobileAppType
@@ -19,6 +21,8 @@ from uaf.factories.driver.concrete_factory.concrete_factory import (
 )
 from uaf.utilities.ui.appium_core.appium_core_utils import CoreUtils
 
+device_farm_client = DeviceFarmClient()
+
 
 @pytest.hookimpl
 def pytest_addoption(parser):
@@ -148,7 +152,8 @@ def __build_mobile_capabilities(
     arg_auto_accept_alerts: bool = False,
     arg_auto_grant_permission: bool = False,
     arg_mobile_bundle_id: str | None = None,
-) -> tuple[dict[str, Any], str, str]:
+    arg_device_capabilities: dict[str, Any] | None = None,
+) -> tuple[dict[str, Any], DeviceReservation]:
     """
     Builds the mobile capabilities for the given app type and OS.
 
@@ -167,16 +172,22 @@ def __build_mobile_capabilities(
         arg_auto_accept_alerts (bool): Whether to auto-accept alerts (iOS-specific). Defaults to False.
         arg_auto_grant_permission (bool): Whether to auto-grant permissions (Android-specific). Defaults to False.
         arg_mobile_bundle_id (Optional[str]): The bundle ID for iOS apps. Defaults to None.
+        arg_device_capabilities (Optional[dict[str, Any]]): Capabilities the reserved device has to match. Defaults to None.
 
     Returns:
-        tuple[dict[str, Any], str, str]: The built capabilities dictionary, device ID, and session ID.
+        tuple[dict[str, Any], DeviceReservation]: The built capabilities dictionary and the device reservation.
     """
     caps = Capabilities.get_instance()
-    device_id, session_id = reserve_device.delay(arg_mobile_os.value).get(timeout=10)
+    # prefer devices which already have the app installed to skip the install
+    reservation = device_farm_client.reserve(
+        arg_mobile_os.value,
+        capabilities=arg_device_capabilities,
+        preferred_app=arg_mobile_app_package or arg_mobile_bundle_id,
+    )
     common_caps = {
         "platform_name": arg_mobile_os,
         "device_name": f"Test_AUTO_DEVICE_{arg_mobile_app_type.name}",
-        "device_id": device_id,
+        "device_id": reservation.device_id,
         "automation_name": arg_automation_name,
         "no_reset": arg_no_reset,
         "full_reset": arg_full_reset,
@@ -205,7 +216,7 @@ def __build_mobile_capabilities(
                         bundle_id=arg_mobile_bundle_id,
                         auto_accept_alerts=arg_auto_accept_alerts,
                     )
-            return caps.get_mobile_hybrid_app_capabilities(), device_id, session_id
+            return caps.get_mobile_hybrid_app_capabilities(), reservation
         case MobileAppType.NATIVE:
             match arg_mobile_os:
                 case MobileOs.ANDROID:
@@ -225,13 +236,13 @@ def __build_mobile_capabilities(
                         bundle_id=arg_mobile_bundle_id,
                         auto_accept_alerts=arg_auto_accept_alerts,
                     )
-            return caps.get_mobile_native_app_capabilities(), device_id, session_id
+            return caps.get_mobile_native_app_capabilities(), reservation
         case MobileAppType.WEB:
             caps.set_mobile_web_browser_capabilities(
                 **common_caps,
                 browser_name=arg_mobile_web_browser,
             )
-            return caps.get_mobile_web_browser_capabilities(), device_id, session_id
+            return caps.get_mobile_web_browser_capabilities(), reservation
         case _:
             raise ValueError("Invalid mobile app type!")
 
@@ -256,7 +267,7 @@ def mobile_driver(request: pytest.FixtureRequest):
             request.param.get("arg_mobile_app_status"),
         ),
     )
-    capabilities, device_id, session_id = __build_mobile_capabilities(
+    capabilities, reservation = __build_mobile_capabilities(
         arg_mobile_os=request.param.get("arg_mobile_os"),
         arg_mobile_app_type=request.param.get("arg_mobile_app_type"),
         arg_mobile_device_environment_type=request.param.get(
@@ -275,19 +286,39 @@ def mobile_driver(request: pytest.FixtureRequest):
         arg_auto_accept_alerts=request.param.get("arg_auto_accept_alerts"),
         arg_auto_grant_permission=request.param.get("arg_auto_grant_permission"),
         arg_mobile_bundle_id=request.param.get("arg_mobile_bundle_id"),
+        arg_device_capabilities=request.param.get("arg_device_capabilities"),
     )
-    capabilities = {k: v for k, v in capabilities.items() if v is not None}
-    data: tuple[WebDriver, int] = (ConcreteMobileDriverFactory()).get_mobile_driver(
-        os=request.param.get("arg_mobile_os"),
-        app_type=request.param.get("arg_mobile_app_type"),
-        execution_mode=ExecutionMode.LOCAL,
-        environment=Environments.DEVELOPMENT,
-        capabilities=capabilities,
+    heartbeat = LeaseHeartbeat(
+        lambda: device_farm_client.renew(reservation.device_id, reservation.session_id),
+        interval=lease_ttl_seconds() / 3,
     )
-    yield data[0]
-    data[0].quit()
-    CoreUtils.purge_appium_node(data[1])
-    release_device.delay(device_id, session_id).get(timeout=10)
+    heartbeat.start()
+    # the lease is given back even when the driver fails to start or to quit, otherwise the
+    # heartbeat would keep the device reserved for the rest of the pytest process
+    try:
+        capabilities = {k: v for k, v in capabilities.items() if v is not None}
+        data: tuple[WebDriver, int | None] = (
+            ConcreteMobileDriverFactory()
+        ).get_mobile_driver(
+            os=request.param.get("arg_mobile_os"),
+            app_type=request.param.get("arg_mobile_app_type"),
+            execution_mode=ExecutionMode.LOCAL,
+            environment=Environments.DEVELOPMENT,
+            capabilities=capabilities,
+            appium_url=reservation.appium_url,
+        )
+        try:
+            yield data[0]
+        finally:
+            try:
+                data[0].quit()
+            finally:
+                # appium servers of other hosts in the device farm are shared and keep running
+                if data[1] is not None:
+                    CoreUtils.purge_appium_node(data[1])
+    finally:
+        heartbeat.stop()
+        device_farm_client.release(reservation.device_id, reservation.session_id)
 
 
 @log
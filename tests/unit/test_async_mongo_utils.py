@@ -0,0 +1,178 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from pymongo import UpdateOne
+from pymongo.errors import ConnectionFailure, OperationFailure
+from pytest import fixture, mark, raises
+
+from uaf.utilities.database.async_mongo_utils import AsyncMongoUtility
+
+
+@fixture
+def mock_async_mongo_client():
+    with patch(
+        "uaf.utilities.database.async_mongo_utils.AsyncMongoClient"
+    ) as mock_client:
+        mock_client.return_value.close = AsyncMock()
+        yield mock_client
+
+
+@fixture
+def mock_collection(mock_async_mongo_client):
+    collection = MagicMock()
+    for method in (
+        "insert_one",
+        "insert_many",
+        "bulk_write",
+        "find_one",
+        "find_one_and_update",
+        "update_one",
+        "update_many",
+        "delete_one",
+        "delete_many",
+        "aggregate",
+    ):
+        setattr(collection, method, AsyncMock())
+    database = mock_async_mongo_client.return_value.get_default_database.return_value
+    database.__getitem__.return_value = collection
+    return collection
+
+
+@mark.unit_test
+def test_async_mongo_utility_connect(mock_async_mongo_client):
+    async def scenario():
+        async with AsyncMongoUtility("mongodb://localhost:27017/testdb") as mongo:
+            assert mongo.client is mock_async_mongo_client.return_value
+
+    asyncio.run(scenario())
+    mock_async_mongo_client.assert_called_once_with(
+        "mongodb://localhost:27017/testdb",
+        maxPoolSize=10,
+        uuidRepresentation="standard",
+    )
+    mock_async_mongo_client.return_value.close.assert_awaited_once()
+
+
+@mark.unit_test
+def test_async_mongo_utility_get_collection_without_database(mock_async_mongo_client):
+    mock_async_mongo_client.return_value.get_default_database.return_value = None
+
+    with raises(ConnectionFailure):
+        AsyncMongoUtility("mongodb://localhost:27017").get_collection("users")
+
+
+@mark.unit_test
+def test_async_mongo_utility_crud(mock_collection):
+    mongo = AsyncMongoUtility("mongodb://localhost:27017/testdb")
+    mock_collection.find_one.return_value = {"name": "John Doe"}
+
+    async def scenario():
+        await mongo.insert_one("users", {"name": "John Doe"})
+        await mongo.insert_many("users", [{"name": "Jane Doe"}])
+        document = await mongo.find_one("users", {"name": "John Doe"})
+        await mongo.update_one("users", {"name": "John Doe"}, {"$set": {"age": 3}})
+        await mongo.update_many("users", {}, [{"$set": {"seen": True}}])
+        await mongo.delete_one("users", {"name": "John Doe"})
+        await mongo.delete_many("users", {})
+        return document
+
+    assert asyncio.run(scenario()) == {"name": "John Doe"}
+    mock_collection.insert_one.assert_awaited_once_with({"name": "John Doe"})
+    mock_collection.insert_many.assert_awaited_once_with([{"name": "Jane Doe"}])
+    mock_collection.find_one.assert_awaited_once_with({"name": "John Doe"})
+    mock_collection.update_one.assert_awaited_once_with(
+        {"name": "John Doe"}, {"$set": {"age": 3}}
+    )
+    mock_collection.update_many.assert_awaited_once_with({}, [{"$set": {"seen": True}}])
+    mock_collection.delete_one.assert_awaited_once_with({"name": "John Doe"})
+    mock_collection.delete_many.assert_awaited_once_with({})
+
+
+@mark.unit_test
+def test_async_mongo_utility_find_many_and_aggregate(mock_collection):
+    mongo = AsyncMongoUtility("mongodb://localhost:27017/testdb")
+    mock_collection.find.return_value.to_list = AsyncMock(return_value=[{"a": 1}])
+    mock_collection.aggregate.return_value.to_list = AsyncMock(
+        return_value=[{"count": 1}]
+    )
+
+    async def scenario():
+        return await mongo.find_many("users", {"a": 1}, limit=5), await mongo.aggregate(
+            "users", [{"$count": "count"}]
+        )
+
+    assert asyncio.run(scenario()) == ([{"a": 1}], [{"count": 1}])
+    mock_collection.find.assert_called_once_with({"a": 1}, limit=5)
+    mock_collection.aggregate.assert_awaited_once_with([{"$count": "count"}])
+
+
+@mark.unit_test
+def test_async_mongo_utility_iter_many(mock_collection):
+    mongo = AsyncMongoUtility("mongodb://localhost:27017/testdb")
+    cursor = MagicMock()
+    cursor.__aenter__ = AsyncMock(return_value=cursor)
+    cursor.__aexit__ = AsyncMock(return_value=False)
+    cursor.__aiter__.return_value = [{"device_id": "a"}, {"device_id": "b"}]
+    mock_collection.find.return_value = cursor
+
+    async def scenario():
+        return [
+            document
+            async for document in mongo.iter_many(
+                "device_stats", {}, projection=["device_id"], batch_size=1
+            )
+        ]
+
+    assert asyncio.run(scenario()) == [{"device_id": "a"}, {"device_id": "b"}]
+    mock_collection.find.assert_called_once_with(
+        {}, sort=None, projection=["device_id"], batch_size=1
+    )
+    cursor.__aexit__.assert_awaited_once()
+
+
+@mark.unit_test
+def test_async_mongo_utility_concurrent_operations_share_one_client(
+    mock_async_mongo_client, mock_collection
+):
+    mongo = AsyncMongoUtility("mongodb://localhost:27017/testdb")
+
+    async def scenario():
+        await asyncio.gather(
+            *(mongo.insert_one("users", {"index": index}) for index in range(100))
+        )
+
+    asyncio.run(scenario())
+    mock_async_mongo_client.assert_called_once()
+    assert mock_collection.insert_one.await_count == 100
+
+
+@mark.unit_test
+def test_async_mongo_utility_upsert_many(mock_collection):
+    mongo = AsyncMongoUtility("mongodb://localhost:27017/testdb")
+
+    asyncio.run(
+        mongo.upsert_many(
+            "device_stats", [{"device_id": "x", "status": "available"}], ["device_id"]
+        )
+    )
+
+    mock_collection.bulk_write.assert_awaited_once_with(
+        [
+            UpdateOne(
+                {"device_id": "x"},
+                {"$set": {"device_id": "x", "status": "available"}},
+                upsert=True,
+            )
+        ],
+        ordered=False,
+    )
+    assert asyncio.run(mongo.bulk_write("device_stats", [])) is None
+
+
+@mark.unit_test
+def test_async_mongo_utility_operation_failure(mock_collection):
+    mongo = AsyncMongoUtility("mongodb://localhost:27017/testdb")
+    mock_collection.insert_one.side_effect = OperationFailure("duplicate key")
+
+    with raises(OperationFailure, match="Failed to insert document: duplicate key"):
+        asyncio.run(mongo.insert_one("users", {"name": "John Doe"}))
@@ -0,0 +1,119 @@
+from pytest import fixture, mark, raises
+from unittest.mock import MagicMock
+
+from uaf.device_farming.device_analytics import DeviceFarmAnalytics
+
+
+@fixture
+def mock_mongo_client():
+    return MagicMock()
+
+
+@mark.unit_test
+def test_session_stats_runs_on_server(mock_mongo_client):
+    mock_mongo_client.aggregate.return_value = [
+        {"device_id": "device1", "sessions": 4, "failure_rate": 0.25}
+    ]
+    analytics = DeviceFarmAnalytics(
+        mock_mongo_client, "sessions", "utilization", "devices"
+    )
+
+    assert analytics.session_stats(hours=12) == [
+        {"device_id": "device1", "sessions": 4, "failure_rate": 0.25}
+    ]
+    collection, pipeline = mock_mongo_client.aggregate.call_args.args
+    assert collection == "sessions"
+    assert list(pipeline[0]["$match"]) == ["end_time"]
+    assert pipeline[1]["$group"]["_id"] == "$device_id"
+    assert pipeline[2]["$project"]["device_id"] == "$_id"
+
+
+@mark.unit_test
+def test_utilization_per_os(mock_mongo_client):
+    analytics = DeviceFarmAnalytics(
+        mock_mongo_client, "sessions", "utilization", "devices"
+    )
+
+    analytics.utilization(group_by="device_os", hours=2)
+
+    collection, pipeline = mock_mongo_client.aggregate.call_args.args
+    # starts from every device so idle ones are listed and counted
+    assert collection == "devices"
+    lookup = pipeline[1]["$lookup"]
+    assert lookup["from"] == "utilization"
+    assert lookup["localField"] == lookup["foreignField"] == "device_id"
+    match = lookup["pipeline"][0]["$match"]["hour"]
+    assert (match["$lt"] - match["$gte"]).total_seconds() == 2 * 3600
+    group = pipeline[2]["$group"]
+    assert group["_id"] == "$device_os"
+    assert group["devices"] == {"$sum": 1}
+    assert group["idle_devices"] == {"$sum": {"$cond": [{"$eq": ["$usage", []]}, 1, 0]}}
+    assert pipeline[3]["$project"]["utilization"]["$divide"][1]["$multiply"] == [
+        "$devices",
+        2 * 3600,
+    ]
+
+
+@mark.unit_test
+def test_results_are_cached(mock_mongo_client):
+    mock_mongo_client.aggregate.return_value = []
+    analytics = DeviceFarmAnalytics(
+        mock_mongo_client, "sessions", "utilization", "devices"
+    )
+
+    analytics.session_stats()
+    analytics.session_stats()
+    assert mock_mongo_client.aggregate.call_count == 1
+
+    analytics.session_stats(group_by="device_os")
+    assert mock_mongo_client.aggregate.call_count == 2
+
+    analytics.clear_cache()
+    analytics.session_stats()
+    assert mock_mongo_client.aggregate.call_count == 3
+
+
+@mark.unit_test
+def test_cache_disabled(mock_mongo_client):
+    mock_mongo_client.aggregate.return_value = []
+    analytics = DeviceFarmAnalytics(
+        mock_mongo_client, "sessions", "utilization", "devices", cache_seconds=0
+    )
+
+    analytics.utilization()
+    analytics.utilization()
+
+    assert mock_mongo_client.aggregate.call_count == 2
+
+
+@mark.unit_test
+def test_report_merges_metrics(mock_mongo_client):
+    mock_mongo_client.aggregate.side_effect = [
+        [
+            {"device_id": "hot", "utilization": 0.9},
+            {"device_id": "idle", "utilization": 0.1},
+        ],
+        [
+            {"device_id": "idle", "sessions": 1, "failure_rate": 1.0},
+            {"device_id": "hot", "sessions": 9, "failure_rate": 0.0},
+        ],
+    ]
+    analytics = DeviceFarmAnalytics(
+        mock_mongo_client, "sessions", "utilization", "devices"
+    )
+
+    assert analytics.report() == [
+        {"device_id": "hot", "utilization": 0.9, "sessions": 9, "failure_rate": 0.0},
+        {"device_id": "idle", "utilization": 0.1, "sessions": 1, "failure_rate": 1.0},
+    ]
+
+
+@mark.unit_test
+def test_unsupported_group_by(mock_mongo_client):
+    analytics = DeviceFarmAnalytics(
+        mock_mongo_client, "sessions", "utilization", "devices"
+    )
+
+    with raises(ValueError, match="Unsupported group_by"):
+        analytics.session_stats(group_by="host")
+    mock_mongo_client.aggregate.assert_not_called()
@@ -0,0 +1,104 @@
+from pymongo import UpdateOne
+from pytest import mark, raises
+from unittest.mock import MagicMock, patch
+
+from uaf.device_farming.device_capabilities import (
+    build_capability_query,
+    fetch_device_attributes,
+    refresh_device_attributes,
+)
+from uaf.enums.mobile_device_environment_type import MobileDeviceEnvironmentType
+from uaf.enums.mobile_os import MobileOs
+from uaf.utilities.ui.appium_core.appium_core_utils import CoreUtils
+
+
+@mark.unit_test
+def test_build_capability_query():
+    assert build_capability_query(
+        {
+            "device_type": MobileDeviceEnvironmentType.EMULATOR,
+            "os_version": 14,
+            "min_os_major_version": "12",
+            "screen_size": "1080x2400",
+            "installed_app": "com.example.app",
+        }
+    ) == {
+        "device_type": MobileDeviceEnvironmentType.EMULATOR.value,
+        "os_version": "14",
+        "os_major_version": {"$gte": 12},
+        "screen_size": "1080x2400",
+        "installed_apps.package": "com.example.app",
+    }
+    assert build_capability_query(None) == {}
+
+
+@mark.unit_test
+def test_build_capability_query_unsupported():
+    with raises(ValueError, match="Unsupported device capability 'battery'"):
+        build_capability_query({"battery": 100})
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_capabilities.CoreUtils.execute_commands")
+def test_fetch_android_device_attributes(mock_execute_commands):
+    mock_execute_commands.side_effect = [
+        "13\n",
+        "Physical size: 1080x2400\nOverride size: 720x1600\n",
+        "package:com.example.app versionCode:42\npackage:com.android.chrome versionCode:7\n",
+    ]
+
+    assert fetch_device_attributes("R58M123", MobileOs.ANDROID) == {
+        "os_version": "13",
+        "screen_size": "1080x2400",
+        "installed_apps": [
+            {"package": "com.example.app", "version": "42"},
+            {"package": "com.android.chrome", "version": "7"},
+        ],
+        "os_major_version": 13,
+    }
+    assert mock_execute_commands.call_args_list[0].args[0][:3] == [
+        "adb",
+        "-s",
+        "R58M123",
+    ]
+
+
+@mark.unit_test
+@patch.object(CoreUtils, "fetch_ios_device_attributes", side_effect=OSError("gone"))
+def test_fetch_device_attributes_failure(mock_fetch):
+    assert fetch_device_attributes("00008030", MobileOs.IOS) == {}
+    mock_fetch.assert_called_once_with("00008030")
+
+
+@mark.unit_test
+def test_refresh_device_attributes():
+    mongo_client = MagicMock()
+    attributes = {
+        "R58M123": {"installed_apps": [{"package": "com.example.app"}]},
+        # could not be inspected, keeps its stale flag
+        "00008030": {},
+    }
+
+    refreshed = refresh_device_attributes(
+        mongo_client,
+        "device_stats",
+        [
+            {"device_id": "R58M123", "device_os": MobileOs.ANDROID.value},
+            {"device_id": "00008030", "device_os": MobileOs.IOS.value},
+        ],
+        fetch_attributes=lambda device_id, mobile_os: attributes[device_id],
+    )
+
+    assert refreshed == 1
+    mongo_client.bulk_write.assert_called_once_with(
+        "device_stats",
+        [
+            UpdateOne(
+                {"device_id": "R58M123"},
+                {
+                    "$set": {"installed_apps": [{"package": "com.example.app"}]},
+                    "$unset": {"attributes_stale": ""},
+                },
+            )
+        ],
+    )
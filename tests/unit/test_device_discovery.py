@@ -0,0 +1,293 @@
+import io
+import os
+import stat
+import sys
+import time
+
+from pymongo import UpdateOne
+from pytest import mark, fixture
+from unittest.mock import MagicMock
+
+from uaf.device_farming.device_discovery import (
+    AndroidDeviceTracker,
+    DeviceDiscoveryDaemon,
+    DeviceEvent,
+    DeviceTracker,
+    read_track_devices_frames,
+)
+from uaf.enums.device_status import DeviceStatus
+from uaf.enums.mobile_os import MobileOs
+
+
+def _frame(*lines: str) -> bytes:
+    payload = "".join(f"{line}\n" for line in lines).encode("utf-8")
+    return f"{len(payload):04x}".encode("utf-8") + payload
+
+
+@fixture
+def fake_adb(tmp_path):
+    """Writes an executable adb stub replaying track-devices frames, then exiting"""
+
+    def _create(*frames: bytes) -> str:
+        path = tmp_path / "adb"
+        path.write_text(
+            f"#!{sys.executable}\n"
+            "import sys\n"
+            "assert sys.argv[1:] == ['track-devices']\n"
+            f"sys.stdout.buffer.write({b''.join(frames)!r})\n"
+            "sys.stdout.flush()\n"
+        )
+        path.chmod(path.stat().st_mode | stat.S_IEXEC)
+        return str(path)
+
+    return _create
+
+
+class StaticTracker(DeviceTracker):
+    mobile_os = MobileOs.ANDROID
+
+    def __init__(self, *snapshots: set[str]) -> None:
+        super().__init__()
+        self._snapshots = snapshots
+
+    def snapshots(self):
+        yield from self._snapshots
+
+
+@mark.unit_test
+def test_read_track_devices_frames():
+    stream = io.BytesIO(
+        _frame()
+        + _frame("R58M123\tdevice", "emulator-5554\tdevice")
+        + _frame("R58M123\tdevice", "ZY22\tunauthorized", "ZY23\toffline")
+    )
+
+    assert list(read_track_devices_frames(stream)) == [set(), {"R58M123"}, {"R58M123"}]
+
+
+@mark.unit_test
+def test_read_track_devices_frames_truncated():
+    assert list(read_track_devices_frames(io.BytesIO(b"00"))) == []
+
+
+@mark.unit_test
+def test_tracker_events_diff_snapshots():
+    tracker = StaticTracker({"a", "b"}, {"b", "c"}, set())
+
+    assert list(tracker.events(known_devices={"a", "stale"})) == [
+        DeviceEvent("b", MobileOs.ANDROID, True),
+        DeviceEvent("stale", MobileOs.ANDROID, False),
+        DeviceEvent("c", MobileOs.ANDROID, True),
+        DeviceEvent("a", MobileOs.ANDROID, False),
+        DeviceEvent("b", MobileOs.ANDROID, False),
+        DeviceEvent("c", MobileOs.ANDROID, False),
+    ]
+
+
+@mark.unit_test
+def test_android_tracker_consumes_adb_stream(fake_adb):
+    adb = fake_adb(
+        _frame("first\tdevice"),
+        _frame("first\tdevice", "second\tdevice"),
+        _frame("second\tdevice"),
+    )
+    tracker = AndroidDeviceTracker(adb_executable=adb)
+
+    assert list(tracker.events(known_devices=set())) == [
+        DeviceEvent("first", MobileOs.ANDROID, True),
+        DeviceEvent("second", MobileOs.ANDROID, True),
+        DeviceEvent("first", MobileOs.ANDROID, False),
+    ]
+
+
+@mark.unit_test
+def test_daemon_apply_connected():
+    mongo_client = MagicMock()
+    daemon = DeviceDiscoveryDaemon(
+        mongo_client,
+        "device_stats",
+        [],
+        fetch_attributes=lambda *_: {"os_version": "13", "os_major_version": 13},
+    )
+
+    daemon.apply(DeviceEvent("R58M123", MobileOs.ANDROID, True))
+
+    upsert, reconnect = mongo_client.update_one.call_args_list
+    assert upsert.args[1] == {"device_id": "R58M123"}
+    assert upsert.args[2]["$setOnInsert"]["status"] == DeviceStatus.AVAILABLE.value
+    assert upsert.args[2]["$set"] == {
+        "os_version": "13",
+        "os_major_version": 13,
+        "connected": True,
+    }
+    assert upsert.args[2]["$unset"] == {"attributes_stale": ""}
+    assert upsert.kwargs == {"upsert": True}
+    assert reconnect.args[1] == {
+        "device_id": "R58M123",
+        "status": DeviceStatus.DISCONNECTED.value,
+    }
+    assert reconnect.args[2] == {"$set": {"status": DeviceStatus.AVAILABLE.value}}
+
+
+@mark.unit_test
+def test_daemon_apply_connected_without_attributes():
+    mongo_client = MagicMock()
+    daemon = DeviceDiscoveryDaemon(
+        mongo_client, "device_stats", [], fetch_attributes=lambda *_: {}
+    )
+
+    daemon.apply(DeviceEvent("R58M123", MobileOs.ANDROID, True))
+
+    assert mongo_client.update_one.call_args_list[0].args[2]["$set"] == {
+        "connected": True
+    }
+
+
+@mark.unit_test
+def test_daemon_apply_assigns_host():
+    mongo_client = MagicMock()
+    daemon = DeviceDiscoveryDaemon(
+        mongo_client,
+        "device_stats",
+        [],
+        fetch_attributes=lambda *_: {},
+        host_id="host-a",
+        appium_url="http://host-a:4723",
+    )
+
+    daemon.apply(DeviceEvent("R58M123", MobileOs.ANDROID, True))
+    daemon.apply(DeviceEvent("R58M123", MobileOs.ANDROID, False))
+
+    upsert, _, disconnect = mongo_client.update_one.call_args_list
+    assert upsert.args[2]["$set"] == {
+        "host_id": "host-a",
+        "appium_url": "http://host-a:4723",
+        "connected": True,
+    }
+    # a device moved to another host is not marked disconnected by its previous host
+    assert disconnect.args[1]["host_id"] == "host-a"
+
+
+@mark.unit_test
+def test_daemon_registers_host():
+    mongo_client = MagicMock()
+    registry = MagicMock(stale_after_seconds=60)
+    daemon = DeviceDiscoveryDaemon(
+        mongo_client,
+        "device_stats",
+        [],
+        host_id="host-a",
+        appium_url="http://host-a:4723",
+        host_registry=registry,
+    )
+
+    daemon.start()
+    daemon.stop()
+
+    registry.register.assert_called_once_with("host-a", "http://host-a:4723")
+    registry.unregister.assert_called_once_with("host-a")
+
+
+@mark.unit_test
+def test_daemon_refresh_attributes():
+    mongo_client = MagicMock()
+    mongo_client.find_many.return_value = [
+        {"device_id": "R58M123", "device_os": MobileOs.ANDROID.value}
+    ]
+    daemon = DeviceDiscoveryDaemon(
+        mongo_client,
+        "device_stats",
+        [],
+        fetch_attributes=lambda *_: {"os_version": "14", "os_major_version": 14},
+        host_id="host-a",
+    )
+
+    assert daemon.refresh_attributes() == 1
+
+    mongo_client.find_many.assert_called_once_with(
+        "device_stats",
+        {
+            "host_id": "host-a",
+            "status": DeviceStatus.TERMINATED.value,
+            "attributes_stale": True,
+            "connected": {"$ne": False},
+        },
+        projection={"device_id": True, "device_os": True},
+    )
+    mongo_client.bulk_write.assert_called_once_with(
+        "device_stats",
+        [
+            UpdateOne(
+                {"device_id": "R58M123"},
+                {
+                    "$set": {"os_version": "14", "os_major_version": 14},
+                    "$unset": {"attributes_stale": ""},
+                },
+            )
+        ],
+    )
+
+
+@mark.unit_test
+def test_daemon_apply_disconnected():
+    mongo_client = MagicMock()
+    mongo_client.update_one.return_value = MagicMock(matched_count=1)
+    daemon = DeviceDiscoveryDaemon(mongo_client, "device_stats", [])
+
+    daemon.apply(DeviceEvent("R58M123", MobileOs.ANDROID, False))
+
+    mongo_client.update_one.assert_called_once_with(
+        "device_stats",
+        {"device_id": "R58M123", "status": {"$ne": DeviceStatus.IN_USE.value}},
+        {"$set": {"status": DeviceStatus.DISCONNECTED.value, "connected": False}},
+    )
+
+
+@mark.unit_test
+def test_daemon_apply_disconnected_flags_in_use():
+    mongo_client = MagicMock()
+    mongo_client.update_one.return_value = MagicMock(matched_count=0)
+    daemon = DeviceDiscoveryDaemon(mongo_client, "device_stats", [])
+
+    daemon.apply(DeviceEvent("R58M123", MobileOs.ANDROID, False))
+
+    # the session keeps the device, check_device marks it disconnected once released
+    _, in_use = mongo_client.update_one.call_args_list
+    assert in_use.args[1] == {
+        "device_id": "R58M123",
+        "status": DeviceStatus.IN_USE.value,
+    }
+    assert in_use.args[2] == {"$set": {"connected": False}}
+
+
+@mark.unit_test
+def test_daemon_pushes_events_from_fake_adb(fake_adb):
+    adb = fake_adb(_frame("new_device\tdevice"))
+    mongo_client = MagicMock()
+    mongo_client.find_many.return_value = [{"device_id": "unplugged_device"}]
+    daemon = DeviceDiscoveryDaemon(
+        mongo_client,
+        "device_stats",
+        [AndroidDeviceTracker(adb_executable=adb)],
+        restart_delay=60,
+        fetch_attributes=lambda *_: {},
+    )
+
+    daemon.start()
+    deadline = time.monotonic() + 10
+    while mongo_client.update_one.call_count < 3 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    daemon.stop()
+
+    updated = [
+        call.args[1]["device_id"] for call in mongo_client.update_one.call_args_list
+    ]
+    assert updated == ["new_device", "new_device", "unplugged_device"]
+    mongo_client.find_many.assert_called_once_with(
+        "device_stats",
+        {
+            "device_os": MobileOs.ANDROID.value,
+            "status": {"$ne": DeviceStatus.DISCONNECTED.value},
+        },
+        projection={"device_id": True},
+    )
@@ -0,0 +1,72 @@
+from pytest import mark
+from unittest.mock import MagicMock, patch
+from uuid import UUID
+
+from uaf.device_farming.device_farm_client import DeviceFarmClient, DeviceReservation
+from uaf.enums.device_farm_client_mode import DeviceFarmClientMode
+
+SESSION_ID = UUID("12345678123456781234567812345678")
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_farm_client.device_tasks")
+def test_client_mode_from_config(mock_device_tasks):
+    mock_device_tasks.config.get_value.return_value = "celery"
+
+    assert DeviceFarmClient().mode is DeviceFarmClientMode.CELERY
+    mock_device_tasks.config.get_value.assert_called_once_with(
+        "device_farm", "client_mode", "direct"
+    )
+    # tasks are bound up front, before threads reserve devices concurrently
+    mock_device_tasks.finalize_tasks.assert_called_once_with()
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_farm_client.device_tasks")
+def test_direct_client_skips_celery(mock_device_tasks):
+    mock_device_tasks.reserve_device.run.return_value = (
+        "device1",
+        SESSION_ID,
+        "http://host-a:4723",
+    )
+    mock_device_tasks.renew_lease.run.return_value = True
+    client = DeviceFarmClient(DeviceFarmClientMode.DIRECT)
+
+    assert client.reserve(
+        "android", preferred_app="com.example.app"
+    ) == DeviceReservation("device1", SESSION_ID, "http://host-a:4723")
+    assert client.renew("device1", SESSION_ID) is True
+    client.release("device1", SESSION_ID)
+
+    mock_device_tasks.reserve_device.run.assert_called_once_with(
+        "android",
+        capabilities=None,
+        preferred_app="com.example.app",
+        max_wait_seconds=None,
+        with_appium_url=True,
+    )
+    mock_device_tasks.release_device.run.assert_called_once_with("device1", SESSION_ID)
+    mock_device_tasks.reserve_device.delay.assert_not_called()
+    mock_device_tasks.release_device.delay.assert_not_called()
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_farm_client.device_tasks")
+def test_celery_client_waits_for_workers(mock_device_tasks):
+    mock_device_tasks.reservation_max_wait_seconds.return_value = 60
+    reservation = MagicMock()
+    reservation.get.return_value = ["device1", SESSION_ID, None]
+    mock_device_tasks.reserve_device.delay.return_value = reservation
+    client = DeviceFarmClient(DeviceFarmClientMode.CELERY)
+
+    assert client.reserve("android") == DeviceReservation("device1", SESSION_ID)
+    assert client.renew("device1", SESSION_ID) is None
+    client.release("device1", SESSION_ID, timeout=5)
+
+    reservation.get.assert_called_once_with(timeout=70)
+    assert mock_device_tasks.reserve_device.delay.call_args.kwargs["with_appium_url"]
+    mock_device_tasks.renew_lease.delay.assert_called_once_with("device1", SESSION_ID)
+    mock_device_tasks.release_device.delay.return_value.get.assert_called_once_with(
+        timeout=5
+    )
+    mock_device_tasks.reserve_device.run.assert_not_called()
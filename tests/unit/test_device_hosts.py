@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from pytest import fixture, mark
+from unittest.mock import MagicMock
+
+from uaf.device_farming.device_hosts import (
+    DeviceHostRegistry,
+    local_appium_url,
+    local_host_id,
+)
+
+
+@fixture
+def mock_mongo_client():
+    return MagicMock()
+
+
+@mark.unit_test
+def test_local_host_defaults():
+    config = MagicMock()
+    config.get_value.side_effect = lambda section, key, default: default
+
+    # host agents are not configured in a single host farm
+    assert local_host_id(config) is None
+    assert local_appium_url(config) is None
+
+
+@mark.unit_test
+def test_register_upserts_heartbeat(mock_mongo_client):
+    registry = DeviceHostRegistry(mock_mongo_client, "device_hosts")
+
+    registry.register("host-a", "http://host-a:4723")
+
+    collection, query, update = mock_mongo_client.update_one.call_args.args
+    assert (collection, query) == ("device_hosts", {"_id": "host-a"})
+    assert update["$set"]["appium_url"] == "http://host-a:4723"
+    assert isinstance(update["$set"]["heartbeat_at"], datetime)
+    assert mock_mongo_client.update_one.call_args.kwargs == {"upsert": True}
+
+
+@mark.unit_test
+def test_live_hosts_skips_stale(mock_mongo_client):
+    registry = DeviceHostRegistry(
+        mock_mongo_client, "device_hosts", stale_after_seconds=30
+    )
+
+    registry.live_hosts()
+
+    query = mock_mongo_client.find_many.call_args.args[1]
+    assert datetime.utcnow() - query["heartbeat_at"]["$gte"] >= timedelta(seconds=30)
+    assert registry.indexes()[0].document["expireAfterSeconds"] == 300
+
+
+@mark.unit_test
+def test_stale_hosts(mock_mongo_client):
+    registry = DeviceHostRegistry(
+        mock_mongo_client, "device_hosts", stale_after_seconds=30
+    )
+    mock_mongo_client.find_many.return_value = [{"_id": "host-a"}]
+
+    assert registry.stale_hosts() == ["host-a"]
+
+    query = mock_mongo_client.find_many.call_args.args[1]
+    assert datetime.utcnow() - query["heartbeat_at"]["$lt"] >= timedelta(seconds=30)
+
+
+@mark.unit_test
+def test_unregister(mock_mongo_client):
+    DeviceHostRegistry(mock_mongo_client, "device_hosts").unregister("host-a")
+
+    mock_mongo_client.delete_one.assert_called_once_with(
+        "device_hosts", {"_id": "host-a"}
+    )
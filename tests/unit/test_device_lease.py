@@ -0,0 +1,35 @@
+import threading
+
+from pytest import mark
+from unittest.mock import MagicMock
+
+from uaf.device_farming.device_lease import LeaseHeartbeat
+
+
+@mark.unit_test
+def test_lease_heartbeat_renews_until_stopped():
+    renewed = threading.Event()
+    renew = MagicMock(side_effect=lambda: renewed.set())
+
+    with LeaseHeartbeat(renew, interval=0.01):
+        assert renewed.wait(timeout=5)
+
+    calls = renew.call_count
+    assert calls >= 1
+    threading.Event().wait(0.05)
+    assert renew.call_count == calls
+
+
+@mark.unit_test
+def test_lease_heartbeat_survives_renew_failures():
+    beats = threading.Semaphore(0)
+
+    def renew():
+        beats.release()
+        raise ConnectionError("broker unreachable")
+
+    heartbeat = LeaseHeartbeat(renew, interval=0.01)
+    heartbeat.start()
+    assert beats.acquire(timeout=5)
+    assert beats.acquire(timeout=5)
+    heartbeat.stop()
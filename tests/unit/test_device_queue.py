@@ -0,0 +1,123 @@
+import threading
+from datetime import datetime
+
+from pytest import mark, fixture
+from unittest.mock import MagicMock
+
+from uaf.device_farming.device_queue import (
+    DeviceAvailabilitySignal,
+    DeviceReservationQueue,
+)
+
+
+@fixture
+def queue():
+    return DeviceReservationQueue(MagicMock(), "device_reservation_queue")
+
+
+@mark.unit_test
+def test_queue_key_ignores_capability_order():
+    assert DeviceReservationQueue.queue_key(
+        "android", {"os_version": "14", "screen_size": "1080x2400"}
+    ) == DeviceReservationQueue.queue_key(
+        "android", {"screen_size": "1080x2400", "os_version": "14"}
+    )
+    assert DeviceReservationQueue.queue_key("android") != (
+        DeviceReservationQueue.queue_key("ios")
+    )
+
+
+@mark.unit_test
+def test_enqueue(queue):
+    ticket_id = queue.enqueue("android")
+
+    ticket = queue.mongo_client.insert_one.call_args.args[1]
+    assert ticket["_id"] == ticket_id
+    assert ticket["queue_key"] == "android"
+    assert ticket["enqueued_at"] == ticket["heartbeat_at"]
+
+
+@mark.unit_test
+def test_tickets_ahead_of_new_caller(queue):
+    queue.mongo_client.count_documents.return_value = 2
+
+    assert queue.tickets_ahead("android", limit=3) == 2
+
+    queue.mongo_client.find_one.assert_not_called()
+    args, kwargs = queue.mongo_client.count_documents.call_args
+    assert args[1]["queue_key"] == "android"
+    assert "$gte" in args[1]["heartbeat_at"]
+    assert "$or" not in args[1]
+    assert kwargs["limit"] == 3
+
+
+@mark.unit_test
+def test_tickets_ahead_of_queued_ticket(queue):
+    enqueued_at = datetime(2024, 1, 1)
+    queue.mongo_client.find_one.return_value = {"enqueued_at": enqueued_at}
+    queue.mongo_client.count_documents.return_value = 0
+
+    assert queue.tickets_ahead("android", "ticket") == 0
+
+    assert queue.mongo_client.find_one.call_args.args[1] == {"_id": "ticket"}
+    assert queue.mongo_client.count_documents.call_args.args[1]["$or"] == [
+        {"enqueued_at": {"$lt": enqueued_at}},
+        {"enqueued_at": enqueued_at, "_id": {"$lt": "ticket"}},
+    ]
+
+
+@mark.unit_test
+def test_tickets_ahead_of_expired_ticket(queue):
+    queue.mongo_client.find_one.return_value = None
+    queue.mongo_client.count_documents.return_value = 4
+
+    # a purged ticket is behind every live one
+    assert queue.tickets_ahead("android", "expired") == 4
+    assert "$or" not in queue.mongo_client.count_documents.call_args.args[1]
+
+
+@mark.unit_test
+def test_heartbeat_and_leave(queue):
+    queue.heartbeat("ticket")
+    queue.leave("ticket")
+
+    assert queue.mongo_client.update_one.call_args.args[1] == {"_id": "ticket"}
+    queue.mongo_client.delete_one.assert_called_once_with(
+        "device_reservation_queue", {"_id": "ticket"}
+    )
+
+
+@mark.unit_test
+def test_indexes(queue):
+    key_index, ttl_index = [index.document for index in queue.indexes()]
+
+    assert list(key_index["key"]) == ["queue_key", "enqueued_at"]
+    assert ttl_index["key"] == {"heartbeat_at": 1}
+    assert ttl_index["expireAfterSeconds"] == 300
+
+
+@mark.unit_test
+def test_availability_signal_times_out_without_notification():
+    signal = DeviceAvailabilitySignal()
+
+    assert signal.wait(signal.generation(), 0.01) is False
+
+
+@mark.unit_test
+def test_availability_signal_wakes_waiter():
+    signal = DeviceAvailabilitySignal()
+    generation = signal.generation()
+    threading.Timer(0.05, signal.notify).start()
+
+    assert signal.wait(generation, 5) is True
+    assert signal.generation() == generation + 1
+
+
+@mark.unit_test
+def test_availability_signal_keeps_notification_sent_before_wait():
+    signal = DeviceAvailabilitySignal()
+    generation = signal.generation()
+    signal.notify()
+
+    # devices returned between the caller's check and its wait are not missed
+    assert signal.wait(generation, 0) is True
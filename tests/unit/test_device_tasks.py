@@ -1,12 +1,29 @@
-from pytest import mark, fixture
+import threading
+import time
+
+from celery.exceptions import Retry
+from kombu.serialization import dumps, loads
+from pytest import mark, fixture, raises
 from unittest.mock import MagicMock, patch
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
 from uuid import UUID
 
 from uaf.device_farming.device_tasks import (
     add_new_devices_to_list,
+    app,
+    migrate_session_timestamps,
+    rollup_device_utilization,
     reserve_device,
     release_device,
     check_device,
+    disconnect_stale_host_devices,
+    ensure_device_farm_indexes,
+    device_availability,
+    finalize_tasks,
+    reap_expired_leases,
+    renew_lease,
+    reservation_poll_seconds,
 )
 from uaf.enums.device_status import DeviceStatus
 from uaf.enums.mobile_device_environment_type import MobileDeviceEnvironmentType
@@ -30,58 +47,429 @@ def mock_config():
     return config
 
 
+def config_values(**overrides):
+    """Side effect for config.get_value returning the key name, the override or the default"""
+
+    def _get_value(section, key, *default):
+        if key in overrides:
+            return overrides[key]
+        return default[0] if default else key
+
+    return _get_value
+
+
 @mark.unit_test
+@mark.parametrize(
+    "host_id, host",
+    [(None, {}), ("host-a", {"host_id": "host-a"})],
+    ids=["single_host", "host_agents"],
+)
+@patch("uaf.device_farming.device_tasks.fetch_device_attributes")
 @patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
 @patch("uaf.device_farming.device_tasks.CoreUtils", new_callable=MagicMock)
 @patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
 @patch("platform.system")
 def test_add_new_devices_to_list(
-    mock_system, mock_config, mock_core_utils, mock_mongo_client
+    mock_system,
+    mock_config,
+    mock_core_utils,
+    mock_mongo_client,
+    mock_attributes,
+    host_id,
+    host,
 ):
     mock_system.return_value = "Linux"
-    mock_mongo_client.find_many.return_value = [{"device_id": "existing_device"}]
+    mock_config.get_value.side_effect = config_values(host_id=host_id)
+    mock_attributes.return_value = {"os_version": "14", "os_major_version": 14}
     mock_core_utils.fetch_connected_android_devices_ids.return_value = [
         "new_device",
         "existing_device",
     ]
+    mock_mongo_client.find_many.return_value = [{"device_id": "existing_device"}]
 
     add_new_devices_to_list()
 
-    # Adjust the expectation to use the config mock instead of hardcoded "test_collection"
-    mock_mongo_client.insert_many.assert_called_once_with(
-        mock_config.get_value(),  # Use the mock config's get_value()
+    mock_mongo_client.find_many.assert_called_once_with(
+        "device_stat_collection",
+        {"device_id": {"$in": ["new_device", "existing_device"]}},
+        projection={"device_id": True, "_id": False},
+    )
+    mock_core_utils.fetch_connected_ios_devices_ids.assert_not_called()
+    # devices are only assigned to a host when host agents are configured
+    mock_mongo_client.upsert_many.assert_called_once_with(
+        "device_stat_collection",
         [
             {
-                "device_id": "new_device",
+                "device_id": device_id,
                 "device_type": MobileDeviceEnvironmentType.PHYSICAL.value,
                 "device_os": MobileOs.ANDROID.value,
                 "status": DeviceStatus.AVAILABLE.value,
+                **host,
+                "os_version": "14",
+                "os_major_version": 14,
             }
+            for device_id in ["new_device"]
         ],
+        ["device_id"],
+        on_insert_only=True,
     )
+    # only the new device is inspected
+    mock_attributes.assert_called_once_with("new_device", MobileOs.ANDROID)
 
 
 @mark.unit_test
+@patch("uaf.device_farming.device_tasks.fetch_device_attributes", MagicMock())
 @patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.CoreUtils", new_callable=MagicMock)
 @patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
-@patch("uaf.device_farming.device_tasks.choice")
-@patch("uaf.device_farming.device_tasks.__get_unique_id")
-def test_reserve_device(
-    mock_get_unique_id, mock_choice, mock_config, mock_mongo_client
+@patch("platform.system")
+def test_add_new_devices_to_list_darwin(
+    mock_system, mock_config, mock_core_utils, mock_mongo_client
 ):
-    mock_mongo_client.find_many.return_value = [
-        {"device_id": "device1", "device_os": "android"},
-        {"device_id": "device2", "device_os": "ios"},
+    mock_system.return_value = "Darwin"
+    mock_core_utils.fetch_connected_android_devices_ids.return_value = ["android1"]
+    mock_core_utils.fetch_connected_ios_devices_ids.return_value = ["ios1"]
+    mock_mongo_client.find_many.return_value = []
+    generation = device_availability.generation()
+
+    add_new_devices_to_list()
+
+    mock_mongo_client.upsert_many.assert_called_once()
+    assert device_availability.generation() == generation + 1
+    documents = mock_mongo_client.upsert_many.call_args.args[1]
+    assert [(doc["device_id"], doc["device_os"]) for doc in documents] == [
+        ("android1", MobileOs.ANDROID.value),
+        ("ios1", MobileOs.IOS.value),
     ]
-    mock_choice.return_value = "device1"
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.fetch_device_attributes")
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.CoreUtils", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+@patch("platform.system")
+def test_add_new_devices_to_list_nothing_new(
+    mock_system, mock_config, mock_core_utils, mock_mongo_client, mock_attributes
+):
+    mock_system.return_value = "Linux"
+    mock_core_utils.fetch_connected_android_devices_ids.return_value = ["device1"]
+    mock_mongo_client.find_many.return_value = [{"device_id": "device1"}]
+    generation = device_availability.generation()
+
+    add_new_devices_to_list()
+
+    mock_mongo_client.upsert_many.assert_not_called()
+    assert device_availability.generation() == generation
+    mock_attributes.assert_not_called()
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.__get_unique_id")
+def test_reserve_device(mock_get_unique_id, mock_config, mock_mongo_client):
+    mock_mongo_client.count_documents.return_value = 0
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.find_one_and_update.return_value = {"device_id": "device1"}
     mock_get_unique_id.return_value = UUID("12345678-1234-5678-1234-567812345678")
 
     device_id, uuid = reserve_device("android")
 
     assert device_id == "device1"
     assert uuid == UUID("12345678-1234-5678-1234-567812345678")
-    mock_mongo_client.update_one.assert_called_once()
+    mock_mongo_client.find_many.assert_not_called()
+    mock_mongo_client.update_one.assert_not_called()
+    mock_mongo_client.find_one_and_update.assert_called_once()
+    args, kwargs = mock_mongo_client.find_one_and_update.call_args
+    assert args[1] == {"status": DeviceStatus.AVAILABLE.value, "device_os": "android"}
+    assert args[2]["$set"]["status"] == DeviceStatus.IN_USE.value
+    assert args[2]["$set"]["session_id"] == str(uuid)
+    assert kwargs["sort"] == [("last_reserved_at", 1)]
+    mock_mongo_client.insert_one.assert_called_once()
+    session_doc = mock_mongo_client.insert_one.call_args.args[1]
+    assert session_doc["session_id"] == str(uuid)
+    assert isinstance(session_doc["start_time"], datetime)
+    assert session_doc["queue_wait_seconds"] >= 0
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_routes_to_owning_host(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.count_documents.return_value = 0
+    mock_mongo_client.find_one_and_update.return_value = {
+        "device_id": "device1",
+        "appium_url": "http://host-a:4723",
+    }
+
+    _, _, appium_url = reserve_device("android", with_appium_url=True)
+
+    assert appium_url == "http://host-a:4723"
+    assert mock_mongo_client.find_one_and_update.call_args.kwargs["projection"] == {
+        "device_id": True,
+        "appium_url": True,
+    }
+    session_doc = mock_mongo_client.insert_one.call_args.args[1]
+    assert session_doc["appium_url"] == "http://host-a:4723"
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_with_capabilities(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.count_documents.return_value = 0
+    mock_mongo_client.find_one_and_update.return_value = {"device_id": "device1"}
+
+    reserve_device(
+        "android",
+        capabilities={
+            "min_os_major_version": 13,
+            "device_type": MobileDeviceEnvironmentType.PHYSICAL,
+        },
+    )
+
+    assert mock_mongo_client.find_one_and_update.call_args.args[1] == {
+        "os_major_version": {"$gte": 13},
+        "device_type": MobileDeviceEnvironmentType.PHYSICAL.value,
+        "status": DeviceStatus.AVAILABLE.value,
+        "device_os": "android",
+    }
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_unsupported_capability(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+
+    with raises(ValueError, match="Unsupported device capability"):
+        reserve_device("android", capabilities={"battery": 100})
+    mock_mongo_client.find_one_and_update.assert_not_called()
+    mock_mongo_client.insert_one.assert_not_called()
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_prefers_installed_app(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.count_documents.return_value = 0
+    # no available device has the app installed, so any matching device is claimed
+    mock_mongo_client.find_one_and_update.side_effect = [None, {"device_id": "device1"}]
+
+    device_id, _ = reserve_device("android", preferred_app="com.example.app")
+
+    assert device_id == "device1"
+    preferred, fallback = mock_mongo_client.find_one_and_update.call_args_list
+    assert preferred.args[1] == {
+        "status": DeviceStatus.AVAILABLE.value,
+        "device_os": "android",
+        "installed_apps.package": "com.example.app",
+    }
+    assert fallback.args[1] == {
+        "status": DeviceStatus.AVAILABLE.value,
+        "device_os": "android",
+    }
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_waits_in_queue(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values(reservation_poll_seconds=0)
+    # another caller is queued and no device is available, then the caller heads the queue
+    mock_mongo_client.count_documents.side_effect = [1, 0, 0]
+    mock_mongo_client.find_one_and_update.return_value = {"device_id": "device1"}
+
+    device_id, _ = reserve_device("android")
+
+    assert device_id == "device1"
+    ticket = mock_mongo_client.insert_one.call_args_list[0].args[1]
+    assert ticket["queue_key"] == '{"device_os": "android"}'
+    mock_mongo_client.delete_one.assert_called_once_with(
+        "device_reservation_queue", {"_id": ticket["_id"]}
+    )
+    _, device_count, _ = mock_mongo_client.count_documents.call_args_list
+    assert device_count.args[1] == {
+        "status": DeviceStatus.AVAILABLE.value,
+        "device_os": "android",
+    }
+    assert device_count.kwargs["limit"] == 2
+    mock_mongo_client.find_one_and_update.assert_called_once()
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_claims_alongside_queue(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    # two callers are queued and three devices are available
+    mock_mongo_client.count_documents.side_effect = [2, 3]
+    mock_mongo_client.find_one_and_update.return_value = {"device_id": "device1"}
+
+    device_id, _ = reserve_device("android")
+
+    assert device_id == "device1"
     mock_mongo_client.insert_one.assert_called_once()
+    assert mock_mongo_client.insert_one.call_args.args[0] == "device_session_collection"
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_woken_by_returned_device(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values(
+        reservation_min_poll_seconds=30, reservation_poll_seconds=30
+    )
+    mock_mongo_client.count_documents.return_value = 0
+    mock_mongo_client.find_one_and_update.side_effect = [None, {"device_id": "device1"}]
+    threading.Timer(0.1, device_availability.notify).start()
+
+    started = time.monotonic()
+    device_id, _ = reserve_device("android")
+
+    assert device_id == "device1"
+    # woken by the notification instead of sleeping for the 30s poll
+    assert time.monotonic() - started < 10
+
+
+@mark.unit_test
+@mark.parametrize("attempt, expected", [(0, 0.05), (2, 0.2), (5, 1), (5000, 1)])
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reservation_poll_seconds_backs_off(mock_config, attempt, expected):
+    mock_config.get_value.side_effect = config_values()
+
+    assert reservation_poll_seconds(attempt) == expected
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_gives_up_after_max_wait(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values(reservation_poll_seconds=0)
+    mock_mongo_client.count_documents.return_value = 0
+    mock_mongo_client.find_one_and_update.return_value = None
+
+    with raises(ValueError):
+        reserve_device("android", max_wait_seconds=0.05)
+
+    ticket = mock_mongo_client.insert_one.call_args.args[1]
+    mock_mongo_client.delete_one.assert_called_once_with(
+        "device_reservation_queue", {"_id": ticket["_id"]}
+    )
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_retries_inside_worker(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.count_documents.return_value = 0
+    mock_mongo_client.find_one_and_update.return_value = None
+
+    reserve_device.push_request(called_directly=False, args=["android"], kwargs={})
+    try:
+        with patch.object(reserve_device, "retry", side_effect=Retry()) as retry:
+            with raises(Retry):
+                reserve_device.run("android")
+    finally:
+        reserve_device.pop_request()
+
+    ticket = mock_mongo_client.insert_one.call_args.args[1]
+    assert retry.call_args.kwargs["countdown"] == 0.05
+    assert retry.call_args.kwargs["kwargs"]["ticket_id"] == ticket["_id"]
+    assert retry.call_args.kwargs["kwargs"]["max_wait_seconds"] == 300
+    assert retry.call_args.kwargs["kwargs"]["with_appium_url"] is False
+    assert retry.call_args.kwargs["args"] == ("android",)
+
+
+@fixture(scope="module")
+def worker_mongo_client():
+    """In-process celery worker consuming an in-memory broker, its tasks use the yielded mock
+
+    The worker takes a few seconds to stop, so it is shared by the tests of the module.
+    """
+    from celery.contrib.testing.worker import start_worker
+
+    mongo_client = MagicMock()
+    settings = {
+        "broker_url": "memory://",
+        "result_backend": "cache+memory://",
+        "broker_transport_options": {"polling_interval": 0.01},
+    }
+    previous = {key: app.conf[key] for key in settings}
+    app.conf.update(settings)
+    try:
+        with (
+            patch("uaf.device_farming.device_tasks.mongo_client", mongo_client),
+            start_worker(app, pool="solo", perform_ping_check=False),
+        ):
+            yield mongo_client
+    finally:
+        app.conf.update(previous)
+
+
+@mark.unit_test
+@mark.parametrize(
+    "args, kwargs",
+    [
+        ((), {"mobile_os": "android", "max_wait_seconds": 5}),
+        (("android", None, 5), {}),
+    ],
+    ids=["keyword", "positional"],
+)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_retries_on_worker(
+    mock_config, worker_mongo_client, args, kwargs
+):
+    worker_mongo_client.reset_mock(return_value=True, side_effect=True)
+    mock_config.get_value.side_effect = config_values(reservation_poll_seconds=0)
+    # the queue is empty on the first attempt, then headed by the caller's ticket
+    worker_mongo_client.count_documents.return_value = 0
+    worker_mongo_client.find_one_and_update.side_effect = [
+        None,
+        {"device_id": "device1"},
+    ]
+
+    device_id, _ = reserve_device.apply_async(args, kwargs).get(timeout=10)
+
+    assert device_id == "device1"
+    # the first attempt queued and retried, the retry claimed the device
+    assert worker_mongo_client.find_one_and_update.call_count == 2
+    worker_mongo_client.delete_one.assert_called_once()
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_sets_lease(mock_config, mock_mongo_client):
+    mock_mongo_client.count_documents.return_value = 0
+    mock_config.get_value.side_effect = config_values(lease_ttl_seconds=120)
+    mock_mongo_client.find_one_and_update.return_value = {"device_id": "device1"}
+
+    reserve_device("android")
+
+    update = mock_mongo_client.find_one_and_update.call_args.args[2]["$set"]
+    assert update["lease_expires_at"] - update["last_reserved_at"] == timedelta(
+        seconds=120
+    )
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reserve_device_no_availability(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values(reservation_max_wait_seconds=0)
+    mock_mongo_client.count_documents.return_value = 0
+    mock_mongo_client.find_one_and_update.return_value = None
+
+    with raises(ValueError):
+        reserve_device("ios")
+
+    mock_mongo_client.insert_one.assert_not_called()
 
 
 @mark.unit_test
@@ -94,23 +482,415 @@ def test_release_device(mock_config, mock_mongo_client):
     release_device(device_id, session_id)
 
     assert mock_mongo_client.update_one.call_count == 2
+    device_update = mock_mongo_client.update_one.call_args_list[0]
+    assert device_update.args[1] == {
+        "device_id": device_id,
+        "session_id": str(session_id),
+    }
+    assert device_update.args[2]["$set"]["status"] == DeviceStatus.TERMINATED.value
+    assert device_update.args[2]["$set"]["attributes_stale"] is True
+    assert device_update.args[2]["$unset"] == {"lease_expires_at": ""}
+    session_update = mock_mongo_client.update_one.call_args_list[1]
+    assert isinstance(session_update.args[2]["$set"]["end_time"], datetime)
 
 
 @mark.unit_test
 @patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
 @patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
 def test_check_device(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.find_many.return_value = []
+    mock_mongo_client.update_many.return_value = MagicMock(
+        matched_count=2, modified_count=2
+    )
+    generation = device_availability.generation()
+
+    assert check_device() == {"matched": 2, "modified": 2, "disconnected": 2}
+    # reservations waiting in this process are woken for the recycled devices
+    assert device_availability.generation() == generation + 1
+
+    mock_mongo_client.find_many.assert_called_once_with(
+        "device_stat_collection",
+        {"status": DeviceStatus.TERMINATED.value, "attributes_stale": True},
+        projection={"device_id": True, "device_os": True},
+    )
+    mock_mongo_client.bulk_write.assert_not_called()
+    mock_mongo_client.update_one.assert_not_called()
+    disconnect, recycle = mock_mongo_client.update_many.call_args_list
+    # devices unplugged while in use are not handed to the next test
+    assert disconnect.args == (
+        "device_stat_collection",
+        {"status": DeviceStatus.TERMINATED.value, "connected": False},
+        {"$set": {"status": DeviceStatus.DISCONNECTED.value}},
+    )
+    assert recycle.args == (
+        "device_stat_collection",
+        {"status": DeviceStatus.TERMINATED.value, "connected": {"$ne": False}},
+        {"$set": {"status": DeviceStatus.AVAILABLE.value}},
+    )
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_capabilities.CoreUtils", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.CoreUtils", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+@patch("platform.system")
+def test_check_device_refreshes_released_devices(
+    mock_system,
+    mock_config,
+    mock_core_utils,
+    mock_mongo_client,
+    mock_capabilities_core_utils,
+):
+    mock_system.return_value = "Linux"
+    mock_config.get_value.side_effect = config_values()
+    mock_core_utils.fetch_connected_android_devices_ids.return_value = ["device1"]
+    # device2 is plugged into another host, its agent refreshes it
     mock_mongo_client.find_many.return_value = [
-        {"device_id": "device1"},
-        {"device_id": "device2"},
+        {"device_id": "device1", "device_os": MobileOs.ANDROID.value},
+        {"device_id": "device2", "device_os": MobileOs.ANDROID.value},
     ]
+    attributes = mock_capabilities_core_utils.fetch_android_device_attributes
+    attributes.return_value = {"installed_apps": [{"package": "com.example.app"}]}
 
     check_device()
 
-    assert mock_mongo_client.update_one.call_count == 2
-    # Adjust the expectation to use the config mock instead of hardcoded "test_collection"
-    mock_mongo_client.update_one.assert_called_with(
-        mock_config.get_value(),  # Use the mock config's get_value()
-        {"device_id": "device2"},
-        {"$set": {"status": DeviceStatus.AVAILABLE.value}},
+    attributes.assert_called_once_with("device1")
+    collection, requests = mock_mongo_client.bulk_write.call_args.args
+    assert collection == "device_stat_collection"
+    assert requests == [
+        UpdateOne(
+            {"device_id": "device1"},
+            {
+                "$set": {"installed_apps": [{"package": "com.example.app"}]},
+                "$unset": {"attributes_stale": ""},
+            },
+        )
+    ]
+    mock_mongo_client.update_many.assert_called()
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.CoreUtils", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+@patch("platform.system")
+def test_check_device_cooldown_and_health_gate(
+    mock_system, mock_config, mock_core_utils, mock_mongo_client
+):
+    mock_system.return_value = "Linux"
+    mock_config.get_value.side_effect = config_values(
+        recycle_cooldown_seconds=60, recycle_requires_connected=True
+    )
+    mock_core_utils.fetch_connected_android_devices_ids.return_value = ["device1"]
+    mock_mongo_client.find_many.return_value = []
+    mock_mongo_client.update_many.return_value = MagicMock(
+        matched_count=1, modified_count=1
+    )
+
+    assert check_device()["matched"] == 1
+
+    query = mock_mongo_client.update_many.call_args.args[1]
+    assert query["status"] == DeviceStatus.TERMINATED.value
+    assert query["device_id"] == {"$in": ["device1"]}
+    released_before = query["$or"][0]["released_at"]["$lte"]
+    assert datetime.utcnow() - released_before >= timedelta(seconds=60)
+    assert query["$or"][1] == {"released_at": {"$exists": False}}
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_ensure_device_farm_indexes(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+
+    ensure_device_farm_indexes()
+
+    created = {
+        call.args[0]: [index.document for index in call.args[1]]
+        for call in mock_mongo_client.create_indexes.call_args_list
+    }
+    stat_indexes = created["device_stat_collection"]
+    assert stat_indexes[0]["key"] == {"device_id": 1}
+    assert stat_indexes[0]["unique"] is True
+    assert list(stat_indexes[1]["key"]) == ["status", "device_os", "last_reserved_at"]
+    assert list(stat_indexes[2]["key"]) == [
+        "status",
+        "device_os",
+        "installed_apps.package",
+        "last_reserved_at",
+    ]
+    assert list(stat_indexes[3]["key"]) == ["status", "device_os", "os_major_version"]
+    assert list(stat_indexes[4]["key"]) == ["status", "lease_expires_at"]
+    assert list(stat_indexes[5]["key"]) == ["host_id", "status"]
+    assert created["device_hosts"][0]["key"] == {"heartbeat_at": 1}
+    assert list(created["device_reservation_queue"][0]["key"]) == [
+        "queue_key",
+        "enqueued_at",
+    ]
+    session_indexes = created["device_session_collection"]
+    assert session_indexes[0]["key"] == {"session_id": 1}
+    assert session_indexes[0]["unique"] is True
+    assert session_indexes[1]["key"] == {"end_time": 1}
+    assert session_indexes[1]["expireAfterSeconds"] == 30 * 24 * 60 * 60
+    assert session_indexes[1]["partialFilterExpression"] == {
+        "end_time": {"$type": "date"}
+    }
+    assert session_indexes[2]["key"] == {"start_time": 1}
+    assert [list(index["key"]) for index in created["device_utilization_hourly"]] == [
+        ["hour"],
+        ["device_id", "hour"],
+    ]
+
+
+def serving_index(indexes, query, sort=()):
+    """Returns the key of the index best serving a query, following the equality, sort, range rule
+
+    The index prefix has to hold the equality fields of the query, then its sort fields, so the
+    query is an IXSCAN returning documents in sort order without an in-memory SORT stage. Among
+    those, the index bounding the most range fields right after wins.
+    """
+    equality = {
+        field
+        for field, value in query.items()
+        if not field.startswith("$") and not isinstance(value, dict)
+    }
+    ranges = {field for field, value in query.items() if isinstance(value, dict)}
+    sort_fields = [field for field, _ in sort]
+    best, best_ranges = None, -1
+    for index in indexes:
+        key = list(index["key"])
+        if set(key[: len(equality)]) != equality:
+            continue
+        rest = key[len(equality) :]
+        if rest[: len(sort_fields)] != sort_fields:
+            continue
+        bounded = 0
+        for field in rest[len(sort_fields) :]:
+            if field not in ranges:
+                break
+            bounded += 1
+        if bounded > best_ranges:
+            best, best_ranges = key, bounded
+    return best
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_device_farm_indexes_serve_task_queries(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values(reservation_max_wait_seconds=0)
+    ensure_device_farm_indexes()
+    indexes = [
+        index.document
+        for call in mock_mongo_client.create_indexes.call_args_list
+        if call.args[0] == "device_stat_collection"
+        for index in call.args[1]
+    ]
+    mock_mongo_client.count_documents.return_value = 0
+    mock_mongo_client.find_one_and_update.return_value = None
+    # no stale device to inspect, one expired lease reaped
+    mock_mongo_client.find_many.side_effect = [[], [{"device_id": "device1"}], []]
+
+    with raises(ValueError):
+        reserve_device("android", preferred_app="com.example.app")
+    check_device()
+    reap_expired_leases()
+
+    preferred, fallback = mock_mongo_client.find_one_and_update.call_args_list
+    assert serving_index(indexes, preferred.args[1], preferred.kwargs["sort"]) == [
+        "status",
+        "device_os",
+        "installed_apps.package",
+        "last_reserved_at",
+    ]
+    assert serving_index(indexes, fallback.args[1], fallback.kwargs["sort"]) == [
+        "status",
+        "device_os",
+        "last_reserved_at",
+    ]
+    _, recycle, reap, _ = mock_mongo_client.update_many.call_args_list
+    assert serving_index(indexes, recycle.args[1])[0] == "status"
+    expired = mock_mongo_client.find_many.call_args_list[1].args[1]
+    assert serving_index(indexes, expired) == ["status", "lease_expires_at"]
+    assert serving_index(indexes, reap.args[1]) == ["status", "lease_expires_at"]
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_renew_lease(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.update_one.return_value = MagicMock(matched_count=1)
+    session_id = UUID("12345678-1234-5678-1234-567812345678")
+
+    assert renew_lease("device1", session_id) is True
+
+    args = mock_mongo_client.update_one.call_args.args
+    assert args[1] == {
+        "device_id": "device1",
+        "session_id": str(session_id),
+        "status": DeviceStatus.IN_USE.value,
+    }
+    expires_in = args[2]["$set"]["lease_expires_at"] - datetime.utcnow()
+    assert timedelta(seconds=290) < expires_in <= timedelta(seconds=300)
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_renew_lease_lost(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.update_one.return_value = MagicMock(matched_count=0)
+
+    assert renew_lease("device1", UUID(int=1)) is False
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reap_expired_leases(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.find_many.side_effect = [
+        [
+            {"device_id": "device1", "session_id": "session1"},
+            {"device_id": "device2", "session_id": "session2"},
+        ],
+        # device2 renewed its lease between the find and the update
+        [{"device_id": "device1", "session_id": "session1"}],
+    ]
+    mock_mongo_client.update_many.side_effect = [
+        MagicMock(modified_count=1),
+        MagicMock(modified_count=1),
+    ]
+
+    assert reap_expired_leases() == {"devices": 1, "sessions": 1}
+
+    device_update, session_update = mock_mongo_client.update_many.call_args_list
+    assert device_update.args[0] == "device_stat_collection"
+    assert device_update.args[1]["status"] == DeviceStatus.IN_USE.value
+    assert "$lt" in device_update.args[1]["lease_expires_at"]
+    assert device_update.args[1]["device_id"] == {"$in": ["device1", "device2"]}
+    assert device_update.args[2]["$set"]["status"] == DeviceStatus.TERMINATED.value
+    reaped = mock_mongo_client.find_many.call_args
+    assert reaped.args[1] == {
+        "device_id": {"$in": ["device1", "device2"]},
+        "released_at": device_update.args[2]["$set"]["released_at"],
+    }
+    assert session_update.args[0] == "device_session_collection"
+    assert session_update.args[1] == {
+        "session_id": {"$in": ["session1"]},
+        "end_time": None,
+    }
+    assert session_update.args[2]["$set"]["end_reason"] == "lease_expired"
+    assert isinstance(session_update.args[2]["$set"]["end_time"], datetime)
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_reap_expired_leases_nothing_expired(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.find_many.return_value = []
+
+    assert reap_expired_leases() == {"devices": 0, "sessions": 0}
+
+    mock_mongo_client.update_many.assert_not_called()
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_disconnect_stale_host_devices(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.find_many.return_value = [{"_id": "host-a"}]
+    mock_mongo_client.update_many.return_value = MagicMock(modified_count=2)
+
+    assert disconnect_stale_host_devices() == 2
+    collection, query = mock_mongo_client.find_many.call_args.args
+    assert collection == "device_hosts"
+    assert "$lt" in query["heartbeat_at"]
+    # only the devices of registered hosts missing heartbeats are disconnected
+    mock_mongo_client.update_many.assert_called_once_with(
+        "device_stat_collection",
+        {
+            "host_id": {"$in": ["host-a"]},
+            "status": DeviceStatus.AVAILABLE.value,
+        },
+        {"$set": {"status": DeviceStatus.DISCONNECTED.value}},
     )
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_disconnect_stale_host_devices_without_stale_host(
+    mock_config, mock_mongo_client
+):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.find_many.return_value = []
+
+    assert disconnect_stale_host_devices() == 0
+    mock_mongo_client.update_many.assert_not_called()
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_rollup_device_utilization(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values(utilization_lookback_hours=6)
+
+    window = rollup_device_utilization()
+
+    assert window["until"] - window["since"] == timedelta(hours=6)
+    assert window["until"].minute == window["until"].second == 0
+    collection, pipeline = mock_mongo_client.aggregate.call_args.args
+    assert collection == "device_session_collection"
+    assert pipeline[0] == {
+        "$match": {
+            "end_time": {"$gt": window["since"]},
+            "start_time": {"$lt": window["until"]},
+        }
+    }
+    assert pipeline[-1]["$merge"]["into"] == "device_utilization_hourly"
+    assert pipeline[-1]["$merge"]["whenMatched"] == "replace"
+
+
+@mark.unit_test
+@patch("uaf.device_farming.device_tasks.mongo_client", new_callable=MagicMock)
+@patch("uaf.device_farming.device_tasks.config", new_callable=MagicMock)
+def test_migrate_session_timestamps(mock_config, mock_mongo_client):
+    mock_config.get_value.side_effect = config_values()
+    mock_mongo_client.update_many.return_value = MagicMock(modified_count=3)
+
+    assert migrate_session_timestamps() == 3
+    collection, query, update = mock_mongo_client.update_many.call_args.args
+    assert collection == "device_session_collection"
+    assert query == {
+        "$or": [
+            {"start_time": {"$type": "string"}},
+            {"end_time": {"$type": "string"}},
+        ]
+    }
+    assert list(update[0]["$set"]) == ["start_time", "end_time"]
+
+
+@mark.unit_test
+def test_device_tasks_serialize_as_json():
+    session_id = UUID("12345678123456781234567812345678")
+    content_type, content_encoding, data = dumps(
+        ("device1", session_id), serializer=app.conf.result_serializer
+    )
+
+    assert app.conf.task_serializer == "json"
+    assert loads(data, content_type, content_encoding) == ["device1", session_id]
+
+
+@mark.unit_test
+def test_finalize_tasks_binds_tasks():
+    finalize_tasks()
+
+    assert app.finalized
+    assert reserve_device.request_stack is not None
+    assert reserve_device.request.called_directly
@@ -0,0 +1,60 @@
+from datetime import datetime
+from pytest import mark
+
+from uaf.device_farming.device_utilization import (
+    rollup_window,
+    session_timestamp_migration,
+    truncate_to_hour,
+    utilization_rollup_pipeline,
+)
+
+
+@mark.unit_test
+def test_rollup_window_covers_complete_hours():
+    since, until = rollup_window(datetime(2024, 5, 1, 10, 42, 7, 123), lookback_hours=3)
+
+    assert since == datetime(2024, 5, 1, 7)
+    assert until == datetime(2024, 5, 1, 10)
+    assert truncate_to_hour(datetime(2024, 5, 1, 10, 59, 59)) == until
+
+
+@mark.unit_test
+def test_utilization_rollup_pipeline():
+    since, until = datetime(2024, 5, 1, 7), datetime(2024, 5, 1, 10)
+
+    pipeline = utilization_rollup_pipeline(since, until, "device_utilization_hourly")
+
+    stages = [next(iter(stage)) for stage in pipeline]
+    assert stages == [
+        "$match",
+        "$project",
+        "$set",
+        "$unwind",
+        "$set",
+        "$match",
+        "$group",
+        "$project",
+        "$merge",
+    ]
+    # sessions are clipped to the window before being split into hours
+    assert pipeline[1]["$project"]["start"] == {"$max": ["$start_time", since]}
+    assert pipeline[1]["$project"]["end"] == {"$min": ["$end_time", until]}
+    assert pipeline[6]["$group"]["_id"] == {"device_id": "$device_id", "hour": "$hour"}
+    assert pipeline[8]["$merge"] == {
+        "into": "device_utilization_hourly",
+        "on": "_id",
+        "whenMatched": "replace",
+        "whenNotMatched": "insert",
+    }
+
+
+@mark.unit_test
+def test_session_timestamp_migration_truncates_microseconds():
+    start_time = session_timestamp_migration()[0]["$set"]["start_time"]
+
+    condition, converted, unchanged = start_time["$cond"]
+    assert condition == {"$eq": [{"$type": "$start_time"}, "string"]}
+    assert converted["$dateFromString"]["dateString"] == {
+        "$substrCP": ["$start_time", 0, 23]
+    }
+    assert unchanged == "$start_time"
@@ -1,6 +1,7 @@
 from pytest import mark
 
 from uaf.enums.browser_make import WebBrowserMake
+from uaf.enums.device_farm_client_mode import DeviceFarmClientMode
 from uaf.enums.file_paths import FilePaths
 from uaf.enums.mobile_os import MobileOs
 from uaf.enums.environments import Environments
@@ -62,3 +63,11 @@ def test_environment_enum(arg_env_enum: Environments):
 @mark.parametrize("arg_exec_mode", [ExecutionMode.LOCAL, ExecutionMode.REMOTE])
 def test_execution_mode_enum(arg_exec_mode: ExecutionMode):
     assert isinstance(arg_exec_mode.value, str)
+
+
+@mark.unit_test
+@mark.parametrize(
+    "arg_client_mode", [DeviceFarmClientMode.DIRECT, DeviceFarmClientMode.CELERY]
+)
+def test_device_farm_client_mode_enum(arg_client_mode: DeviceFarmClientMode):
+    assert isinstance(arg_client_mode.value, str)
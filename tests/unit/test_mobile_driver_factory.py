@@ -167,5 +167,7 @@ def test_mobile_driver_factory(
             environment=mobile_env_type,
             capabilities=capabilities,
         )
-        MockGetMobileDriver.assert_called_once_with(capabilities=capabilities)
+        MockGetMobileDriver.assert_called_once_with(
+            capabilities=capabilities, appium_url=None
+        )
         assert driver == mock_mobile_driver
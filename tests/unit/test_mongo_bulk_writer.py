@@ -0,0 +1,128 @@
+from unittest.mock import MagicMock
+
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pytest import fixture, mark, raises
+
+from uaf.utilities.database.mongo_bulk_writer import MongoBulkWriter
+from uaf.utilities.database.mongo_utils import MongoUtility
+
+
+@fixture
+def mock_mongo_client():
+    mongo_client = MagicMock()
+    mongo_client.bulk_write.return_value = MagicMock(
+        inserted_count=1,
+        matched_count=2,
+        modified_count=2,
+        upserted_count=1,
+        deleted_count=3,
+    )
+    return mongo_client
+
+
+@mark.unit_test
+def test_bulk_writer_sends_mixed_operations_on_exit(mock_mongo_client):
+    with MongoBulkWriter(mock_mongo_client, "accounts") as writer:
+        writer.insert({"user": "alice"})
+        writer.update_one({"user": "bob"}, {"$set": {"age": 3}})
+        writer.update_many({"team": "qa"}, {"$set": {"active": True}}, upsert=True)
+        writer.upsert({"user": "carol"}, {"user": "carol", "age": 4})
+        writer.replace_one({"user": "dave"}, {"user": "dave"})
+        writer.delete_one({"user": "erin"})
+        writer.delete_many({"expired": True})
+        mock_mongo_client.bulk_write.assert_not_called()
+        assert writer.pending == 7
+
+    mock_mongo_client.bulk_write.assert_called_once_with(
+        "accounts",
+        [
+            InsertOne({"user": "alice"}),
+            UpdateOne({"user": "bob"}, {"$set": {"age": 3}}, upsert=False),
+            UpdateMany({"team": "qa"}, {"$set": {"active": True}}, upsert=True),
+            UpdateOne(
+                {"user": "carol"}, {"$set": {"user": "carol", "age": 4}}, upsert=True
+            ),
+            ReplaceOne({"user": "dave"}, {"user": "dave"}, upsert=False),
+            DeleteOne({"user": "erin"}),
+            DeleteMany({"expired": True}),
+        ],
+        ordered=False,
+    )
+    assert writer.pending == 0
+    assert len(writer.results) == 1
+    batch = writer.results[0]
+    assert batch.operations == 7
+    assert batch.bytes > 0
+    assert batch.seconds >= 0
+    assert (batch.inserted_count, batch.modified_count, batch.deleted_count) == (
+        1,
+        2,
+        3,
+    )
+
+
+@mark.unit_test
+def test_bulk_writer_flushes_count_bounded_batches(mock_mongo_client):
+    writer = MongoBulkWriter(
+        mock_mongo_client, "accounts", ordered=True, max_operations=2
+    )
+
+    for user in range(5):
+        writer.insert({"user": user})
+
+    assert mock_mongo_client.bulk_write.call_count == 2
+    assert writer.pending == 1
+    writer.flush()
+    assert [batch.operations for batch in writer.results] == [2, 2, 1]
+    assert all(
+        call.kwargs["ordered"] for call in mock_mongo_client.bulk_write.call_args_list
+    )
+    assert writer.flush() is None
+
+
+@mark.unit_test
+def test_bulk_writer_flushes_size_bounded_batches(mock_mongo_client):
+    writer = MongoBulkWriter(mock_mongo_client, "accounts", max_bytes=1000)
+
+    for _ in range(3):
+        writer.insert({"payload": "x" * 400})
+
+    mock_mongo_client.bulk_write.assert_called_once()
+    assert len(mock_mongo_client.bulk_write.call_args.args[1]) == 2
+    assert writer.pending == 1
+
+
+@mark.unit_test
+def test_bulk_writer_discards_operations_when_block_fails(mock_mongo_client):
+    writer = MongoBulkWriter(mock_mongo_client, "accounts")
+
+    def seed():
+        with writer:
+            writer.insert({"user": "alice"})
+            raise RuntimeError("seeding failed")
+
+    with raises(RuntimeError):
+        seed()
+
+    assert writer.results == []
+    mock_mongo_client.bulk_write.assert_not_called()
+
+
+@mark.unit_test
+def test_bulk_writer_rejects_invalid_batch_bounds(mock_mongo_client):
+    with raises(ValueError):
+        MongoBulkWriter(mock_mongo_client, "accounts", max_operations=0)
+
+
+@mark.unit_test
+def test_mongo_utility_bulk_writer():
+    mongo_util = MongoUtility("mongodb://localhost:27017/testdb")
+
+    writer = mongo_util.bulk_writer("accounts", ordered=True, max_operations=10)
+
+    assert writer.mongo_client is mongo_util
+    assert (writer.collection_name, writer.ordered, writer.max_operations) == (
+        "accounts",
+        True,
+        10,
+    )
@@ -0,0 +1,159 @@
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+from pytest import fixture, mark, raises
+
+from uaf.utilities.database.mongo_read_cache import MongoReadCache
+from uaf.utilities.database.mongo_utils import MongoUtility
+
+
+@fixture
+def mock_collection():
+    with patch("uaf.utilities.database.mongo_utils.MongoClient") as mock_client:
+        collection = MagicMock()
+        database = mock_client.return_value.get_default_database.return_value
+        database.__getitem__.return_value = collection
+        yield collection
+
+
+@mark.unit_test
+def test_read_cache_serves_copies_until_ttl():
+    cache = MongoReadCache(ttl_seconds=10)
+    load = MagicMock(return_value={"user": "alice", "roles": ["admin"]})
+    key = cache.key("accounts", {"user": "alice"}, None)
+
+    with patch(
+        "uaf.utilities.database.mongo_read_cache.time.monotonic",
+        side_effect=[0, 5, 11],
+    ):
+        first = cache.get_or_load(key, load)
+        first["roles"].append("mutated")
+        assert cache.get_or_load(key, load) == {"user": "alice", "roles": ["admin"]}
+        cache.get_or_load(key, load)
+
+    assert load.call_count == 2
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 2,
+        "evictions": 0,
+        "invalidations": 0,
+        "entries": 1,
+    }
+
+
+@mark.unit_test
+def test_read_cache_caches_missing_documents():
+    cache = MongoReadCache()
+    load = MagicMock(return_value=None)
+    key = cache.key("accounts", {"user": "nobody"}, None)
+
+    assert cache.get_or_load(key, load) is None
+    assert cache.get_or_load(key, load) is None
+    load.assert_called_once()
+
+
+@mark.unit_test
+def test_read_cache_evicts_least_recently_used():
+    cache = MongoReadCache(max_entries=2)
+    keys = [cache.key("accounts", {"user": user}, None) for user in "abc"]
+
+    cache.get_or_load(keys[0], lambda: "a")
+    cache.get_or_load(keys[1], lambda: "b")
+    cache.get_or_load(keys[0], lambda: "reloaded")
+    cache.get_or_load(keys[2], lambda: "c")
+
+    assert cache.get_or_load(keys[0], lambda: "reloaded") == "a"
+    assert cache.get_or_load(keys[1], lambda: "reloaded") == "reloaded"
+    assert cache.stats()["evictions"] == 2
+
+
+@mark.unit_test
+def test_read_cache_key_covers_collection_filter_and_projection():
+    key = MongoReadCache.key
+    session_id = uuid4()
+
+    assert key("accounts", {"id": session_id}, None) == key(
+        "accounts", {"id": session_id}, None
+    )
+    assert key("accounts", {"id": 1}, None) != key("catalogue", {"id": 1}, None)
+    assert key("accounts", {"id": 1}, None) != key("accounts", {"id": 2}, None)
+    assert key("accounts", {"id": 1}, None) != key("accounts", {"id": 1}, ["name"])
+
+
+@mark.unit_test
+def test_read_cache_invalidate_by_collection():
+    cache = MongoReadCache()
+    accounts = cache.key("accounts", {}, None)
+    catalogue = cache.key("catalogue", {}, None)
+    cache.get_or_load(accounts, lambda: "account")
+    cache.get_or_load(catalogue, lambda: "product")
+
+    cache.invalidate("accounts")
+
+    assert cache.get_or_load(accounts, lambda: "reloaded") == "reloaded"
+    assert cache.get_or_load(catalogue, lambda: "reloaded") == "product"
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 3
+
+
+@mark.unit_test
+def test_read_cache_does_not_keep_load_racing_with_write():
+    cache = MongoReadCache()
+    key = cache.key("accounts", {}, None)
+
+    def load():
+        cache.invalidate("accounts")
+        return "stale"
+
+    assert cache.get_or_load(key, load) == "stale"
+    assert cache.get_or_load(key, lambda: "fresh") == "fresh"
+
+
+@mark.unit_test
+def test_read_cache_rejects_invalid_settings():
+    with raises(ValueError):
+        MongoReadCache(max_entries=0)
+
+
+@mark.unit_test
+def test_mongo_utility_find_one_through_cache(mock_collection):
+    cache = MongoReadCache()
+    mongo_util = MongoUtility("mongodb://localhost:27017/testdb", cache=cache)
+    mongo_util.connect()
+    mock_collection.find_one.return_value = {"user": "alice"}
+
+    for _ in range(3):
+        assert mongo_util.find_one("accounts", {"user": "alice"}, ["user"]) == {
+            "user": "alice"
+        }
+    mongo_util.find_one("accounts", {"user": "alice"}, sort=[("user", 1)])
+
+    assert mock_collection.find_one.call_count == 2
+    assert cache.stats()["hits"] == 2
+
+
+@mark.unit_test
+def test_mongo_utility_writes_invalidate_cache(mock_collection):
+    cache = MongoReadCache()
+    mongo_util = MongoUtility("mongodb://localhost:27017/testdb", cache=cache)
+    mongo_util.connect()
+    mock_collection.find_one.return_value = {"user": "alice"}
+    mock_collection.aggregate.return_value = []
+
+    writes = [
+        lambda: mongo_util.insert_one("accounts", {"user": "bob"}),
+        lambda: mongo_util.update_one("accounts", {}, {"$set": {"a": 1}}),
+        lambda: mongo_util.update_many("accounts", {}, {"$set": {"a": 1}}),
+        lambda: mongo_util.upsert_many("accounts", [{"user": "bob"}], ["user"]),
+        lambda: mongo_util.find_one_and_update("accounts", {}, {"$set": {"a": 1}}),
+        lambda: mongo_util.delete_one("accounts", {}),
+        lambda: mongo_util.delete_many("accounts", {}),
+        lambda: mongo_util.aggregate("sessions", [{"$merge": {"into": "accounts"}}]),
+    ]
+    for write in writes:
+        mongo_util.find_one("accounts", {"user": "alice"})
+        write()
+
+    assert cache.stats()["invalidations"] == len(writes)
+    assert mock_collection.find_one.call_count == len(writes)
@@ -1,7 +1,7 @@
 import os
 import tempfile
 import yaml
-from pytest import mark, fixture
+from pytest import mark, fixture, raises
 from uaf.utilities.parser.yaml_parser_utils import YamlParser
 
 
@@ -40,6 +40,16 @@ def test_get_value(temp_yaml_file):
     assert parser.get_value("section1", "key1") == "value1"
 
 
+@mark.unit_test
+def test_get_value_default(temp_yaml_file):
+    parser = YamlParser(temp_yaml_file)
+    assert parser.get_value("section1", "missing_key", 42) == 42
+    assert parser.get_value("missing_section", "key1", None) is None
+    assert parser.get_value("section1", "key1", "fallback") == "value1"
+    with raises(ValueError):
+        parser.get_value("section1", "missing_key")
+
+
 @mark.unit_test
 def test_set_value(temp_yaml_file):
     parser = YamlParser(temp_yaml_file)
@@ -13,4 +13,6 @@ def get_celery_app():
         broker=config.get_value("celery", "broker_url"),
         backend=config.get_value("celery", "result_backend"),
     )
+    # serializers, worker and retry settings live in the top level celeryconfig module
+    celery_app.config_from_object("celeryconfig", silent=True)
     return celery_app
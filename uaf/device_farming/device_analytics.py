@@ -0,0 +1,255 @@
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import Any
+
+from uaf.device_farming.device_utilization import HOUR_MILLISECONDS, truncate_to_hour
+from uaf.utilities.database.mongo_utils import MongoUtility
+
+GROUP_BY_FIELDS = ("device_id", "device_os")
+
+
+class DeviceFarmAnalytics:
+    """Per device or per os statistics of the device farm, computed on the server
+
+    Every metric is a single aggregation pipeline, so only one document per device/os is sent
+    back to the caller whatever the number of sessions. Results are cached for cache_seconds
+    to keep dashboards refreshing every few seconds from re-running the pipelines.
+
+    Metrics:
+        - utilization: share of the window the device was in use, from the hourly rollup, idle
+          devices included
+        - devices, idle_devices: devices of the group and those without any use in the window
+        - sessions, mean_session_seconds: ended sessions and their mean length
+        - mean_queue_wait_seconds, max_queue_wait_seconds: time spent waiting for the device
+        - failure_rate: share of sessions that did not end with a release, ex: reaped leases
+    """
+
+    def __init__(
+        self,
+        mongo_client: MongoUtility,
+        session_collection: str,
+        utilization_collection: str,
+        device_collection: str,
+        cache_seconds: float = 60,
+    ) -> None:
+        """Constructor
+
+        Args:
+            mongo_client (MongoUtility): connected mongo utility
+            session_collection (str): device session collection name
+            utilization_collection (str): hourly utilization collection name
+            device_collection (str): device stats collection name, lists the devices of the farm
+            cache_seconds (float, optional): seconds a result is served from cache, 0 disables caching. Defaults to 60.
+        """
+        self.mongo_client = mongo_client
+        self.session_collection = session_collection
+        self.utilization_collection = utilization_collection
+        self.device_collection = device_collection
+        self.cache_seconds = cache_seconds
+        self._cache: dict[tuple[Any, ...], tuple[float, list[dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _validate_group_by(group_by: str):
+        if group_by not in GROUP_BY_FIELDS:
+            raise ValueError(f"Unsupported group_by '{group_by}'!! - {GROUP_BY_FIELDS}")
+
+    def _cached(
+        self, key: tuple[Any, ...], compute: Callable[[], list[dict[str, Any]]]
+    ) -> list[dict[str, Any]]:
+        """Serves a result from cache or computes and caches it
+
+        Args:
+            key (tuple[Any, ...]): cache key
+            compute (Callable[[], list[dict[str, Any]]]): computes the result on a miss
+
+        Returns:
+            list[dict[str, Any]]: result
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                return cached[1]
+        result: list[dict[str, Any]] = compute()
+        if self.cache_seconds > 0:
+            with self._lock:
+                self._cache[key] = (now + self.cache_seconds, result)
+        return result
+
+    def clear_cache(self):
+        """Drops every cached result"""
+        with self._lock:
+            self._cache.clear()
+
+    def session_stats(
+        self, group_by: str = "device_id", hours: int = 24
+    ) -> list[dict[str, Any]]:
+        """Computes session count, mean session length, queue wait and failure rate
+
+        Args:
+            group_by (str, optional): device_id or device_os. Defaults to "device_id".
+            hours (int, optional): only sessions ended in the last hours are considered. Defaults to 24.
+
+        Raises:
+            ValueError: if group_by is not supported
+
+        Returns:
+            list[dict[str, Any]]: one document per device/os, most failing first
+        """
+        self._validate_group_by(group_by)
+
+        def compute():
+            since = datetime.utcnow() - timedelta(hours=hours)
+            return self.mongo_client.aggregate(
+                self.session_collection,
+                [
+                    {"$match": {"end_time": {"$gte": since}}},
+                    {
+                        "$group": {
+                            "_id": f"${group_by}",
+                            "sessions": {"$sum": 1},
+                            "mean_session_milliseconds": {
+                                "$avg": {"$subtract": ["$end_time", "$start_time"]}
+                            },
+                            "mean_queue_wait_seconds": {"$avg": "$queue_wait_seconds"},
+                            "max_queue_wait_seconds": {"$max": "$queue_wait_seconds"},
+                            "failures": {
+                                "$sum": {
+                                    "$cond": [{"$ifNull": ["$end_reason", False]}, 1, 0]
+                                }
+                            },
+                        }
+                    },
+                    {
+                        "$project": {
+                            "_id": False,
+                            group_by: "$_id",
+                            "sessions": True,
+                            "mean_session_seconds": {
+                                "$divide": ["$mean_session_milliseconds", 1000]
+                            },
+                            "mean_queue_wait_seconds": True,
+                            "max_queue_wait_seconds": True,
+                            "failure_rate": {"$divide": ["$failures", "$sessions"]},
+                        }
+                    },
+                    {"$sort": {"failure_rate": -1, group_by: 1}},
+                ],
+            )
+
+        return self._cached(("session_stats", group_by, hours), compute)
+
+    def utilization(
+        self, group_by: str = "device_id", hours: int = 24
+    ) -> list[dict[str, Any]]:
+        """Computes the share of the last complete hours each device/os was in use
+
+        Reads the hourly rollup maintained by rollup_device_utilization, so the current,
+        incomplete hour is not included. Every device of device_stats is joined with its
+        rollup, so idle devices are listed with a utilization of 0 and, for an os, utilization
+        is the busy time of its devices divided by the time of all of them, idle ones included.
+
+        Args:
+            group_by (str, optional): device_id or device_os. Defaults to "device_id".
+            hours (int, optional): number of complete hours considered. Defaults to 24.
+
+        Raises:
+            ValueError: if group_by is not supported
+
+        Returns:
+            list[dict[str, Any]]: one document per device/os, hottest first
+        """
+        self._validate_group_by(group_by)
+
+        def compute():
+            until = truncate_to_hour(datetime.utcnow())
+            since = until - timedelta(hours=hours)
+            return self.mongo_client.aggregate(
+                self.device_collection,
+                [
+                    {"$project": {"_id": False, "device_id": True, "device_os": True}},
+                    {
+                        # served by the device_id + hour index of the rollup
+                        "$lookup": {
+                            "from": self.utilization_collection,
+                            "localField": "device_id",
+                            "foreignField": "device_id",
+                            "pipeline": [
+                                {"$match": {"hour": {"$gte": since, "$lt": until}}},
+                                {
+                                    "$group": {
+                                        "_id": None,
+                                        "busy_seconds": {"$sum": "$busy_seconds"},
+                                    }
+                                },
+                            ],
+                            "as": "usage",
+                        }
+                    },
+                    {
+                        "$group": {
+                            "_id": f"${group_by}",
+                            "busy_seconds": {"$sum": {"$sum": "$usage.busy_seconds"}},
+                            "devices": {"$sum": 1},
+                            "idle_devices": {
+                                "$sum": {"$cond": [{"$eq": ["$usage", []]}, 1, 0]}
+                            },
+                        }
+                    },
+                    {
+                        "$project": {
+                            "_id": False,
+                            group_by: "$_id",
+                            "busy_seconds": True,
+                            "devices": True,
+                            "idle_devices": True,
+                            "utilization": {
+                                "$divide": [
+                                    "$busy_seconds",
+                                    {
+                                        "$multiply": [
+                                            "$devices",
+                                            hours * HOUR_MILLISECONDS / 1000,
+                                        ]
+                                    },
+                                ]
+                            },
+                        }
+                    },
+                    {"$sort": {"utilization": -1, group_by: 1}},
+                ],
+            )
+
+        return self._cached(("utilization", group_by, hours), compute)
+
+    def report(
+        self, group_by: str = "device_id", hours: int = 24
+    ) -> list[dict[str, Any]]:
+        """Combines utilization and session statistics, ex: to spot hot, idle or flaky devices
+
+        Every device is listed, devices without any session in the window have a utilization of
+        0 and no session statistics.
+
+        Args:
+            group_by (str, optional): device_id or device_os. Defaults to "device_id".
+            hours (int, optional): number of hours considered. Defaults to 24.
+
+        Raises:
+            ValueError: if group_by is not supported
+
+        Returns:
+            list[dict[str, Any]]: one document per device/os, hottest first
+        """
+        report: dict[Any, dict[str, Any]] = {}
+        for document in self.utilization(group_by, hours) + self.session_stats(
+            group_by, hours
+        ):
+            report.setdefault(document[group_by], {}).update(document)
+        return sorted(
+            report.values(),
+            key=lambda document: document.get("utilization", 0),
+            reverse=True,
+        )
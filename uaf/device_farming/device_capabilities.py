@@ -0,0 +1,132 @@
+from collections.abc import Callable
+from typing import Any
+
+from pymongo import UpdateOne
+
+from uaf.decorators.loggers import _logger as logger
+from uaf.enums.device_status import DeviceStatus
+from uaf.enums.mobile_device_environment_type import MobileDeviceEnvironmentType
+from uaf.enums.mobile_os import MobileOs
+from uaf.utilities.database.mongo_utils import MongoUtility
+from uaf.utilities.ui.appium_core.appium_core_utils import CoreUtils
+
+SUPPORTED_CAPABILITIES = (
+    "device_type",
+    "os_version",
+    "min_os_major_version",
+    "screen_size",
+    "installed_app",
+)
+
+
+def build_capability_query(capabilities: dict[str, Any] | None) -> dict[str, Any]:
+    """Translates a capability request into a device_stats filter
+
+    Ex: build_capability_query({"min_os_major_version": 13, "installed_app": "com.amazon.mShop.android.shopping"})
+        => {"os_major_version": {"$gte": 13}, "installed_apps.package": "com.amazon.mShop.android.shopping"}
+
+    Args:
+        capabilities (dict[str, Any] | None): requested capabilities, see SUPPORTED_CAPABILITIES
+
+    Raises:
+        ValueError: if an unsupported capability is requested
+
+    Returns:
+        dict[str, Any]: filter query
+    """
+    query: dict[str, Any] = {}
+    for name, value in (capabilities or {}).items():
+        match name:
+            case "device_type":
+                query["device_type"] = (
+                    value.value
+                    if isinstance(value, MobileDeviceEnvironmentType)
+                    else value
+                )
+            case "os_version" | "screen_size":
+                query[name] = str(value)
+            case "min_os_major_version":
+                query["os_major_version"] = {"$gte": int(value)}
+            case "installed_app":
+                query["installed_apps.package"] = value
+            case _:
+                raise ValueError(
+                    f"Unsupported device capability '{name}'!! - {SUPPORTED_CAPABILITIES}"
+                )
+    return query
+
+
+def fetch_device_attributes(device_id: str, mobile_os: MobileOs) -> dict[str, Any]:
+    """Fetches the attributes capability queries match on for a connected device
+
+    Args:
+        device_id (str): unique device id
+        mobile_os (MobileOs): mobile os of the device
+
+    Returns:
+        dict[str, Any]: device attributes, empty if the device could not be inspected
+    """
+    try:
+        match mobile_os:
+            case MobileOs.ANDROID:
+                attributes = CoreUtils.fetch_android_device_attributes(device_id)
+            case MobileOs.IOS:
+                attributes = CoreUtils.fetch_ios_device_attributes(device_id)
+            case _:
+                return {}
+    except Exception as e:
+        logger.warning(f"Failed to fetch attributes of device {device_id}: {e}")
+        return {}
+    major_version = attributes.get("os_version", "").split(".")[0]
+    if major_version.isdigit():
+        attributes["os_major_version"] = int(major_version)
+    return attributes
+
+
+def stale_attributes_query() -> dict[str, Any]:
+    """Filter of the released devices whose attributes have to be inspected again
+
+    release_device and the lease reaper flag every device they terminate, as the session may
+    have installed or removed apps.
+
+    Returns:
+        dict[str, Any]: filter query
+    """
+    return {"status": DeviceStatus.TERMINATED.value, "attributes_stale": True}
+
+
+def refresh_device_attributes(
+    mongo_client: MongoUtility,
+    collection_name: str,
+    devices: list[dict[str, Any]],
+    fetch_attributes: Callable[
+        [str, MobileOs], dict[str, Any]
+    ] = fetch_device_attributes,
+) -> int:
+    """Inspects devices again and stores their attributes in a single bulk write
+
+    Devices which could not be inspected keep their stale flag and are retried on the next call.
+
+    Args:
+        mongo_client (MongoUtility): connected mongo utility
+        collection_name (str): device stats collection name
+        devices (list[dict[str, Any]]): device_id and device_os of the devices to inspect, they have to be connected to this host
+        fetch_attributes (Callable[[str, MobileOs], dict[str, Any]], optional): inspects a device. Defaults to fetch_device_attributes.
+
+    Returns:
+        int: number of refreshed devices
+    """
+    requests = []
+    for device in devices:
+        attributes = fetch_attributes(
+            device["device_id"], MobileOs(device["device_os"])
+        )
+        if attributes:
+            requests.append(
+                UpdateOne(
+                    {"device_id": device["device_id"]},
+                    {"$set": attributes, "$unset": {"attributes_stale": ""}},
+                )
+            )
+    mongo_client.bulk_write(collection_name, requests)
+    return len(requests)
@@ -0,0 +1,447 @@
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from typing import IO, Any, NamedTuple
+
+from uaf.decorators.loggers import _logger as logger
+from uaf.device_farming.device_capabilities import (
+    fetch_device_attributes,
+    refresh_device_attributes,
+    stale_attributes_query,
+)
+from uaf.device_farming.device_hosts import (
+    DeviceHostRegistry,
+    local_appium_url,
+    local_host_id,
+)
+from uaf.enums.device_status import DeviceStatus
+from uaf.enums.mobile_device_environment_type import MobileDeviceEnvironmentType
+from uaf.enums.mobile_os import MobileOs
+from uaf.utilities.database.mongo_utils import MongoUtility
+
+from . import FilePaths, YamlParser
+
+
+class DeviceEvent(NamedTuple):
+    """A device being plugged in (connected=True) or unplugged (connected=False)"""
+
+    device_id: str
+    mobile_os: MobileOs
+    connected: bool
+
+
+def read_track_devices_frames(stream: IO[bytes]) -> Iterator[set[str]]:
+    """Parses the output of `adb track-devices` into snapshots of ready physical devices
+
+    adb writes one frame every time the device list changes: 4 hex digits holding the
+    payload length followed by `<serial>\\t<state>\\n` lines for every attached device.
+
+    Args:
+        stream (IO[bytes]): stdout of the adb track-devices process
+
+    Yields:
+        set[str]: ids of physical devices in `device` state, i.e. authorised and ready
+    """
+    while True:
+        header = stream.read(4)
+        if len(header) < 4:
+            return
+        payload = stream.read(int(header, 16)).decode("utf-8")
+        snapshot = set()
+        for line in payload.splitlines():
+            serial, _, state = line.partition("\t")
+            if state.strip() == "device" and "emulator" not in serial:
+                snapshot.add(serial)
+        yield snapshot
+
+
+class DeviceTracker(ABC):
+    """Turns a source of connected-device snapshots into add/remove events"""
+
+    mobile_os: MobileOs
+
+    def __init__(self) -> None:
+        self._stop_event = threading.Event()
+
+    @abstractmethod
+    def snapshots(self) -> Iterator[set[str]]:
+        """Yields the complete set of connected device ids every time it may have changed"""
+        pass
+
+    def events(self, known_devices: set[str]) -> Iterator[DeviceEvent]:
+        """Yields incremental events by diffing consecutive snapshots
+
+        Args:
+            known_devices (set[str]): devices believed to be connected before tracking started
+
+        Yields:
+            DeviceEvent: device added/removed event
+        """
+        current = set(known_devices)
+        for snapshot in self.snapshots():
+            for device_id in sorted(snapshot - current):
+                yield DeviceEvent(device_id, self.mobile_os, True)
+            for device_id in sorted(current - snapshot):
+                yield DeviceEvent(device_id, self.mobile_os, False)
+            current = snapshot
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def stop(self):
+        """Stops tracking, the snapshots generator returns as soon as possible"""
+        self._stop_event.set()
+
+
+class AndroidDeviceTracker(DeviceTracker):
+    """Streams android device changes from a long running `adb track-devices` process"""
+
+    mobile_os = MobileOs.ANDROID
+
+    def __init__(self, adb_executable: str = "adb") -> None:
+        """Constructor
+
+        Args:
+            adb_executable (str, optional): adb binary to run. Defaults to "adb".
+        """
+        super().__init__()
+        self.adb_executable = adb_executable
+        self._process: subprocess.Popen[bytes] | None = None
+
+    def snapshots(self) -> Iterator[set[str]]:
+        self._process = subprocess.Popen(
+            [self.adb_executable, "track-devices"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            if self._process.stdout is not None:
+                for snapshot in read_track_devices_frames(self._process.stdout):
+                    if self.stopped:
+                        return
+                    yield snapshot
+        finally:
+            self._terminate()
+
+    def stop(self):
+        super().stop()
+        self._terminate()
+
+    def _terminate(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            self._process.wait()
+
+
+class IosDeviceTracker(DeviceTracker):
+    """Tracks ios device changes with `idevice_id -l`
+
+    libimobiledevice has no streaming equivalent of adb track-devices, so the list is
+    polled on a short interval and diffed like any other snapshot source.
+    """
+
+    mobile_os = MobileOs.IOS
+
+    def __init__(
+        self, idevice_id_executable: str = "idevice_id", poll_interval: float = 2.0
+    ) -> None:
+        """Constructor
+
+        Args:
+            idevice_id_executable (str, optional): idevice_id binary to run. Defaults to "idevice_id".
+            poll_interval (float, optional): seconds between two polls. Defaults to 2.0.
+        """
+        super().__init__()
+        self.idevice_id_executable = idevice_id_executable
+        self.poll_interval = poll_interval
+
+    def snapshots(self) -> Iterator[set[str]]:
+        while not self.stopped:
+            output = subprocess.check_output([self.idevice_id_executable, "-l"])
+            yield {line for line in output.decode("utf-8").split() if line}
+            self._stop_event.wait(self.poll_interval)
+
+
+class DeviceDiscoveryDaemon:
+    """Keeps the device_stats collection in sync with the devices attached to this host
+
+    Each tracker runs in its own thread and every add/remove event is written to mongodb
+    as soon as it is observed. A tracker whose source dies (ex: adb server restart) is
+    restarted after restart_delay seconds.
+
+    With a host_id the daemon is the agent of one machine of a multi host farm: its devices
+    are tagged with the host_id and appium_url so sessions are routed to this machine, and
+    the host is kept registered in the host registry while the daemon runs.
+    """
+
+    def __init__(
+        self,
+        mongo_client: MongoUtility,
+        collection_name: str,
+        trackers: list[DeviceTracker],
+        restart_delay: float = 5.0,
+        fetch_attributes: Callable[
+            [str, MobileOs], dict[str, Any]
+        ] = fetch_device_attributes,
+        host_id: str | None = None,
+        appium_url: str | None = None,
+        host_registry: DeviceHostRegistry | None = None,
+    ) -> None:
+        """Constructor
+
+        Args:
+            mongo_client (MongoUtility): connected mongo utility
+            collection_name (str): device stats collection name
+            trackers (list[DeviceTracker]): device trackers to consume
+            restart_delay (float, optional): seconds to wait before restarting a tracker. Defaults to 5.0.
+            fetch_attributes (Callable[[str, MobileOs], dict[str, Any]], optional): inspects a newly connected device. Defaults to fetch_device_attributes.
+            host_id (str | None, optional): id of this machine in a multi host farm. Defaults to None.
+            appium_url (str | None, optional): appium server of this machine sessions are routed to. Defaults to None.
+            host_registry (DeviceHostRegistry | None, optional): registry this machine heartbeats to. Defaults to None.
+        """
+        self.mongo_client = mongo_client
+        self.collection_name = collection_name
+        self.trackers = trackers
+        self.restart_delay = restart_delay
+        self.fetch_attributes = fetch_attributes
+        self.host_id = host_id
+        self.appium_url = appium_url
+        self.host_registry = host_registry
+        self._stop_event = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self):
+        """Starts consuming every tracker in a background thread"""
+        if self.host_registry is not None and self.host_id is not None:
+            self.host_registry.register(self.host_id, self.appium_url)
+            thread = threading.Thread(
+                target=self._heartbeat, name="device-host-heartbeat", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        for tracker in self.trackers:
+            thread = threading.Thread(
+                target=self._consume,
+                args=(tracker,),
+                name=f"device-discovery-{tracker.mobile_os.value}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self, timeout: float | None = None):
+        """Waits for the tracker threads to finish"""
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stop(self):
+        """Stops every tracker and waits for the threads to finish"""
+        self._stop_event.set()
+        for tracker in self.trackers:
+            tracker.stop()
+        self.join()
+        if self.host_registry is not None and self.host_id is not None:
+            self.host_registry.unregister(self.host_id)
+
+    def _host_filter(self) -> dict[str, str]:
+        """Restricts device updates to this machine's devices in a multi host farm"""
+        return {} if self.host_id is None else {"host_id": self.host_id}
+
+    def known_devices(self, mobile_os: MobileOs) -> set[str]:
+        """Fetches the devices of given os which are currently believed to be connected
+
+        Args:
+            mobile_os (MobileOs): mobile os
+
+        Returns:
+            set[str]: device ids
+        """
+        return {
+            device["device_id"]
+            for device in self.mongo_client.find_many(
+                self.collection_name,
+                {
+                    **self._host_filter(),
+                    "device_os": mobile_os.value,
+                    "status": {"$ne": DeviceStatus.DISCONNECTED.value},
+                },
+                projection={"device_id": True},
+            )
+        }
+
+    def apply(self, event: DeviceEvent):
+        """Writes a device event to the database
+
+        A connected device is inserted as available, or made available again if it was
+        marked disconnected, and its attributes (os version, screen size, installed apps)
+        are refreshed for capability matching. In a multi host farm the device is (re)assigned
+        to this host and only this host may mark it disconnected. A disconnected device is marked as such unless a session is
+        using it, in which case it is only flagged as not connected so check_device marks it
+        disconnected once released instead of handing it to the next test.
+
+        Args:
+            event (DeviceEvent): device event
+        """
+        logger.info(
+            f"Device {event.device_id} ({event.mobile_os.value}) "
+            f"{'connected' if event.connected else 'disconnected'}"
+        )
+        if event.connected:
+            update: dict[str, Any] = {
+                "$setOnInsert": {
+                    "device_type": MobileDeviceEnvironmentType.PHYSICAL.value,
+                    "device_os": event.mobile_os.value,
+                    "status": DeviceStatus.AVAILABLE.value,
+                }
+            }
+            attributes = self.fetch_attributes(event.device_id, event.mobile_os)
+            if self.host_id is not None:
+                attributes.update(host_id=self.host_id, appium_url=self.appium_url)
+            update["$set"] = {**attributes, "connected": True}
+            if attributes:
+                update["$unset"] = {"attributes_stale": ""}
+            self.mongo_client.update_one(
+                self.collection_name,
+                {"device_id": event.device_id},
+                update,
+                upsert=True,
+            )
+            self.mongo_client.update_one(
+                self.collection_name,
+                {
+                    "device_id": event.device_id,
+                    "status": DeviceStatus.DISCONNECTED.value,
+                },
+                {"$set": {"status": DeviceStatus.AVAILABLE.value}},
+            )
+        else:
+            result = self.mongo_client.update_one(
+                self.collection_name,
+                {
+                    **self._host_filter(),
+                    "device_id": event.device_id,
+                    "status": {"$ne": DeviceStatus.IN_USE.value},
+                },
+                {
+                    "$set": {
+                        "status": DeviceStatus.DISCONNECTED.value,
+                        "connected": False,
+                    }
+                },
+            )
+            if result.matched_count == 0:
+                self.mongo_client.update_one(
+                    self.collection_name,
+                    {
+                        **self._host_filter(),
+                        "device_id": event.device_id,
+                        "status": DeviceStatus.IN_USE.value,
+                    },
+                    {"$set": {"connected": False}},
+                )
+
+    def refresh_attributes(self) -> int:
+        """Inspects the devices of this host released since their attributes were last fetched
+
+        In a multi host farm the workers cannot reach the devices of other machines, so every
+        agent refreshes its own devices, ex: apps installed by the last session.
+
+        Returns:
+            int: number of refreshed devices
+        """
+        return refresh_device_attributes(
+            self.mongo_client,
+            self.collection_name,
+            self.mongo_client.find_many(
+                self.collection_name,
+                {
+                    **self._host_filter(),
+                    **stale_attributes_query(),
+                    "connected": {"$ne": False},
+                },
+                projection={"device_id": True, "device_os": True},
+            ),
+            self.fetch_attributes,
+        )
+
+    def _heartbeat(self):
+        if self.host_registry is None or self.host_id is None:
+            return
+        interval = self.host_registry.stale_after_seconds / 3
+        while not self._stop_event.wait(interval):
+            try:
+                self.host_registry.register(self.host_id, self.appium_url)
+            except Exception as e:
+                logger.warning(f"Failed to send heartbeat of host {self.host_id}: {e}")
+            try:
+                self.refresh_attributes()
+            except Exception as e:
+                logger.warning(f"Failed to refresh attributes of host devices: {e}")
+
+    def _consume(self, tracker: DeviceTracker):
+        while not self._stop_event.is_set():
+            try:
+                for event in tracker.events(self.known_devices(tracker.mobile_os)):
+                    self.apply(event)
+            except Exception as e:
+                logger.error(f"{tracker.mobile_os.value} device tracker failed: {e}")
+            if not self._stop_event.wait(self.restart_delay):
+                logger.info(f"Restarting {tracker.mobile_os.value} device tracker")
+
+
+def default_trackers() -> list[DeviceTracker]:
+    """Trackers for the device types that can be attached to the current platform
+
+    Returns:
+        list[DeviceTracker]: device trackers
+    """
+    from platform import system
+
+    trackers: list[DeviceTracker] = [AndroidDeviceTracker()]
+    if system().lower().__eq__("darwin"):
+        trackers.append(IosDeviceTracker())
+    return trackers
+
+
+def main():
+    """Runs the discovery daemon in the foreground until interrupted
+
+    When device_farm.host_id is set the daemon is the host agent of this machine: devices are
+    tagged with the host id and, when device_farm.appium_url is set, sessions on them are
+    routed to that appium server. Without it the devices are left untagged, as in a single host farm.
+
+    Ex: python -m uaf.device_farming.device_discovery
+    """
+    config = YamlParser(FilePaths.COMMON)
+    host_id = local_host_id(config)
+    with MongoUtility(
+        config.get_value("mongodb", "connection_string"), shared=True
+    ) as mongo:
+        daemon = DeviceDiscoveryDaemon(
+            mongo,
+            config.get_value("mongodb", "device_stat_collection"),
+            default_trackers(),
+            host_id=host_id,
+            appium_url=local_appium_url(config),
+            host_registry=(
+                None
+                if host_id is None
+                else DeviceHostRegistry(
+                    mongo,
+                    config.get_value(
+                        "mongodb", "device_host_collection", "device_hosts"
+                    ),
+                )
+            ),
+        )
+        daemon.start()
+        try:
+            daemon.join()
+        except KeyboardInterrupt:
+            daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
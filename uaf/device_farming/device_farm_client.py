@@ -0,0 +1,110 @@
+from typing import Any, NamedTuple, cast
+from uuid import UUID
+
+from uaf.device_farming import device_tasks
+from uaf.enums.device_farm_client_mode import DeviceFarmClientMode
+
+
+class DeviceReservation(NamedTuple):
+    """A reserved device, appium_url is set when the device is served by another host's appium server"""
+
+    device_id: str
+    session_id: UUID
+    appium_url: str | None = None
+
+
+class DeviceFarmClient:
+    """Reserves, renews and releases devices for a test session
+
+    In direct mode the device farm tasks run in the calling process, so a reservation costs
+    a single database round trip instead of a broker and result backend round trip each way.
+    The task bodies are invoked through Task.run, which unlike calling the task object does not
+    push onto celery's request stack and is therefore safe to use from several threads once the
+    tasks are bound, which the constructor takes care of.
+    The reservation semantics (atomic claim, FIFO queue, lease) are the same in both modes as
+    both end up in the same task functions. Celery mode keeps the mongodb credentials on the
+    workers only, ex: when tests run on machines that cannot reach the database.
+    """
+
+    def __init__(self, mode: DeviceFarmClientMode | None = None) -> None:
+        """Constructor
+
+        Args:
+            mode (DeviceFarmClientMode | None, optional): how to reach the device farm.
+                Defaults to device_farm.client_mode, falling back to direct.
+        """
+        self.mode = mode or DeviceFarmClientMode(
+            device_tasks.config.get_value(
+                "device_farm", "client_mode", DeviceFarmClientMode.DIRECT.value
+            )
+        )
+        # binding the tasks lazily from concurrent threads can leave one without request stack
+        device_tasks.finalize_tasks()
+
+    def reserve(
+        self,
+        mobile_os: str,
+        capabilities: dict[str, Any] | None = None,
+        preferred_app: str | None = None,
+        max_wait_seconds: float | None = None,
+    ) -> DeviceReservation:
+        """Reserves a device, see device_tasks.reserve_device
+
+        Args:
+            mobile_os (str): mobile os type
+            capabilities (dict[str, Any] | None, optional): capabilities the device has to match. Defaults to None.
+            preferred_app (str | None, optional): app under test, devices having it installed are preferred. Defaults to None.
+            max_wait_seconds (float | None, optional): how long to wait for a device. Defaults to device_farm.reservation_max_wait_seconds.
+
+        Raises:
+            ValueError: if no device became available within max_wait_seconds
+
+        Returns:
+            DeviceReservation: device_id, session id and appium url
+        """
+        kwargs = {
+            "capabilities": capabilities,
+            "preferred_app": preferred_app,
+            "max_wait_seconds": max_wait_seconds,
+            "with_appium_url": True,
+        }
+        if self.mode is DeviceFarmClientMode.DIRECT:
+            reservation = device_tasks.reserve_device.run(mobile_os, **kwargs)
+        else:
+            if max_wait_seconds is None:
+                max_wait_seconds = device_tasks.reservation_max_wait_seconds()
+            # the task queues until a device is free, so wait a little longer than it does
+            reservation = device_tasks.reserve_device.delay(mobile_os, **kwargs).get(
+                timeout=max_wait_seconds + 10
+            )
+        return DeviceReservation(*reservation)
+
+    def renew(self, device_id: str, session_id: UUID) -> bool | None:
+        """Extends the lease of a reserved device, see device_tasks.renew_lease
+
+        Args:
+            device_id (str): unique device id
+            session_id (UUID): unique session id attached to given device id
+
+        Returns:
+            bool | None: False if the lease was already lost, None in celery mode where the renewal is fire and forget
+        """
+        if self.mode is DeviceFarmClientMode.DIRECT:
+            return cast(bool, device_tasks.renew_lease.run(device_id, session_id))
+        device_tasks.renew_lease.delay(device_id, session_id)
+        return None
+
+    def release(self, device_id: str, session_id: UUID, timeout: float = 10):
+        """Releases a reserved device, see device_tasks.release_device
+
+        Args:
+            device_id (str): unique device id
+            session_id (UUID): unique session id attached to given device id
+            timeout (float, optional): seconds to wait for the worker in celery mode. Defaults to 10.
+        """
+        if self.mode is DeviceFarmClientMode.DIRECT:
+            device_tasks.release_device.run(device_id, session_id)
+        else:
+            device_tasks.release_device.delay(device_id, session_id).get(
+                timeout=timeout
+            )
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+from typing import Any, cast
+
+from pymongo import ASCENDING, IndexModel
+
+from uaf.utilities.database.mongo_utils import MongoUtility
+from uaf.utilities.parser.yaml_parser_utils import YamlParser
+
+
+def local_host_id(config: YamlParser) -> str | None:
+    """Fetches the id this machine registers its devices under
+
+    Host agents are only configured in a multi host farm, a single host farm leaves
+    device_farm.host_id unset and its devices untagged.
+
+    Args:
+        config (YamlParser): common config
+
+    Returns:
+        str | None: device_farm.host_id, None if host agents are not configured
+    """
+    return cast(str | None, config.get_value("device_farm", "host_id", None))
+
+
+def local_appium_url(config: YamlParser) -> str | None:
+    """Fetches the appium server url sessions on this machine's devices are routed to
+
+    Args:
+        config (YamlParser): common config
+
+    Returns:
+        str | None: device_farm.appium_url, None to launch appium next to the tests as usual
+    """
+    return cast(str | None, config.get_value("device_farm", "appium_url", None))
+
+
+class DeviceHostRegistry:
+    """Registry of the machines sharing the device farm, ex: one per USB hub
+
+    Every machine runs an agent (the discovery daemon) which registers the machine with its
+    appium endpoint and keeps sending heartbeats. A host missing heartbeats for
+    stale_after_seconds is considered down and its devices are taken out of the pool.
+    """
+
+    def __init__(
+        self,
+        mongo_client: MongoUtility,
+        collection_name: str,
+        stale_after_seconds: float = 60,
+    ) -> None:
+        """Constructor
+
+        Args:
+            mongo_client (MongoUtility): connected mongo utility
+            collection_name (str): host collection name
+            stale_after_seconds (float, optional): seconds without heartbeat after which a host is down. Defaults to 60.
+        """
+        self.mongo_client = mongo_client
+        self.collection_name = collection_name
+        self.stale_after_seconds = stale_after_seconds
+
+    def indexes(self) -> list[IndexModel]:
+        """Indexes backing the registry, hosts gone for long are purged by a TTL index
+
+        Returns:
+            list[IndexModel]: index definitions
+        """
+        return [
+            IndexModel(
+                [("heartbeat_at", ASCENDING)],
+                expireAfterSeconds=int(self.stale_after_seconds * 10),
+            )
+        ]
+
+    def register(self, host_id: str, appium_url: str | None):
+        """Registers a host or refreshes its heartbeat
+
+        Args:
+            host_id (str): unique host id
+            appium_url (str | None): appium server url of the host, None if appium runs next to the tests
+        """
+        self.mongo_client.update_one(
+            self.collection_name,
+            {"_id": host_id},
+            {"$set": {"appium_url": appium_url, "heartbeat_at": datetime.utcnow()}},
+            upsert=True,
+        )
+
+    def unregister(self, host_id: str):
+        """Removes a host, ex: on agent shutdown
+
+        Args:
+            host_id (str): unique host id
+        """
+        self.mongo_client.delete_one(self.collection_name, {"_id": host_id})
+
+    def live_hosts(self) -> list[dict[str, Any]]:
+        """Fetches the hosts which sent a heartbeat recently
+
+        Returns:
+            list[dict[str, Any]]: host id (_id) and appium_url of every live host
+        """
+        return cast(
+            list[dict[str, Any]],
+            self.mongo_client.find_many(
+                self.collection_name,
+                {"heartbeat_at": {"$gte": self.__stale_before()}},
+                projection={"appium_url": True},
+            ),
+        )
+
+    def stale_hosts(self) -> list[str]:
+        """Fetches the registered hosts which stopped sending heartbeats
+
+        Hosts which never registered are not listed, their devices are not managed by an agent.
+
+        Returns:
+            list[str]: host id of every stale host
+        """
+        return [
+            host["_id"]
+            for host in self.mongo_client.find_many(
+                self.collection_name,
+                {"heartbeat_at": {"$lt": self.__stale_before()}},
+                projection={"_id": True},
+            )
+        ]
+
+    def __stale_before(self) -> datetime:
+        """Heartbeats sent before this time are stale
+
+        Returns:
+            datetime: now minus stale_after_seconds
+        """
+        return datetime.utcnow() - timedelta(seconds=self.stale_after_seconds)
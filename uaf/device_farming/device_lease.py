@@ -0,0 +1,55 @@
+import threading
+from collections.abc import Callable
+from typing import Any
+
+from uaf.decorators.loggers import _logger as logger
+
+
+class LeaseHeartbeat:
+    """Keeps a device reservation alive by renewing its lease from a background thread
+
+    Ex: with LeaseHeartbeat(lambda: renew_lease.delay(device_id, session_id), interval=60):
+            run_test()
+    """
+
+    def __init__(self, renew: Callable[[], Any], interval: float) -> None:
+        """Constructor
+
+        Args:
+            renew (Callable[[], Any]): renews the lease, should be cheap and non blocking
+            interval (float): seconds between two renewals, keep it well below the lease ttl
+        """
+        self.renew = renew
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """Starts renewing the lease every interval seconds"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="device-lease-heartbeat", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stops renewing the lease, the lease itself is released separately"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.renew()
+            except Exception as e:
+                # a missed beat is retried on the next interval, the lease outlives a few of them
+                logger.warning(f"Failed to renew device lease: {e}")
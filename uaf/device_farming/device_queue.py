@@ -0,0 +1,188 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Any
+from uuid import uuid4
+
+from pymongo import ASCENDING, IndexModel
+
+from uaf.utilities.database.mongo_utils import MongoUtility
+
+
+class DeviceReservationQueue:
+    """Fair FIFO queue of callers waiting for a device, shared by every worker through mongodb
+
+    Callers asking for the same kind of device (same os and capability filters) share a queue, a
+    caller may claim a device once there are fewer tickets ahead of it than available devices, so
+    free devices are handed to as many waiters at once. A ticket which stops sending heartbeats,
+    ex: its caller crashed, is skipped after stale_after_seconds and purged by a TTL index.
+    """
+
+    def __init__(
+        self,
+        mongo_client: MongoUtility,
+        collection_name: str,
+        stale_after_seconds: float = 30,
+    ) -> None:
+        """Constructor
+
+        Args:
+            mongo_client (MongoUtility): connected mongo utility
+            collection_name (str): queue collection name
+            stale_after_seconds (float, optional): seconds without heartbeat after which a ticket is skipped. Defaults to 30.
+        """
+        self.mongo_client = mongo_client
+        self.collection_name = collection_name
+        self.stale_after_seconds = stale_after_seconds
+
+    @staticmethod
+    def queue_key(mobile_os: str, capabilities: dict[str, Any] | None = None) -> str:
+        """Builds the name of the queue serving the given device request
+
+        Args:
+            mobile_os (str): mobile os type
+            capabilities (dict[str, Any] | None, optional): capability filters. Defaults to None.
+
+        Returns:
+            str: queue key, identical for identical requests regardless of key order
+        """
+        return json.dumps(
+            {"device_os": mobile_os, **(capabilities or {})},
+            sort_keys=True,
+            default=str,
+        )
+
+    def indexes(self) -> list[IndexModel]:
+        """Indexes backing the queue, see DeviceReservationQueue.tickets_ahead
+
+        Returns:
+            list[IndexModel]: index definitions
+        """
+        return [
+            IndexModel([("queue_key", ASCENDING), ("enqueued_at", ASCENDING)]),
+            IndexModel(
+                [("heartbeat_at", ASCENDING)],
+                expireAfterSeconds=int(self.stale_after_seconds * 10),
+            ),
+        ]
+
+    def enqueue(self, queue_key: str) -> str:
+        """Appends a ticket to the tail of the queue
+
+        Args:
+            queue_key (str): queue key
+
+        Returns:
+            str: ticket id
+        """
+        now = datetime.utcnow()
+        ticket_id = str(uuid4())
+        self.mongo_client.insert_one(
+            self.collection_name,
+            {
+                "_id": ticket_id,
+                "queue_key": queue_key,
+                "enqueued_at": now,
+                "heartbeat_at": now,
+            },
+        )
+        return ticket_id
+
+    def tickets_ahead(
+        self, queue_key: str, ticket_id: str | None = None, limit: int | None = None
+    ) -> int:
+        """Counts the live tickets queued before the caller, which get a device first
+
+        Args:
+            queue_key (str): queue key
+            ticket_id (str | None, optional): ticket of the caller, None if it is not queued yet. Defaults to None.
+            limit (int | None, optional): stop counting after this many tickets. Defaults to None.
+
+        Returns:
+            int: number of tickets ahead, 0 if the queue is empty or the ticket is at its head
+        """
+        query: dict[str, Any] = {
+            "queue_key": queue_key,
+            "heartbeat_at": {
+                "$gte": datetime.utcnow() - timedelta(seconds=self.stale_after_seconds)
+            },
+        }
+        ticket = (
+            None
+            if ticket_id is None
+            else self.mongo_client.find_one(
+                self.collection_name,
+                {"_id": ticket_id},
+                projection={"enqueued_at": True},
+            )
+        )
+        # a caller which is not queued, or whose ticket expired, is behind every live ticket
+        if ticket is not None:
+            query["$or"] = [
+                {"enqueued_at": {"$lt": ticket["enqueued_at"]}},
+                {"enqueued_at": ticket["enqueued_at"], "_id": {"$lt": ticket_id}},
+            ]
+        return self.mongo_client.count_documents(
+            self.collection_name, query, limit=limit
+        )
+
+    def heartbeat(self, ticket_id: str):
+        """Keeps a waiting ticket from being considered stale
+
+        Args:
+            ticket_id (str): ticket id
+        """
+        self.mongo_client.update_one(
+            self.collection_name,
+            {"_id": ticket_id},
+            {"$set": {"heartbeat_at": datetime.utcnow()}},
+        )
+
+    def leave(self, ticket_id: str):
+        """Removes a ticket from its queue, once served or given up
+
+        Args:
+            ticket_id (str): ticket id
+        """
+        self.mongo_client.delete_one(self.collection_name, {"_id": ticket_id})
+
+
+class DeviceAvailabilitySignal:
+    """Wakes the reservations waiting in this process as soon as devices return to the pool
+
+    Devices returned by another process are only noticed by the next poll of the waiters.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._generation = 0
+
+    def generation(self) -> int:
+        """Fetches the number of notifications so far, to be read before checking for a device
+
+        Returns:
+            int: notification counter
+        """
+        with self._condition:
+            return self._generation
+
+    def notify(self):
+        """Wakes every waiter, to be called once devices were made available"""
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+    def wait(self, generation: int, timeout: float) -> bool:
+        """Waits for a notification newer than generation, at most timeout seconds
+
+        Args:
+            generation (int): counter read before the caller last looked for a device
+            timeout (float): max seconds to wait
+
+        Returns:
+            bool: True if devices were returned meanwhile, False on timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._generation != generation, timeout
+            )
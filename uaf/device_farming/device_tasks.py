@@ -1,22 +1,62 @@
-from datetime import datetime
-from random import choice
+import time
+from datetime import datetime, timedelta
+from functools import cache
+from typing import Any, cast
 from uuid import UUID, uuid4
 
 from celery.schedules import crontab
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from pymongo import ASCENDING, IndexModel, ReturnDocument
 
+from uaf.decorators.loggers import _logger as logger
+from uaf.device_farming.device_analytics import DeviceFarmAnalytics
+from uaf.device_farming.device_capabilities import (
+    build_capability_query,
+    fetch_device_attributes,
+    refresh_device_attributes,
+    stale_attributes_query,
+)
+from uaf.device_farming.device_hosts import DeviceHostRegistry, local_host_id
+from uaf.device_farming.device_queue import (
+    DeviceAvailabilitySignal,
+    DeviceReservationQueue,
+)
+from uaf.device_farming.device_utilization import (
+    rollup_window,
+    session_timestamp_migration,
+    utilization_indexes,
+    utilization_rollup_pipeline,
+)
 from uaf.decorators.loggers.logger import log
 from uaf.enums.device_status import DeviceStatus
 from uaf.enums.mobile_device_environment_type import MobileDeviceEnvironmentType
 from uaf.enums.mobile_os import MobileOs
-from uaf.utilities.database.mongo_utils import MongoUtility
+from uaf.utilities.database.mongo_utils import MongoClientRegistry, MongoUtility
 from uaf.utilities.ui.appium_core.appium_core_utils import CoreUtils
 
 from . import FilePaths, YamlParser, get_celery_app
 
 app = get_celery_app()
 config = YamlParser(FilePaths.COMMON)
-mongo_client = MongoUtility(config.get_value("mongodb", "connection_string"))
-mongo_client.client
+# connects lazily on first use, through the client registry so every forked worker process
+# opens its own pool instead of inheriting the one of the parent
+mongo_client = MongoUtility(
+    config.get_value("mongodb", "connection_string"), shared=True
+)
+# wakes the reservations waiting in this process when a task of this process frees devices
+device_availability = DeviceAvailabilitySignal()
+
+# ended sessions are kept for 30 days unless overridden in the mongodb section
+DEFAULT_DEVICE_SESSION_TTL_SECONDS = 30 * 24 * 60 * 60
+# a reservation is lost unless renewed within 5 minutes unless overridden in the device_farm section
+DEFAULT_LEASE_TTL_SECONDS = 5 * 60
+# callers wait up to 5 minutes for a device, checking after 50ms then backing off to every second,
+# unless overridden in the device_farm section
+DEFAULT_RESERVATION_MAX_WAIT_SECONDS = 5 * 60
+DEFAULT_RESERVATION_MIN_POLL_SECONDS = 0.05
+DEFAULT_RESERVATION_POLL_SECONDS = 1
+# every hourly rollup recomputes the last 24 complete hours unless overridden in the device_farm section
+DEFAULT_UTILIZATION_LOOKBACK_HOURS = 24
 
 
 def __get_unique_id() -> UUID:
@@ -28,113 +68,500 @@ def __get_unique_id() -> UUID:
     return uuid4()
 
 
-@app.task
 @log
-def add_new_devices_to_list():
-    """Adds newly connected devices to the device_stats collection with status available"""
-    all_devices = [
-        __device_list["device_id"]
-        for __device_list in mongo_client.find_many(
-            config.get_value("mongodb", "device_stat_collection")
-        )
-    ]
+def ensure_device_farm_indexes():
+    """Creates the indexes backing the device farm queries, safe to run on every startup
+
+    device_stats:
+        - unique device_id, used by every per-device update
+        - status + device_os + last_reserved_at, serves the reservation filter and its ordering
+        - status + device_os + installed_apps.package + last_reserved_at, serves the preferred app claim
+        - status + device_os + os_major_version, serves minimum os version capabilities
+        - status + lease_expires_at, serves the expired lease reaper
+        - host_id + status, serves the agents of a multi host farm and the stale host check
+    device_sessions:
+        - unique session_id, used when a session is released
+        - TTL on end_time, so ended sessions expire while open ones (end_time None) are kept
+        - start_time, bounds the utilization rollup together with end_time
+    device_reservation_queue:
+        - see DeviceReservationQueue.indexes
+    device_utilization_hourly:
+        - see device_utilization.utilization_indexes
+    device_hosts:
+        - see DeviceHostRegistry.indexes
+    """
+    mongo_client.create_indexes(
+        config.get_value("mongodb", "device_stat_collection"),
+        [
+            IndexModel([("device_id", ASCENDING)], unique=True),
+            IndexModel(
+                [
+                    ("status", ASCENDING),
+                    ("device_os", ASCENDING),
+                    ("last_reserved_at", ASCENDING),
+                ]
+            ),
+            IndexModel(
+                [
+                    ("status", ASCENDING),
+                    ("device_os", ASCENDING),
+                    ("installed_apps.package", ASCENDING),
+                    ("last_reserved_at", ASCENDING),
+                ]
+            ),
+            IndexModel(
+                [
+                    ("status", ASCENDING),
+                    ("device_os", ASCENDING),
+                    ("os_major_version", ASCENDING),
+                ]
+            ),
+            IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+            IndexModel([("host_id", ASCENDING), ("status", ASCENDING)]),
+        ],
+    )
+    host_registry = __host_registry()
+    mongo_client.create_indexes(host_registry.collection_name, host_registry.indexes())
+    queue = __reservation_queue()
+    mongo_client.create_indexes(queue.collection_name, queue.indexes())
+    mongo_client.create_indexes(
+        config.get_value("mongodb", "device_session_collection"),
+        [
+            IndexModel([("session_id", ASCENDING)], unique=True),
+            IndexModel(
+                [("end_time", ASCENDING)],
+                expireAfterSeconds=config.get_value(
+                    "mongodb",
+                    "device_session_ttl_seconds",
+                    DEFAULT_DEVICE_SESSION_TTL_SECONDS,
+                ),
+                # only documents holding a BSON date are eligible for expiry
+                partialFilterExpression={"end_time": {"$type": "date"}},
+            ),
+            IndexModel([("start_time", ASCENDING)]),
+        ],
+    )
+    mongo_client.create_indexes(__utilization_collection(), utilization_indexes())
+
+
+@log
+def migrate_session_timestamps() -> int:
+    """Converts sessions recorded with string timestamps into BSON dates, safe to run on every startup
+
+    Only converted sessions can expire through the TTL index and be rolled up.
+
+    Returns:
+        int: number of migrated sessions
+    """
+    result = mongo_client.update_many(
+        config.get_value("mongodb", "device_session_collection"),
+        {
+            "$or": [
+                {"start_time": {"$type": "string"}},
+                {"end_time": {"$type": "string"}},
+            ]
+        },
+        session_timestamp_migration(),
+    )
+    return cast(int, result.modified_count)
+
+
+@worker_init.connect
+def bootstrap_device_farm(**kwargs):
+    """Bootstraps the device farm collections before the worker starts consuming tasks"""
+    ensure_device_farm_indexes()
+    migrate_session_timestamps()
+
+
+@worker_process_init.connect
+def reset_mongo_clients(**kwargs):
+    """Drops the mongo clients inherited from the parent worker, the child connects its own on first use"""
+    MongoClientRegistry.reset()
+
+
+@worker_process_shutdown.connect
+def close_mongo_clients(**kwargs):
+    """Closes the mongo clients of a worker process before it exits"""
+    MongoClientRegistry.close_all()
+
+
+def finalize_tasks():
+    """Binds every task of the app, to be called before running tasks from several threads
+
+    Tasks are created lazily and bound to the app on first use. Binding is not thread safe: a
+    thread using a task while another thread binds it may get it without its request stack, so
+    reading self.request fails. Workers finalize the app on startup, in process callers have to.
+    """
+    app.finalize(auto=True)
+
+
+def lease_ttl_seconds() -> int:
+    """Fetches how long a reservation lasts without being renewed
+
+    Returns:
+        int: lease ttl in seconds
+    """
+    return cast(
+        int,
+        config.get_value("device_farm", "lease_ttl_seconds", DEFAULT_LEASE_TTL_SECONDS),
+    )
+
+
+def reservation_max_wait_seconds() -> float:
+    """Fetches how long reserve_device waits for a device before giving up
+
+    Returns:
+        float: max wait in seconds
+    """
+    return cast(
+        float,
+        config.get_value(
+            "device_farm",
+            "reservation_max_wait_seconds",
+            DEFAULT_RESERVATION_MAX_WAIT_SECONDS,
+        ),
+    )
+
+
+def reservation_poll_seconds(attempt: int) -> float:
+    """Fetches how long a queued reservation waits before its next attempt
+
+    The first attempts follow each other quickly so a device freed by another process is picked up
+    soon, the delay then doubles up to device_farm.reservation_poll_seconds to spare the database.
+
+    Args:
+        attempt (int): number of attempts already made while queued
+
+    Returns:
+        float: delay in seconds
+    """
+    min_poll = config.get_value(
+        "device_farm",
+        "reservation_min_poll_seconds",
+        DEFAULT_RESERVATION_MIN_POLL_SECONDS,
+    )
+    max_poll = config.get_value(
+        "device_farm", "reservation_poll_seconds", DEFAULT_RESERVATION_POLL_SECONDS
+    )
+    # the exponent is capped so long waits cannot overflow the float
+    return cast(float, min(max_poll, min_poll * 2 ** min(attempt, 16)))
+
+
+def __utilization_collection() -> str:
+    """Fetches the name of the collection holding the hourly utilization rollup
+
+    Returns:
+        str: collection name
+    """
+    return cast(
+        str,
+        config.get_value(
+            "mongodb", "device_utilization_collection", "device_utilization_hourly"
+        ),
+    )
+
+
+@cache
+def device_farm_analytics() -> DeviceFarmAnalytics:
+    """Shared analytics of the device farm, so every caller benefits from the same result cache
+
+    Ex: device_farm_analytics().report(group_by="device_os", hours=24)
+
+    Returns:
+        DeviceFarmAnalytics: analytics cached for device_farm.analytics_cache_seconds, 60 by default
+    """
+    return DeviceFarmAnalytics(
+        mongo_client,
+        config.get_value("mongodb", "device_session_collection"),
+        __utilization_collection(),
+        config.get_value("mongodb", "device_stat_collection"),
+        cache_seconds=config.get_value("device_farm", "analytics_cache_seconds", 60),
+    )
+
+
+def __host_registry() -> DeviceHostRegistry:
+    """Builds the registry of the machines sharing the farm on top of the shared mongo client
+
+    Returns:
+        DeviceHostRegistry: host registry
+    """
+    return DeviceHostRegistry(
+        mongo_client,
+        config.get_value("mongodb", "device_host_collection", "device_hosts"),
+    )
+
+
+def __reservation_queue() -> DeviceReservationQueue:
+    """Builds the reservation queue on top of the shared mongo client
+
+    Returns:
+        DeviceReservationQueue: reservation queue
+    """
+    return DeviceReservationQueue(
+        mongo_client,
+        config.get_value(
+            "mongodb", "device_queue_collection", "device_reservation_queue"
+        ),
+    )
+
+
+def __fetch_connected_devices() -> list[tuple[str, MobileOs]]:
+    """Fetches the physical devices connected to this host
+
+    Returns:
+        list[tuple[str, MobileOs]]: device id and its mobile os
+    """
     from platform import system
 
-    if system().lower().__eq__("darwin"):
-        connected_ios_physical_devices_list = CoreUtils.fetch_connected_ios_devices_ids(
+    connected_devices = [
+        (device_id, MobileOs.ANDROID)
+        for device_id in CoreUtils.fetch_connected_android_devices_ids(
             MobileDeviceEnvironmentType.PHYSICAL
         )
-        unique_ios_physical_devices_list = [
-            device
-            for device in connected_ios_physical_devices_list
-            if device not in all_devices
-        ]
-        if unique_ios_physical_devices_list:
-            mongo_client.insert_many(
-                config.get_value("mongodb", "device_stat_collection"),
-                [
-                    {
-                        "device_id": str(x),
-                        "device_type": MobileDeviceEnvironmentType.PHYSICAL.value,
-                        "device_os": MobileOs.IOS.value,
-                        "status": DeviceStatus.AVAILABLE.value,
-                    }
-                    for x in unique_ios_physical_devices_list
-                ],
+    ]
+    if system().lower().__eq__("darwin"):
+        connected_devices.extend(
+            (device_id, MobileOs.IOS)
+            for device_id in CoreUtils.fetch_connected_ios_devices_ids(
+                MobileDeviceEnvironmentType.PHYSICAL
             )
-    connected_android_physical_devices_list = (
-        CoreUtils.fetch_connected_android_devices_ids(
-            MobileDeviceEnvironmentType.PHYSICAL
         )
-    )
-    unique_android_physical_devices_list = [
-        device
-        for device in connected_android_physical_devices_list
-        if device not in all_devices
+    return connected_devices
+
+
+@app.task
+@log
+def add_new_devices_to_list():
+    """Adds newly connected devices to the device_stats collection with status available
+
+    The known device ids are fetched with a single projected find, so only devices seen for the
+    first time are written, as one unordered bulk upsert keyed on device_id which leaves a device
+    inserted meanwhile, ex: by the discovery daemon, untouched. New devices are recorded with their
+    attributes (os version, screen size, installed apps) for capability matching and, in a multi
+    host farm, assigned to the host running the worker.
+    """
+    stat_collection = config.get_value("mongodb", "device_stat_collection")
+    connected_devices = __fetch_connected_devices()
+    if not connected_devices:
+        return
+    known_devices = {
+        device["device_id"]
+        for device in mongo_client.find_many(
+            stat_collection,
+            {"device_id": {"$in": [device_id for device_id, _ in connected_devices]}},
+            projection={"device_id": True, "_id": False},
+        )
+    }
+    new_devices = [
+        (device_id, mobile_os)
+        for device_id, mobile_os in connected_devices
+        if device_id not in known_devices
     ]
-    if unique_android_physical_devices_list:
-        mongo_client.insert_many(
+    if not new_devices:
+        return
+    host_id = local_host_id(config)
+    host = {} if host_id is None else {"host_id": host_id}
+    mongo_client.upsert_many(
+        stat_collection,
+        [
+            {
+                "device_id": str(device_id),
+                "device_type": MobileDeviceEnvironmentType.PHYSICAL.value,
+                "device_os": mobile_os.value,
+                "status": DeviceStatus.AVAILABLE.value,
+                **host,
+                **fetch_device_attributes(device_id, mobile_os),
+            }
+            for device_id, mobile_os in new_devices
+        ],
+        ["device_id"],
+        on_insert_only=True,
+    )
+    device_availability.notify()
+
+
+def __available_device_query(
+    mobile_os: str, capabilities: dict[str, Any] | None
+) -> dict[str, Any]:
+    """Builds the filter of the available devices matching a request
+
+    Args:
+        mobile_os (str): mobile os type
+        capabilities (dict[str, Any] | None): capabilities the device has to match, see build_capability_query
+
+    Returns:
+        dict[str, Any]: filter query on the device_stats collection
+    """
+    return {
+        **build_capability_query(capabilities),
+        "status": DeviceStatus.AVAILABLE.value,
+        "device_os": mobile_os,
+    }
+
+
+def __claim_device(
+    mobile_os: str,
+    capabilities: dict[str, Any] | None,
+    preferred_app: str | None = None,
+) -> tuple[str, UUID, str | None] | None:
+    """Atomically claims the least recently used available device matching the request
+
+    When a preferred app is given, devices which already have it installed are tried first
+    so the session can skip the app install, any other matching device is the fallback.
+
+    Args:
+        mobile_os (str): mobile os type
+        capabilities (dict[str, Any] | None): capabilities the device has to match, see build_capability_query
+        preferred_app (str | None, optional): package/bundle id of the app under test. Defaults to None.
+
+    Returns:
+        tuple[str, UUID, str | None] | None: device_id, session uuid and appium url of the host owning
+            the device, None if no device is available
+    """
+    query = __available_device_query(mobile_os, capabilities)
+    queries = [query]
+    if preferred_app is not None and "installed_apps.package" not in query:
+        queries.insert(0, {**query, "installed_apps.package": preferred_app})
+
+    for device_filter in queries:
+        uuid: UUID = __get_unique_id()
+        reserved_at = datetime.utcnow()
+        device = mongo_client.find_one_and_update(
             config.get_value("mongodb", "device_stat_collection"),
-            [
-                {
-                    "device_id": str(x),
-                    "device_type": MobileDeviceEnvironmentType.PHYSICAL.value,
-                    "device_os": MobileOs.ANDROID.value,
-                    "status": DeviceStatus.AVAILABLE.value,
+            device_filter,
+            {
+                "$set": {
+                    "status": DeviceStatus.IN_USE.value,
+                    "session_id": str(uuid),
+                    "last_reserved_at": reserved_at,
+                    "lease_expires_at": reserved_at
+                    + timedelta(seconds=lease_ttl_seconds()),
                 }
-                for x in unique_android_physical_devices_list
-            ],
+            },
+            # devices that were never reserved have no last_reserved_at and sort first
+            sort=[("last_reserved_at", ASCENDING)],
+            projection={"device_id": True, "appium_url": True},
+            return_document=ReturnDocument.AFTER,
         )
+        if device is not None:
+            return device["device_id"], uuid, device.get("appium_url")
+    return None
 
 
-@app.task
+@app.task(bind=True, max_retries=None)
 @log
-def reserve_device(mobile_os: str):
-    """Reserves random available device and updates status in database
+def reserve_device(
+    self,
+    mobile_os: str,
+    capabilities: dict[str, Any] | None = None,
+    max_wait_seconds: float | None = None,
+    ticket_id: str | None = None,
+    requested_at: float | None = None,
+    preferred_app: str | None = None,
+    with_appium_url: bool = False,
+):
+    """Reserves the least recently used available device and updates status in database
+
+    The device is claimed with a single find_one_and_update, so the os filter and the
+    ordering are resolved by the server and two concurrent callers can never be handed
+    the same device. The reservation is a lease which has to be kept alive with renew_lease,
+    otherwise reap_expired_leases hands the device back to the pool.
+
+    When no device is available the caller joins a FIFO queue shared with every caller asking
+    for the same os and capabilities, and is served in order as devices are released: the first
+    n callers of the queue claim together when n devices are available. Inside a worker the wait
+    is a task retry, so the worker keeps processing releases meanwhile, in process callers are
+    also woken as soon as a task of their process returns devices to the pool.
+
+    In a multi host farm the session has to be driven through the appium server of the host the
+    device is plugged into, callers aware of it pass with_appium_url to get it along with the device.
 
     Args:
         mobile_os (str): mobile os type
+        capabilities (dict[str, Any] | None, optional): capabilities the device has to match, ex:
+            {"min_os_major_version": 13, "device_type": "physical"}. Defaults to None.
+        max_wait_seconds (float | None, optional): how long to wait for a device, 0 to fail fast.
+            Defaults to device_farm.reservation_max_wait_seconds.
+        ticket_id (str | None, optional): queue ticket, only set by retries. Defaults to None.
+        requested_at (float | None, optional): epoch of the first attempt, only set by retries. Defaults to None.
+        preferred_app (str | None, optional): app under test, devices having it installed are preferred. Defaults to None.
+        with_appium_url (bool, optional): also return the appium url of the device's host. Defaults to False.
 
     Raises:
-        ValueError: if there are 0 availability of devices
+        ValueError: if no device became available within max_wait_seconds or a capability is unsupported
 
     Returns:
-        tuple: device_id, uuid
+        tuple: device_id, uuid, followed by appium_url (None if appium has to be launched next to
+            the tests) when with_appium_url is set
     """
-    available_devices = mongo_client.find_many(
-        config.get_value("mongodb", "device_stat_collection"),
-        {"status": DeviceStatus.AVAILABLE.value},
-    )
-    if not available_devices:
-        raise ValueError(
-            f"Failed to start any device for {mobile_os} mobile os as availability is 0!!"
-        )
+    if max_wait_seconds is None:
+        max_wait_seconds = reservation_max_wait_seconds()
+    if requested_at is None:
+        requested_at = time.time()
+    # validates the capabilities before queueing for a device that can never match
+    build_capability_query(capabilities)
+    queue = __reservation_queue()
+    queue_key = queue.queue_key(mobile_os, capabilities)
 
-    # randomly choose device_id based on the mobile os
-    device_id = choice(
-        [
-            device["device_id"]
-            for device in available_devices
-            if mobile_os.__eq__(device["device_os"])
-        ]
-    )
-    uuid: UUID = __get_unique_id()
+    attempt = self.request.retries
+    while True:
+        generation = device_availability.generation()
+        ahead = queue.tickets_ahead(queue_key, ticket_id)
+        if ahead == 0 or ahead < mongo_client.count_documents(
+            config.get_value("mongodb", "device_stat_collection"),
+            __available_device_query(mobile_os, capabilities),
+            limit=ahead + 1,
+        ):
+            reservation = __claim_device(mobile_os, capabilities, preferred_app)
+            if reservation is not None:
+                break
+        if time.time() - requested_at >= max_wait_seconds:
+            if ticket_id is not None:
+                queue.leave(ticket_id)
+            raise ValueError(
+                f"Failed to start any device for {mobile_os} mobile os as availability is 0!!"
+            )
+        if ticket_id is None:
+            ticket_id = queue.enqueue(queue_key)
+        else:
+            queue.heartbeat(ticket_id)
+        poll_seconds = reservation_poll_seconds(attempt)
+        if self.request.called_directly:
+            device_availability.wait(generation, poll_seconds)
+            attempt += 1
+        else:
+            # the retry replaces the arguments of the call, whether they were passed
+            # positionally or by keyword, so every one of them is passed again
+            raise self.retry(
+                countdown=poll_seconds,
+                args=(mobile_os,),
+                kwargs={
+                    "capabilities": capabilities,
+                    "max_wait_seconds": max_wait_seconds,
+                    "ticket_id": ticket_id,
+                    "requested_at": requested_at,
+                    "preferred_app": preferred_app,
+                    "with_appium_url": with_appium_url,
+                },
+            )
+
+    if ticket_id is not None:
+        queue.leave(ticket_id)
+    device_id, uuid, appium_url = reservation
     session_doc = {
         "device_id": device_id,
-        "start_time": datetime.utcnow().__str__(),
+        "start_time": datetime.utcnow(),
         "session_id": str(uuid),
         "device_os": mobile_os,
+        "appium_url": appium_url,
         "end_time": None,
+        "queue_wait_seconds": time.time() - requested_at,
     }
-    device_stats_doc = {"$set": {"status": DeviceStatus.IN_USE.value}}
-    mongo_client.update_one(
-        config.get_value("mongodb", "device_stat_collection"),
-        {"device_id": device_id},
-        device_stats_doc,
-    )
     mongo_client.insert_one(
         config.get_value("mongodb", "device_session_collection"), session_doc
     )
+    if with_appium_url:
+        return device_id, uuid, appium_url
     return device_id, uuid
 
 
@@ -147,35 +574,255 @@ def release_device(device_id: str, session_id: UUID):
         device_id (str): unique device id
         session_id (UUID): unique session id attached to given device id
     """
+    # matching the session too keeps a late release from terminating a device that was reaped
+    # and reserved again by someone else
     mongo_client.update_one(
         config.get_value("mongodb", "device_stat_collection"),
-        {"device_id": device_id},
-        {"$set": {"status": DeviceStatus.TERMINATED.value}},
+        {"device_id": device_id, "session_id": str(session_id)},
+        {
+            "$set": {
+                "status": DeviceStatus.TERMINATED.value,
+                "released_at": datetime.utcnow(),
+                # the session may have installed apps, attributes are refreshed before recycling
+                "attributes_stale": True,
+            },
+            "$unset": {"lease_expires_at": ""},
+        },
     )
     mongo_client.update_one(
         config.get_value("mongodb", "device_session_collection"),
         {"session_id": str(session_id)},
-        {"$set": {"end_time": datetime.utcnow().__str__()}},
+        {"$set": {"end_time": datetime.utcnow()}},
     )
 
 
+@app.task(ignore_result=True)
+@log
+def renew_lease(device_id: str, session_id: UUID) -> bool:
+    """Extends the lease of a reserved device by another lease ttl
+
+    Args:
+        device_id (str): unique device id
+        session_id (UUID): unique session id attached to given device id
+
+    Returns:
+        bool: False if the lease was already lost, ex: reaped after missing heartbeats
+    """
+    result = mongo_client.update_one(
+        config.get_value("mongodb", "device_stat_collection"),
+        {
+            "device_id": device_id,
+            "session_id": str(session_id),
+            "status": DeviceStatus.IN_USE.value,
+        },
+        {
+            "$set": {
+                "lease_expires_at": datetime.utcnow()
+                + timedelta(seconds=lease_ttl_seconds())
+            }
+        },
+    )
+    return cast(bool, result.matched_count == 1)
+
+
+@app.task
+@log
+def reap_expired_leases():
+    """Terminates reservations whose lease expired, ex: the worker holding it crashed
+
+    The devices are terminated in bulk so check_device recycles them like any released device, and
+    their open sessions are closed with end_reason lease_expired.
+
+    Returns:
+        dict[str, int]: number of reaped devices and closed sessions
+    """
+    now = datetime.utcnow()
+    expired_query = {
+        "status": DeviceStatus.IN_USE.value,
+        "lease_expires_at": {"$lt": now},
+    }
+    expired = mongo_client.find_many(
+        config.get_value("mongodb", "device_stat_collection"),
+        expired_query,
+        projection={"device_id": True, "session_id": True},
+    )
+    if not expired:
+        return {"devices": 0, "sessions": 0}
+
+    # re-check the expiry so a lease renewed in the meantime is not reaped
+    devices = mongo_client.update_many(
+        config.get_value("mongodb", "device_stat_collection"),
+        {
+            **expired_query,
+            "device_id": {"$in": [device["device_id"] for device in expired]},
+        },
+        {
+            "$set": {
+                "status": DeviceStatus.TERMINATED.value,
+                "released_at": now,
+                "attributes_stale": True,
+            },
+            "$unset": {"lease_expires_at": ""},
+        },
+    )
+    # only the devices this update terminated had their session lost, a lease renewed since the
+    # find was not matched and its session stays open
+    reaped = mongo_client.find_many(
+        config.get_value("mongodb", "device_stat_collection"),
+        {
+            "device_id": {"$in": [device["device_id"] for device in expired]},
+            "released_at": now,
+        },
+        projection={"session_id": True},
+    )
+    sessions = mongo_client.update_many(
+        config.get_value("mongodb", "device_session_collection"),
+        {
+            "session_id": {
+                "$in": [
+                    device["session_id"] for device in reaped if "session_id" in device
+                ]
+            },
+            "end_time": None,
+        },
+        {"$set": {"end_time": now, "end_reason": "lease_expired"}},
+    )
+    metrics = {"devices": devices.modified_count, "sessions": sessions.modified_count}
+    logger.warning(
+        f"Reaped expired device leases: devices={metrics['devices']} sessions={metrics['sessions']}"
+    )
+    return metrics
+
+
 @app.task
 @log
 def check_device():
-    """Fetch the list of devices from the database"""
-    terminated_device_docs = [
-        __device_list["device_id"]
-        for __device_list in mongo_client.find_many(
-            config.get_value("mongodb", "device_stat_collection"),
-            {"status": DeviceStatus.TERMINATED.value},
+    """Returns terminated devices to the pool of available devices
+
+    Every eligible device is flipped with a single update_many. A device is eligible once it has been
+    terminated for at least device_farm.recycle_cooldown_seconds and, when
+    device_farm.recycle_requires_connected is enabled, only if it is still connected to this host.
+    Devices the discovery daemon saw unplugged while in use are marked disconnected instead, the
+    daemon makes them available again once they are plugged back in. Released devices connected to
+    this host are inspected again first, so apps installed by their last session are matched by
+    preferred_app and installed_app capabilities.
+
+    Returns:
+        dict[str, int]: matched and modified device counts, and number of disconnected devices
+    """
+    stat_collection = config.get_value("mongodb", "device_stat_collection")
+    stale = mongo_client.find_many(
+        stat_collection,
+        stale_attributes_query(),
+        projection={"device_id": True, "device_os": True},
+    )
+    if stale:
+        connected = {device_id for device_id, _ in __fetch_connected_devices()}
+        refresh_device_attributes(
+            mongo_client,
+            stat_collection,
+            [device for device in stale if device["device_id"] in connected],
         )
-    ]
-    for device in terminated_device_docs:
-        mongo_client.update_one(
-            config.get_value("mongodb", "device_stat_collection"),
-            {"device_id": device},
-            {"$set": {"status": DeviceStatus.AVAILABLE.value}},
+    disconnected = mongo_client.update_many(
+        stat_collection,
+        {"status": DeviceStatus.TERMINATED.value, "connected": False},
+        {"$set": {"status": DeviceStatus.DISCONNECTED.value}},
+    )
+    query: dict[str, Any] = {
+        "status": DeviceStatus.TERMINATED.value,
+        "connected": {"$ne": False},
+    }
+    cooldown = config.get_value("device_farm", "recycle_cooldown_seconds", 0)
+    if cooldown:
+        # devices released before released_at was recorded have no cooldown to wait for
+        query["$or"] = [
+            {"released_at": {"$lte": datetime.utcnow() - timedelta(seconds=cooldown)}},
+            {"released_at": {"$exists": False}},
+        ]
+    if config.get_value("device_farm", "recycle_requires_connected", False):
+        query["device_id"] = {
+            "$in": [device_id for device_id, _ in __fetch_connected_devices()]
+        }
+    result = mongo_client.update_many(
+        stat_collection,
+        query,
+        {"$set": {"status": DeviceStatus.AVAILABLE.value}},
+    )
+    metrics = {
+        "matched": result.matched_count,
+        "modified": result.modified_count,
+        "disconnected": disconnected.modified_count,
+    }
+    if metrics["modified"]:
+        device_availability.notify()
+    logger.info(
+        f"Recycled terminated devices: matched={metrics['matched']} modified={metrics['modified']} "
+        f"disconnected={metrics['disconnected']}"
+    )
+    return metrics
+
+
+@app.task
+@log
+def disconnect_stale_host_devices():
+    """Takes the available devices of hosts which stopped sending heartbeats out of the pool
+
+    Sessions cannot reach the appium server of a host that is down, ex: a powered off machine, so
+    its devices are marked disconnected until its agent is back and reports them again. Only hosts
+    which registered are considered, devices not assigned to a registered host and devices in use
+    (left to the lease reaper) are not affected. Scheduled only when host agents are configured.
+
+    Returns:
+        int: number of disconnected devices
+    """
+    stale_hosts = __host_registry().stale_hosts()
+    if not stale_hosts:
+        return 0
+    result = mongo_client.update_many(
+        config.get_value("mongodb", "device_stat_collection"),
+        {
+            "host_id": {"$in": stale_hosts},
+            "status": DeviceStatus.AVAILABLE.value,
+        },
+        {"$set": {"status": DeviceStatus.DISCONNECTED.value}},
+    )
+    if result.modified_count:
+        logger.warning(
+            f"Disconnected {result.modified_count} devices of hosts without heartbeat"
+        )
+    return result.modified_count
+
+
+@app.task
+@log
+def rollup_device_utilization(lookback_hours: int | None = None):
+    """Rolls ended sessions up into the per device, per hour utilization collection
+
+    The last lookback_hours complete hours are recomputed on every run, so sessions ending after
+    the hours they span were first rolled up are still accounted for. Dashboards query the small
+    rollup collection instead of scanning device_sessions, whose raw documents expire through the
+    end_time TTL index; keep the lookback well below device_session_ttl_seconds.
+
+    Args:
+        lookback_hours (int | None, optional): complete hours to recompute.
+            Defaults to device_farm.utilization_lookback_hours.
+
+    Returns:
+        dict[str, datetime]: since (inclusive) and until (exclusive) of the recomputed window
+    """
+    if lookback_hours is None:
+        lookback_hours = config.get_value(
+            "device_farm",
+            "utilization_lookback_hours",
+            DEFAULT_UTILIZATION_LOOKBACK_HOURS,
         )
+    since, until = rollup_window(datetime.utcnow(), lookback_hours)
+    mongo_client.aggregate(
+        config.get_value("mongodb", "device_session_collection"),
+        utilization_rollup_pipeline(since, until, __utilization_collection()),
+    )
+    logger.info(f"Rolled up device utilization from {since} until {until}")
+    return {"since": since, "until": until}
 
 
 # celery schedulers performing periodic tasks
@@ -185,9 +832,26 @@ app.conf.beat_schedule = {
         "task": "uaf.device_farming.device_tasks.check_device",
         "schedule": crontab(minute="*/2"),
     },
-    # add new/unique devices to the list of devices and set their status as available
+    # terminate reservations whose lease was not renewed, ex: the pytest worker holding them crashed
+    "reap_expired_device_leases": {
+        "task": "uaf.device_farming.device_tasks.reap_expired_leases",
+        "schedule": crontab(minute="*"),
+    },
+    # reconcile the list of devices with the connected ones, devices are picked up as soon as they are
+    # plugged in by the discovery daemon (uaf.device_farming.device_discovery), this only catches up missed events
     "add_new_device_to_device_list": {
         "task": "uaf.device_farming.device_tasks.add_new_devices_to_list",
-        "schedule": crontab(minute="*/3"),
+        "schedule": crontab(minute="*/30"),
+    },
+    # roll ended sessions up into hourly per device utilization, shortly after every hour
+    "rollup_device_utilization": {
+        "task": "uaf.device_farming.device_tasks.rollup_device_utilization",
+        "schedule": crontab(minute=5),
     },
 }
+if local_host_id(config) is not None:
+    # take devices of machines whose discovery agent stopped sending heartbeats out of the pool
+    app.conf.beat_schedule["disconnect_stale_host_devices"] = {
+        "task": "uaf.device_farming.device_tasks.disconnect_stale_host_devices",
+        "schedule": crontab(minute="*"),
+    }
@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta
+from typing import Any
+
+from pymongo import ASCENDING, IndexModel
+
+HOUR_MILLISECONDS = 60 * 60 * 1000
+
+
+def truncate_to_hour(moment: datetime) -> datetime:
+    """Truncates a datetime to the start of its hour
+
+    Args:
+        moment (datetime): datetime to truncate
+
+    Returns:
+        datetime: start of the hour
+    """
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_window(now: datetime, lookback_hours: int) -> tuple[datetime, datetime]:
+    """Computes the complete hours a rollup run recomputes
+
+    Args:
+        now (datetime): current utc time
+        lookback_hours (int): number of complete hours to recompute
+
+    Returns:
+        tuple[datetime, datetime]: since (inclusive), until (exclusive), both aligned on the hour
+    """
+    until = truncate_to_hour(now)
+    return until - timedelta(hours=lookback_hours), until
+
+
+def utilization_indexes() -> list[IndexModel]:
+    """Indexes of the hourly utilization collection, dashboards filter by hour and device
+
+    Returns:
+        list[IndexModel]: index definitions
+    """
+    return [
+        IndexModel([("hour", ASCENDING)]),
+        IndexModel([("device_id", ASCENDING), ("hour", ASCENDING)]),
+    ]
+
+
+def utilization_rollup_pipeline(
+    since: datetime, until: datetime, output_collection: str
+) -> list[dict[str, Any]]:
+    """Builds the aggregation rolling ended sessions up into per device, per hour utilization
+
+    Every ended session overlapping [since, until) is split into the hours it spans, the busy
+    time of each device is summed per hour and the buckets are merged into output_collection
+    keyed by {device_id, hour}. Buckets are replaced, not incremented, so a window can be
+    recomputed any number of times, ex: to pick up sessions that ended after the last run.
+
+    Requires mongodb 5.0+ for $dateTrunc, $dateDiff and $dateAdd.
+
+    Args:
+        since (datetime): start of the window, aligned on the hour
+        until (datetime): end of the window (exclusive), aligned on the hour
+        output_collection (str): collection receiving the hourly buckets
+
+    Returns:
+        list[dict[str, Any]]: aggregation stages
+    """
+    first_hour = {"$dateTrunc": {"date": "$start", "unit": "hour"}}
+    return [
+        # comparing with dates skips documents still holding string timestamps
+        {"$match": {"end_time": {"$gt": since}, "start_time": {"$lt": until}}},
+        {
+            "$project": {
+                "device_id": True,
+                "device_os": True,
+                "start": {"$max": ["$start_time", since]},
+                "end": {"$min": ["$end_time", until]},
+            }
+        },
+        {
+            "$set": {
+                "hour": {
+                    "$map": {
+                        "input": {
+                            "$range": [
+                                0,
+                                {
+                                    "$add": [
+                                        {
+                                            "$dateDiff": {
+                                                "startDate": first_hour,
+                                                "endDate": "$end",
+                                                "unit": "hour",
+                                            }
+                                        },
+                                        1,
+                                    ]
+                                },
+                            ]
+                        },
+                        "as": "offset",
+                        "in": {
+                            "$dateAdd": {
+                                "startDate": first_hour,
+                                "unit": "hour",
+                                "amount": "$$offset",
+                            }
+                        },
+                    }
+                }
+            }
+        },
+        {"$unwind": "$hour"},
+        {
+            "$set": {
+                "busy_milliseconds": {
+                    "$subtract": [
+                        {
+                            "$min": [
+                                "$end",
+                                {
+                                    "$dateAdd": {
+                                        "startDate": "$hour",
+                                        "unit": "hour",
+                                        "amount": 1,
+                                    }
+                                },
+                            ]
+                        },
+                        {"$max": ["$start", "$hour"]},
+                    ]
+                }
+            }
+        },
+        # a session ending exactly on the hour yields an empty trailing bucket
+        {"$match": {"busy_milliseconds": {"$gt": 0}}},
+        {
+            "$group": {
+                "_id": {"device_id": "$device_id", "hour": "$hour"},
+                "device_os": {"$first": "$device_os"},
+                "sessions": {"$sum": 1},
+                "busy_milliseconds": {"$sum": "$busy_milliseconds"},
+            }
+        },
+        {
+            "$project": {
+                "device_id": "$_id.device_id",
+                "hour": "$_id.hour",
+                "device_os": True,
+                "sessions": True,
+                "busy_seconds": {"$divide": ["$busy_milliseconds", 1000]},
+                "utilization": {"$divide": ["$busy_milliseconds", HOUR_MILLISECONDS]},
+                "rolled_up_at": "$$NOW",
+            }
+        },
+        {
+            "$merge": {
+                "into": output_collection,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+def session_timestamp_migration() -> list[dict[str, Any]]:
+    """Builds the pipeline update converting legacy string session timestamps into BSON dates
+
+    Sessions used to store str(datetime.utcnow()), ex: "2024-05-01 10:15:30.123456". mongodb
+    parses up to millisecond precision, so the microseconds are cut before parsing.
+
+    Returns:
+        list[dict[str, Any]]: update pipeline for update_many
+    """
+
+    def to_date(field: str) -> dict[str, Any]:
+        return {
+            "$cond": [
+                {"$eq": [{"$type": f"${field}"}, "string"]},
+                {
+                    "$dateFromString": {
+                        "dateString": {"$substrCP": [f"${field}", 0, 23]},
+                        "timezone": "UTC",
+                        "onError": f"${field}",
+                    }
+                },
+                f"${field}",
+            ]
+        }
+
+    return [
+        {"$set": {"start_time": to_date("start_time"), "end_time": to_date("end_time")}}
+    ]
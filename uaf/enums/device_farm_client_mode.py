@@ -0,0 +1,13 @@
+from . import Enum, unique
+
+
+@unique
+class DeviceFarmClientMode(Enum):
+    """How the device farm client reaches the device farm as constant
+
+    Args:
+        Enum (DeviceFarmClientMode): enum
+    """
+
+    DIRECT = "direct"
+    CELERY = "celery"
@@ -13,3 +13,4 @@ class DeviceStatus(Enum):
     TERMINATED = "terminated"
     IN_USE = "in_use"
     FAULTY = "faulty"
+    DISCONNECTED = "disconnected"
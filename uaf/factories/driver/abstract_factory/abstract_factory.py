@@ -55,6 +55,7 @@ class AbstractMobileDriverFactory(metaclass=ABCMeta):
         execution_mode: ExecutionMode,
         environment: Environments,
         capabilities: dict[str, Any],
+        appium_url: str | None = None,
     ):
         """Retrieve the mobile driver based on specified parameters.
 
@@ -64,5 +65,6 @@ class AbstractMobileDriverFactory(metaclass=ABCMeta):
             execution_mode (ExecutionMode): The mode in which the tests will be executed (e.g., local, remote).
             environment (Environments): The environment where the application will run (e.g., staging, production).
             capabilities (dict[str, Any]): A dictionary of desired capabilities for configuring the mobile driver.
+            appium_url (str | None): The running Appium server of the host owning the device, if any. Defaults to None.
         """
         pass
@@ -36,10 +36,13 @@ class AbstractMobile(ABC):
         pass
 
     @abstractmethod
-    def get_mobile_driver(self, *, capabilities: dict[str, Any]):
+    def get_mobile_driver(
+        self, *, capabilities: dict[str, Any], appium_url: str | None = None
+    ):
         """Retrieve or create a new mobile driver instance based on the provided capabilities.
 
         Args:
             capabilities (dict[str, Any]): A dictionary of desired capabilities for configuring the mobile driver.
+            appium_url (str | None): The running Appium server of the host owning the device, if any. Defaults to None.
         """
         pass
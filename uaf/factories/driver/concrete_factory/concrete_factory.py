@@ -28,7 +28,8 @@ class ConcreteMobileDriverFactory(abstract_factory.AbstractMobileDriverFactory):
         execution_mode: ExecutionMode,
         environment: Environments,
         capabilities: dict[str, Any],
-    ) -> tuple[WebDriver, int]:
+        appium_url: str | None = None,
+    ) -> tuple[WebDriver, int | None]:
         """Fetch or create a mobile driver instance.
 
         Args:
@@ -37,9 +38,10 @@ class ConcreteMobileDriverFactory(abstract_factory.AbstractMobileDriverFactory):
             execution_mode (ExecutionMode): The test execution mode (e.g., local, remote).
             environment (Environments): The environment where the mobile application will run (e.g., staging, production).
             capabilities (dict[str, Any]): A dictionary of desired capabilities for configuring the mobile driver.
+            appium_url (str | None): The running Appium server of the host owning the device, if any. Defaults to None.
 
         Returns:
-            tuple[WebDriver, int]: A tuple containing the mobile driver instance and a session identifier.
+            tuple[WebDriver, int | None]: A tuple containing the mobile driver instance and the launched Appium port, None if appium_url was used.
         """
         return ConcreteMobileDriver(
             os=os,
@@ -47,7 +49,7 @@ class ConcreteMobileDriverFactory(abstract_factory.AbstractMobileDriverFactory):
             execution_mode=execution_mode,
             environment=environment,
         ).get_mobile_driver(
-            capabilities=capabilities
+            capabilities=capabilities, appium_url=appium_url
         )  # type: ignore[misc]
 
 
@@ -48,20 +48,24 @@ class ConcreteMobileDriver(AbstractMobile):
         self.exec_mode = execution_mode
 
     def get_mobile_driver(
-        self, *, capabilities: dict[str, Any]
-    ) -> tuple[WebDriver, int]:
+        self, *, capabilities: dict[str, Any], appium_url: str | None = None
+    ) -> tuple[WebDriver, int | None]:
         """Fetch or create a mobile driver instance.
 
         This method launches the Appium service and returns the appropriate mobile driver
         based on the mobile OS (Android or iOS) and the given capabilities. It also handles
-        setting up the Appium base URL and port.
+        setting up the Appium base URL and port. When the device is plugged into another
+        host of the device farm, the Appium server of that host is used instead.
 
         Args:
             capabilities (dict[str, Any]): A dictionary of mobile driver capabilities.
+            appium_url (str | None): The running Appium server of the host owning the device, if any. Defaults to None.
 
         Returns:
-            tuple[WebDriver, int]: A tuple containing the mobile driver instance and the Appium port.
+            tuple[WebDriver, int | None]: A tuple containing the mobile driver instance and the launched Appium port, None if appium_url was used.
         """
+        if appium_url is not None:
+            return self.__get_driver(appium_url, capabilities), None
         common_config = YamlParser(FilePaths.COMMON)
         port = CoreUtils.launch_appium_service(self.os, self.app_type)
         remote_url = (
@@ -78,8 +82,20 @@ class ConcreteMobileDriver(AbstractMobile):
 
         host = urlparse(remote_url).hostname
         CoreUtils.wait_for_appium_service_to_load(30, host, port)
+        return self.__get_driver(remote_url, capabilities), port
+
+    def __get_driver(self, remote_url: str, capabilities: dict[str, Any]) -> WebDriver:
+        """Creates the driver of the mobile OS against the given Appium server
+
+        Args:
+            remote_url (str): Appium server url
+            capabilities (dict[str, Any]): A dictionary of mobile driver capabilities.
+
+        Returns:
+            WebDriver: The mobile driver instance.
+        """
         return (
             ConcreteAndroidDriver(remote_url).get_driver(capabilities=capabilities)
             if self.os.value == MobileOs.ANDROID.value
             else ConcreteIOSDriver(remote_url).get_driver(capabilities=capabilities)
-        ), port
+        )
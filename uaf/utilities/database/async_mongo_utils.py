@@ -0,0 +1,549 @@
+from typing import Any, AsyncIterator
+
+from pymongo import AsyncMongoClient, IndexModel, UpdateOne
+from pymongo.errors import CollectionInvalid, ConnectionFailure, OperationFailure
+
+from uaf.utilities.database.mongo_utils import read_options
+
+
+class AsyncMongoUtility:
+    """asyncio counterpart of MongoUtility, built on pymongo's native AsyncMongoClient
+
+    Every database call is a coroutine, so hundreds of concurrent operations, ex: seeding test
+    data with asyncio.gather, share one event loop and one connection pool instead of a thread
+    per caller. A client is bound to the event loop it was first used on, create one utility
+    per loop.
+
+    Ex:
+        async with AsyncMongoUtility(connection_string, pool_size=50) as mongo:
+            await asyncio.gather(*(mongo.insert_one("users", user) for user in users))
+    """
+
+    def __init__(self, connection_string, pool_size=10, uuid_representation="standard"):
+        """constructor
+
+        Args:
+            connection_string (_type_): connection string - format : mongodb://[username:password@]host1[:port1][,...hostN[:portN]][/[defaultauthdb][?options]]
+            pool_size (int, optional): max connection that can be open at the same time between application and mongodb, operations beyond it wait for a free connection. Defaults to 10.
+            uuid_representation (str, optional): uuid representation value. Defaults to "standard".
+        """
+        self._client = None
+        self.connection_string = connection_string
+        self.pool_size = pool_size
+        self._database = None
+        self.collections = {}
+        self._uuid_representation = uuid_representation
+
+    async def __aenter__(self) -> "AsyncMongoUtility":
+        """
+        Enter method to support the async with statement
+        """
+        self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Exit method to support the async with statement
+
+        Args:
+            exc_type (_type_): exception type
+            exc_val (_type_): exception value
+            exc_tb (_type_): exception traceback
+        """
+        await self.disconnect()
+
+    async def ping(self):
+        """Test connection to the mongodb database"""
+        if self._database is not None:
+            return await self._database.command("ping")
+
+    @property
+    def client(self):
+        """Provides async mongodb client instance
+
+        Returns:
+            AsyncMongoClient: async mongo client instance
+        """
+        if not self._client:
+            self.connect()
+        return self._client
+
+    @property
+    def uuid_representation(self):
+        """
+        Returns the uuid representation of active instance in focus
+        """
+        return self._uuid_representation
+
+    def connect(self):
+        """Creates the client, connections are opened lazily by the first operations
+
+        Raises:
+            ConnectionFailure: if failed to connect to mongodb
+        """
+        try:
+            self._client = AsyncMongoClient(
+                self.connection_string,
+                maxPoolSize=self.pool_size,
+                uuidRepresentation=self._uuid_representation,
+            )
+            self._database = self._client.get_default_database()
+        except ConnectionFailure as e:
+            raise ConnectionFailure(f"Failed to connect to MongoDB: {e}")
+
+    async def disconnect(self):
+        """Disconnects from mongo database"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        self._database = None
+        self.collections = {}
+
+    def get_collection(self, collection_name: str):
+        """Fetches collection from current active database, connecting first if needed
+
+        Args:
+            collection_name (str): name of collection
+
+        Raises:
+            ConnectionFailure: if the connection string has no default database
+            CollectionInvalid: if the collection name is invalid
+
+        Returns:
+            AsyncCollection: collection
+        """
+        if self._database is None:
+            self.connect()
+        database = self._database
+        if database is None:
+            raise ConnectionFailure(
+                f"No default database to get {collection_name} collection from!!"
+            )
+        if collection_name not in self.collections:
+            try:
+                self.collections[collection_name] = database[collection_name]
+            except CollectionInvalid as e:
+                raise CollectionInvalid(f"Failed to get collection: {e}")
+        return self.collections[collection_name]
+
+    async def create_indexes(
+        self, collection_name: str, indexes: list[IndexModel], **kwargs: Any
+    ):
+        """Creates the given indexes on a collection, existing identical indexes are left untouched
+
+        Args:
+            collection_name (str): name of the collection
+            indexes (list[IndexModel]): index definitions
+
+        Raises:
+            OperationFailure: if failed to create indexes, ex: an existing index has conflicting options
+
+        Returns:
+            list[str]: names of the indexes
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return await collection.create_indexes(indexes, **kwargs)
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to create indexes: {e}")
+
+    async def insert_one(
+        self, collection_name: str, document: dict[str, Any], **kwargs: Any
+    ):
+        """Insert one document in the given collection of current active database in focus
+
+        Args:
+            collection_name (str): name of the collection
+            document (dict[str, Any]): unit document
+
+        Raises:
+            OperationFailure: if failed to insert document
+
+        Returns:
+            InsertOneResult: insertion result status
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return await collection.insert_one(document, **kwargs)
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to insert document: {e}")
+
+    async def insert_many(
+        self, collection_name: str, documents: list[dict[str, Any]], **kwargs: Any
+    ):
+        """Inserts one or more documents in the given collection of current active database in focus
+
+        Args:
+            collection_name (str): name of the collection
+            documents (List[dict[str, Any]]): list documents that needs to be inserted
+
+        Raises:
+            OperationFailure: if failed to insert documents
+
+        Returns:
+            InsertManyResult: data insertions result
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return await collection.insert_many(documents, **kwargs)
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to insert documents: {e}")
+
+    async def bulk_write(
+        self,
+        collection_name: str,
+        requests: list[Any],
+        ordered: bool = False,
+        **kwargs: Any,
+    ):
+        """Sends a batch of write operations to the given collection in a single round trip
+
+        Args:
+            collection_name (str): name of the collection
+            requests (list[Any]): write operations, ex: InsertOne, UpdateOne, DeleteMany
+            ordered (bool, optional): stop at the first failing operation when True. Defaults to False.
+
+        Raises:
+            OperationFailure: if failed to write documents
+
+        Returns:
+            BulkWriteResult | None: bulk write result or None when there is nothing to write
+        """
+        if not requests:
+            return None
+        try:
+            collection = self.get_collection(collection_name)
+            return await collection.bulk_write(requests, ordered=ordered, **kwargs)
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to bulk write documents: {e}")
+
+    async def upsert_many(
+        self,
+        collection_name: str,
+        documents: list[dict[str, Any]],
+        key_fields: list[str],
+        on_insert_only: bool = False,
+        ordered: bool = False,
+    ):
+        """Inserts documents which don't exist yet and updates the ones that do, matched on the key fields
+
+        Args:
+            collection_name (str): name of the collection
+            documents (list[dict[str, Any]]): documents to upsert
+            key_fields (list[str]): fields identifying a document, should be backed by a unique index
+            on_insert_only (bool, optional): leave existing documents untouched and only insert missing ones. Defaults to False.
+            ordered (bool, optional): see bulk_write. Defaults to False.
+
+        Raises:
+            OperationFailure: if failed to upsert documents
+
+        Returns:
+            BulkWriteResult | None: bulk write result or None when there is nothing to write
+        """
+        operator = "$setOnInsert" if on_insert_only else "$set"
+        requests = [
+            UpdateOne(
+                {field: document[field] for field in key_fields},
+                {operator: document},
+                upsert=True,
+            )
+            for document in documents
+        ]
+        return await self.bulk_write(collection_name, requests, ordered=ordered)
+
+    async def find_one(
+        self,
+        collection_name: str,
+        filter: dict[str, Any] | None = None,
+        projection: dict[str, Any] | list[str] | None = None,
+        hint: str | list[tuple[str, int]] | None = None,
+        **kwargs: Any,
+    ):
+        """Fetches a document with respect to filter query provided
+
+        Args:
+            collection_name (str): name of the collection
+            filter (Optional[dict[str, Any]], optional): filter query. Defaults to None.
+            projection (dict[str, Any] | list[str] | None, optional): see read_options. Defaults to None.
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
+
+        Raises:
+            OperationFailure: if failed to find a document
+
+        Returns:
+            _DocumentType: a single document
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return await collection.find_one(
+                filter, **read_options(projection, hint), **kwargs
+            )
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to find document: {e}")
+
+    async def find_one_and_replace(
+        self,
+        collection_name: str,
+        filter: dict[str, Any],
+        replacement: dict[str, Any],
+        projection: dict[str, Any] | list[str] | None = None,
+        hint: str | list[tuple[str, int]] | None = None,
+        **kwargs: Any,
+    ):
+        """Fetches a document with respect to filter query provided and replaces it with replacement document
+
+        Args:
+            collection_name (str): name of the collection
+            filter (dict[str, Any]): filter query
+            replacement (dict[str, Any]): replacement document
+            projection (dict[str, Any] | list[str] | None, optional): see read_options. Defaults to None.
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
+
+        Raises:
+            OperationFailure: if failed to find and replace document
+
+        Returns:
+            _DocumentType | None: matched document or None if nothing matched
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return await collection.find_one_and_replace(
+                filter, replacement, **read_options(projection, hint), **kwargs
+            )
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to find and replace document: {e}")
+
+    async def find_one_and_update(
+        self,
+        collection_name: str,
+        filter: dict[str, Any],
+        update: dict[str, Any],
+        projection: dict[str, Any] | list[str] | None = None,
+        hint: str | list[tuple[str, int]] | None = None,
+        **kwargs: Any,
+    ):
+        """Atomically fetches a document with respect to filter query provided and applies the update to it
+
+        Args:
+            collection_name (str): name of the collection
+            filter (dict[str, Any]): filter query
+            update (dict[str, Any]): update data
+            projection (dict[str, Any] | list[str] | None, optional): see read_options. Defaults to None.
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
+
+        Raises:
+            OperationFailure: if failed to find and update document
+
+        Returns:
+            _DocumentType | None: matched document (before or after the update depending on return_document) or None if nothing matched
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return await collection.find_one_and_update(
+                filter, update, **read_options(projection, hint), **kwargs
+            )
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to find and update document: {e}")
+
+    async def find_many(
+        self,
+        collection_name: str,
+        filter: dict[str, Any] | None = None,
+        lazy: bool = False,
+        projection: dict[str, Any] | list[str] | None = None,
+        hint: str | list[tuple[str, int]] | None = None,
+        limit: int | None = None,
+        batch_size: int | None = None,
+        **kwargs: Any,
+    ):
+        """Fetches list of documents with respect to filter query provided
+
+        Args:
+            collection_name (str): name of the collection
+            filter (Optional[dict[str, Any]], optional): filter query. Defaults to None.
+            lazy (bool, optional): return the cursor instead of a list, to iterate with async for. Defaults to False.
+            projection (dict[str, Any] | list[str] | None, optional): see read_options. Defaults to None.
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
+            limit (int | None, optional): see read_options. Defaults to None.
+            batch_size (int | None, optional): see read_options. Defaults to None.
+
+        Raises:
+            OperationFailure: if failed to find documents
+
+        Returns:
+            list[_DocumentType] | AsyncCursor[_DocumentType]: list of matching documents, or the cursor when lazy
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            cursor = collection.find(
+                filter, **read_options(projection, hint, limit, batch_size), **kwargs
+            )
+            if lazy:
+                return cursor
+            return await cursor.to_list()
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to find documents: {e}")
+
+    async def iter_many(
+        self,
+        collection_name: str,
+        filter: dict[str, Any] | None = None,
+        projection: dict[str, Any] | list[str] | None = None,
+        sort: list[tuple[str, int]] | None = None,
+        batch_size: int = 1000,
+        hint: str | list[tuple[str, int]] | None = None,
+        limit: int | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Streams documents with respect to filter query provided, holding one batch in memory at a time
+
+        Args:
+            collection_name (str): name of the collection
+            filter (Optional[dict[str, Any]], optional): filter query. Defaults to None.
+            projection (dict[str, Any] | list[str] | None, optional): fields to return. Defaults to None, i.e. whole documents.
+            sort (list[tuple[str, int]] | None, optional): sort keys and directions. Defaults to None.
+            batch_size (int, optional): documents fetched per round trip. Defaults to 1000.
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
+            limit (int | None, optional): see read_options. Defaults to None.
+
+        Raises:
+            OperationFailure: if failed to find documents
+
+        Yields:
+            AsyncIterator[dict[str, Any]]: matching documents
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            cursor = collection.find(
+                filter,
+                sort=sort,
+                **read_options(projection, hint, limit, batch_size),
+                **kwargs,
+            )
+            async with cursor:
+                async for document in cursor:
+                    yield document
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to find documents: {e}")
+
+    async def aggregate(
+        self,
+        collection_name: str,
+        pipeline: list[dict[str, Any]],
+        hint: str | list[tuple[str, int]] | None = None,
+        batch_size: int | None = None,
+        **kwargs: Any,
+    ):
+        """Runs an aggregation pipeline on the server, project early in the pipeline to keep documents small
+
+        Args:
+            collection_name (str): name of the collection
+            pipeline (list[dict[str, Any]]): aggregation stages
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
+            batch_size (int | None, optional): see read_options. Defaults to None.
+
+        Raises:
+            OperationFailure: if failed to run the aggregation
+
+        Returns:
+            list[_DocumentType]: resulting documents, empty when the pipeline ends with $merge/$out
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if hint is not None:
+                kwargs["hint"] = hint
+            if batch_size is not None:
+                kwargs["batchSize"] = batch_size
+            cursor = await collection.aggregate(pipeline, **kwargs)
+            return await cursor.to_list()
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to aggregate documents: {e}")
+
+    async def update_one(
+        self,
+        collection_name: str,
+        filter: dict[str, Any],
+        update: dict[str, Any],
+        **kwargs: Any,
+    ):
+        """Updates a filtered document from a collection
+
+        Args:
+            collection_name (str): name of the collection
+            filter (dict[str, Any]): filter query
+            update (dict[str, Any]): update data
+
+        Raises:
+            OperationFailure: if failed to update document
+
+        Returns:
+            UpdateResult: update result status
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return await collection.update_one(filter, update, **kwargs)
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to update document: {e}")
+
+    async def update_many(
+        self,
+        collection_name: str,
+        filter: dict[str, Any],
+        update: dict[str, Any] | list[dict[str, Any]],
+        **kwargs: Any,
+    ):
+        """Updates one or more filtered documents from a collection
+
+        Args:
+            collection_name (str): name of the collection
+            filter (dict[str, Any]): filter query
+            update (dict[str, Any] | list[dict[str, Any]]): update data or an aggregation pipeline update
+
+        Raises:
+            OperationFailure: if failed to update documents
+
+        Returns:
+            UpdateResult: update result status
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return await collection.update_many(filter, update, **kwargs)
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to update documents: {e}")
+
+    async def delete_one(self, collection_name: str, filter: dict[str, Any]):
+        """Deletes a filtered document from a collection
+
+        Args:
+            collection_name (str): name of the collection
+            filter (dict[str, Any]): filter query
+
+        Raises:
+            OperationFailure: if failed to delete document
+
+        Returns:
+            DeleteResult: delete result status
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return await collection.delete_one(filter)
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to delete document: {e}")
+
+    async def delete_many(self, collection_name: str, filter: dict[str, Any]):
+        """Deletes one or more filtered documents from a collection
+
+        Args:
+            collection_name (str): name of the collection
+            filter (dict[str, Any]): filter query
+
+        Raises:
+            OperationFailure: if failed to delete documents
+
+        Returns:
+            DeleteResult: delete result status
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return await collection.delete_many(filter)
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to delete documents: {e}")
@@ -0,0 +1,221 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, cast
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool
+
+from uaf.utilities.database.postgres_utility import pool_name
+
+
+class AsyncPostgresUtility:
+    """
+    asyncio counterpart of PostgresUtility, built on psycopg's AsyncConnection and AsyncConnectionPool.
+
+    A single connection runs one query at a time, so to run many verification queries
+    concurrently from one event loop, ex: with asyncio.gather, use pooled mode: every call
+    borrows its own connection from the pool. The pool belongs to the instance and to the
+    event loop it was opened on.
+
+    Ex:
+        async with AsyncPostgresUtility(connection_string, pooled=True, max_size=20) as postgres:
+            rows = await asyncio.gather(*(postgres.fetch_one(query, (x,)) for x in ids))
+    """
+
+    def __init__(
+        self,
+        connection_string: str,
+        pooled: bool = False,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_idle: float = 600.0,
+        pool_timeout: float = 30.0,
+    ):
+        """
+        Constructor for AsyncPostgresUtility class, the connection is opened by connect.
+
+        Args:
+            connection_string (str): PostgreSQL connection string
+            pooled (bool): Borrow a connection per call from a pool instead of sharing one connection.
+            min_size (int): Pooled mode, connections kept open even when idle.
+            max_size (int): Pooled mode, max connections open at the same time.
+            max_idle (float): Pooled mode, seconds an idle connection above min_size is kept open.
+            pool_timeout (float): Pooled mode, seconds a call waits for a free connection.
+        """
+        self.connection_string = connection_string
+        self.pooled = pooled
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.pool_timeout = pool_timeout
+        self.conn: psycopg.AsyncConnection | None = None
+        self._pool: AsyncConnectionPool | None = None
+        # concurrent first calls must not open the connection or pool twice
+        self._connect_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncPostgresUtility":
+        """
+        Support for the async with statement to automatically manage resources.
+        """
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        Exit method for async context manager to close connections.
+        """
+        await self.disconnect()
+
+    async def connect(self):
+        """
+        Open the connection, or the pool in pooled mode, if not open yet.
+        """
+        async with self._connect_lock:
+            await self._connect()
+
+    async def _connect(self):
+        if self.pooled:
+            if self._pool is None:
+                pool = AsyncConnectionPool(
+                    self.connection_string,
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    max_idle=self.max_idle,
+                    timeout=self.pool_timeout,
+                    kwargs={"autocommit": True},
+                    # a connection broken while idle is replaced instead of being handed out
+                    check=AsyncConnectionPool.check_connection,
+                    name=pool_name(self.connection_string),
+                    open=False,
+                )
+                await pool.open()
+                self._pool = pool
+            return
+        if self.conn is None or self.conn.closed:
+            self.conn = await psycopg.AsyncConnection.connect(
+                self.connection_string, autocommit=True
+            )
+
+    async def disconnect(self):
+        """
+        Close the connection, or the pool in pooled mode.
+        """
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[psycopg.AsyncConnection]:
+        """
+        Provide the connection to run queries on, borrowed from the pool in pooled mode.
+
+        Yields:
+            psycopg.AsyncConnection: The shared connection, or a pooled one returned on exit.
+        """
+        await self.connect()
+        if self._pool is None:
+            yield self.conn
+            return
+        async with self._pool.connection() as conn:
+            yield conn
+
+    def pool_stats(self) -> dict[str, int]:
+        """
+        Fetch the usage and wait metrics of the pool.
+
+        Returns:
+            dict[str, int]: psycopg_pool stats, empty if not pooled or not connected yet.
+        """
+        if self._pool is None:
+            return {}
+        return cast(dict[str, int], self._pool.get_stats())
+
+    async def ping(self) -> tuple[Any, ...] | None:
+        """
+        Ping the database to ensure connection is live.
+
+        Returns:
+            Optional[tuple[Any, ...]]: The result of the ping query or None if no rows are returned.
+        """
+        async with self.connection() as conn, conn.cursor() as cursor:
+            await cursor.execute("SELECT 1")
+            result = await cursor.fetchone()
+            if result is not None:
+                return tuple(result)
+            return None
+
+    async def execute(self, query: str, params: tuple[Any, ...] | None = None) -> None:
+        """
+        General method to execute a SQL query (INSERT, UPDATE, DELETE) without expecting any result.
+
+        Args:
+            query (str): The SQL query to execute.
+            params (Optional[tuple[Any, ...]]): Parameters for the query.
+        """
+        async with self.connection() as conn, conn.cursor() as cursor:
+            await cursor.execute(query, params)
+
+    async def fetch_one(
+        self, query: str, params: tuple[Any, ...] | None = None
+    ) -> dict[str, Any] | None:
+        """
+        Fetch a single row from the database.
+
+        Args:
+            query (str): The SQL SELECT query.
+            params (Optional[tuple[Any, ...]]): Parameters for the query.
+
+        Returns:
+            Optional[dict[str, Any]]: A single row as a dictionary or None if no rows are found.
+        """
+        async with (
+            self.connection() as conn,
+            conn.cursor(row_factory=psycopg.rows.dict_row) as cursor,
+        ):
+            await cursor.execute(query, params)
+            return cast(dict[str, Any] | None, await cursor.fetchone())
+
+    async def fetch_many(
+        self, query: str, params: tuple[Any, ...] | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Fetch multiple rows from the database.
+
+        Args:
+            query (str): The SQL SELECT query.
+            params (Optional[tuple[Any, ...]]): Parameters for the query.
+
+        Returns:
+            list[dict[str, Any]]: A list of rows as dictionaries.
+        """
+        async with (
+            self.connection() as conn,
+            conn.cursor(row_factory=psycopg.rows.dict_row) as cursor,
+        ):
+            await cursor.execute(query, params)
+            results = await cursor.fetchall()
+            return results if results is not None else []
+
+    async def modify(self, query: str, params: tuple[Any, ...] | None = None) -> None:
+        """
+        Generalized method to perform INSERT, UPDATE, or DELETE operations.
+
+        Args:
+            query (str): The SQL query to execute (INSERT, UPDATE, DELETE).
+            params (Optional[tuple[Any, ...]]): Parameters for the query.
+        """
+        await self.execute(query, params)
+
+    async def modify_many(self, query: str, params_list: list[tuple[Any, ...]]) -> None:
+        """
+        Generalized method to perform batch INSERT, UPDATE, or DELETE operations.
+
+        Args:
+            query (str): The SQL query to execute.
+            params_list (list[tuple[Any, ...]]): List of parameter tuples for the query.
+        """
+        async with self.connection() as conn, conn.cursor() as cursor:
+            await cursor.executemany(query, params_list)
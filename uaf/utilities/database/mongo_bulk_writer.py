@@ -0,0 +1,226 @@
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import bson
+from bson.binary import UuidRepresentation
+from bson.codec_options import CodecOptions
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+if TYPE_CHECKING:
+    from uaf.utilities.database.mongo_utils import MongoUtility
+
+# the server caps a write batch at 100k operations and its message at 48MB
+DEFAULT_MAX_BATCH_OPERATIONS = 1000
+DEFAULT_MAX_BATCH_BYTES = 16 * 1024 * 1024
+_SIZE_CODEC_OPTIONS = CodecOptions(uuid_representation=UuidRepresentation.STANDARD)
+
+
+class BulkBatchResult(NamedTuple):
+    """Outcome of one batch sent by MongoBulkWriter"""
+
+    operations: int
+    bytes: int
+    seconds: float
+    inserted_count: int
+    matched_count: int
+    modified_count: int
+    upserted_count: int
+    deleted_count: int
+
+
+class MongoBulkWriter:
+    """Accumulates mixed write operations on a collection and sends them as bulk writes
+
+    Replaces hundreds of individual insert_one/update_one/delete_one round trips, ex: when
+    seeding test data, with a few bulk writes. Operations are buffered and a batch is sent as
+    soon as it reaches max_operations or max_bytes (estimated from the BSON size of the
+    operations), the rest is sent by flush or when leaving the with block.
+
+    Unordered batches (the default) let the server apply every operation even when some fail
+    and are faster, use ordered=True when operations depend on each other.
+
+    Ex:
+        with mongo.bulk_writer("accounts") as writer:
+            for account in accounts:
+                writer.upsert({"user": account["user"]}, account)
+            writer.delete_many({"expired": True})
+        print(writer.results)
+    """
+
+    def __init__(
+        self,
+        mongo_client: "MongoUtility",
+        collection_name: str,
+        ordered: bool = False,
+        max_operations: int = DEFAULT_MAX_BATCH_OPERATIONS,
+        max_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+    ) -> None:
+        """Constructor
+
+        Args:
+            mongo_client (MongoUtility): mongo utility sending the batches
+            collection_name (str): name of the collection
+            ordered (bool, optional): stop a batch at its first failing operation. Defaults to False.
+            max_operations (int, optional): operations per batch. Defaults to 1000.
+            max_bytes (int, optional): estimated bytes per batch, 16MB by default.
+
+        Raises:
+            ValueError: if max_operations or max_bytes is not positive
+        """
+        if max_operations <= 0 or max_bytes <= 0:
+            raise ValueError(
+                f"max_operations and max_bytes must be positive!! - {max_operations}, {max_bytes}"
+            )
+        self.mongo_client = mongo_client
+        self.collection_name = collection_name
+        self.ordered = ordered
+        self.max_operations = max_operations
+        self.max_bytes = max_bytes
+        self.results: list[BulkBatchResult] = []
+        self._pending: list[Any] = []
+        self._pending_bytes = 0
+
+    def __enter__(self) -> "MongoBulkWriter":
+        """
+        Enter method to support the with statement
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Exit method to support the with statement, sends the remaining operations unless the block failed
+
+        Args:
+            exc_type (_type_): exception type
+            exc_val (_type_): exception value
+            exc_tb (_type_): exception traceback
+        """
+        if exc_type is None:
+            self.flush()
+
+    @property
+    def pending(self) -> int:
+        """
+        Returns the number of buffered operations not sent yet
+        """
+        return len(self._pending)
+
+    def _add(self, operation: Any, *documents: Any):
+        """Buffers an operation and sends the batch once it is full
+
+        Args:
+            operation (Any): pymongo write operation
+            documents (Any): documents of the operation, used to estimate its size
+        """
+        size = sum(
+            len(bson.encode(document, codec_options=_SIZE_CODEC_OPTIONS))
+            for document in documents
+            if isinstance(document, dict)
+        )
+        if self._pending and self._pending_bytes + size > self.max_bytes:
+            self.flush()
+        self._pending.append(operation)
+        self._pending_bytes += size
+        if len(self._pending) >= self.max_operations:
+            self.flush()
+
+    def insert(self, document: dict[str, Any]):
+        """Buffers an insert
+
+        Args:
+            document (dict[str, Any]): document to insert
+        """
+        self._add(InsertOne(document), document)
+
+    def update_one(
+        self, filter: dict[str, Any], update: dict[str, Any], upsert: bool = False
+    ):
+        """Buffers an update of the first document matching the filter
+
+        Args:
+            filter (dict[str, Any]): filter query
+            update (dict[str, Any]): update data
+            upsert (bool, optional): insert a document when nothing matches. Defaults to False.
+        """
+        self._add(UpdateOne(filter, update, upsert=upsert), filter, update)
+
+    def update_many(
+        self, filter: dict[str, Any], update: dict[str, Any], upsert: bool = False
+    ):
+        """Buffers an update of every document matching the filter
+
+        Args:
+            filter (dict[str, Any]): filter query
+            update (dict[str, Any]): update data
+            upsert (bool, optional): insert a document when nothing matches. Defaults to False.
+        """
+        self._add(UpdateMany(filter, update, upsert=upsert), filter, update)
+
+    def upsert(self, filter: dict[str, Any], document: dict[str, Any]):
+        """Buffers an upsert setting the fields of document on the document matching the filter
+
+        Args:
+            filter (dict[str, Any]): filter query, should be backed by a unique index
+            document (dict[str, Any]): fields to set
+        """
+        self.update_one(filter, {"$set": document}, upsert=True)
+
+    def replace_one(
+        self, filter: dict[str, Any], replacement: dict[str, Any], upsert: bool = False
+    ):
+        """Buffers a replacement of the first document matching the filter
+
+        Args:
+            filter (dict[str, Any]): filter query
+            replacement (dict[str, Any]): replacement document
+            upsert (bool, optional): insert the replacement when nothing matches. Defaults to False.
+        """
+        self._add(ReplaceOne(filter, replacement, upsert=upsert), filter, replacement)
+
+    def delete_one(self, filter: dict[str, Any]):
+        """Buffers a delete of the first document matching the filter
+
+        Args:
+            filter (dict[str, Any]): filter query
+        """
+        self._add(DeleteOne(filter), filter)
+
+    def delete_many(self, filter: dict[str, Any]):
+        """Buffers a delete of every document matching the filter
+
+        Args:
+            filter (dict[str, Any]): filter query
+        """
+        self._add(DeleteMany(filter), filter)
+
+    def flush(self) -> BulkBatchResult | None:
+        """Sends the buffered operations as one bulk write
+
+        The buffer is emptied even when the write fails, the exception tells which operations
+        did not make it.
+
+        Raises:
+            OperationFailure: if failed to write documents
+
+        Returns:
+            BulkBatchResult | None: outcome of the batch, None if nothing was buffered
+        """
+        if not self._pending:
+            return None
+        operations, self._pending = self._pending, []
+        size, self._pending_bytes = self._pending_bytes, 0
+        started = time.perf_counter()
+        result = self.mongo_client.bulk_write(
+            self.collection_name, operations, ordered=self.ordered
+        )
+        batch = BulkBatchResult(
+            operations=len(operations),
+            bytes=size,
+            seconds=time.perf_counter() - started,
+            inserted_count=result.inserted_count,
+            matched_count=result.matched_count,
+            modified_count=result.modified_count,
+            upserted_count=result.upserted_count,
+            deleted_count=result.deleted_count,
+        )
+        self.results.append(batch)
+        return batch
@@ -0,0 +1,143 @@
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable
+
+import bson
+from bson.binary import UuidRepresentation
+from bson.codec_options import CodecOptions
+
+# sentinel telling a cached None (no matching document) apart from a miss
+_MISS = object()
+_KEY_CODEC_OPTIONS = CodecOptions(uuid_representation=UuidRepresentation.STANDARD)
+
+
+class MongoReadCache:
+    """Read-through cache of MongoUtility lookups, with a TTL and LRU eviction
+
+    Meant for reference data read over and over by page objects and fixtures, ex: test
+    accounts or product catalogues. Entries are keyed by (collection, filter, projection),
+    expire after ttl_seconds and the least recently used entry is evicted once max_entries
+    is reached. Every write made through the MongoUtility owning the cache drops the entries
+    of the written collection, writes made by other processes or utilities are only picked
+    up once the entries expire.
+
+    Documents are copied in and out of the cache, so callers may mutate what they get.
+
+    Stats:
+        - hits, misses: lookups served from cache or from the database
+        - evictions: entries dropped to make room
+        - invalidations: entries dropped by writes
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 60) -> None:
+        """Constructor
+
+        Args:
+            max_entries (int, optional): max number of cached lookups. Defaults to 1024.
+            ttl_seconds (float, optional): seconds a lookup is served from cache. Defaults to 60.
+
+        Raises:
+            ValueError: if max_entries or ttl_seconds is not positive
+        """
+        if max_entries <= 0 or ttl_seconds <= 0:
+            raise ValueError(
+                f"max_entries and ttl_seconds must be positive!! - {max_entries}, {ttl_seconds}"
+            )
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple[str, bytes], tuple[float, Any]] = OrderedDict()
+        self._counters: Counter[str] = Counter()
+        # bumped by every invalidation, a load racing with a write is not cached
+        self._generations: Counter[str | None] = Counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(
+        collection_name: str,
+        filter: dict[str, Any] | None,
+        projection: dict[str, Any] | list[str] | None,
+    ) -> tuple[str, bytes]:
+        """Builds the cache key of a lookup
+
+        Filter and projection are BSON encoded, so two lookups share an entry when the server
+        would see the very same query, field order included.
+
+        Args:
+            collection_name (str): name of the collection
+            filter (dict[str, Any] | None): filter query
+            projection (dict[str, Any] | list[str] | None): fields to return
+
+        Returns:
+            tuple[str, bytes]: cache key
+        """
+        return collection_name, bson.encode(
+            {"filter": filter or {}, "projection": projection},
+            codec_options=_KEY_CODEC_OPTIONS,
+        )
+
+    def get_or_load(self, key: tuple[str, bytes], load: Callable[[], Any]) -> Any:
+        """Serves a lookup from cache or loads it from the database and caches it
+
+        Args:
+            key (tuple[str, bytes]): cache key, see key
+            load (Callable[[], Any]): reads the database on a miss
+
+        Returns:
+            Any: cached or loaded result
+        """
+        now = time.monotonic()
+        with self._lock:
+            expires_at, value = self._entries.get(key, (0.0, _MISS))
+            if value is not _MISS and expires_at > now:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return copy.deepcopy(value)
+            self._counters["misses"] += 1
+            generation = self._generation(key[0])
+        value = load()
+        with self._lock:
+            if self._generation(key[0]) != generation:
+                return value
+            self._entries[key] = (now + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+        return value
+
+    def _generation(self, collection_name: str) -> tuple[int, int]:
+        return self._generations[None], self._generations[collection_name]
+
+    def invalidate(self, collection_name: str | None = None):
+        """Drops the cached lookups of a collection
+
+        Args:
+            collection_name (str | None, optional): name of the collection. Defaults to None, i.e. every collection.
+        """
+        with self._lock:
+            self._generations[collection_name] += 1
+            keys = [
+                key
+                for key in self._entries
+                if collection_name is None or key[0] == collection_name
+            ]
+            for key in keys:
+                del self._entries[key]
+            self._counters["invalidations"] += len(keys)
+
+    def stats(self) -> dict[str, int]:
+        """Fetches a snapshot of the counters
+
+        Returns:
+            dict[str, int]: hits, misses, evictions, invalidations and current number of entries
+        """
+        with self._lock:
+            return {
+                "hits": self._counters["hits"],
+                "misses": self._counters["misses"],
+                "evictions": self._counters["evictions"],
+                "invalidations": self._counters["invalidations"],
+                "entries": len(self._entries),
+            }
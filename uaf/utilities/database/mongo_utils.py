@@ -1,23 +1,266 @@
-from typing import Any
-
-from pymongo import MongoClient
+import os
+import threading
+from collections import Counter
+from typing import Any, Iterator, cast
+
+from pymongo import IndexModel, MongoClient, UpdateOne
+from pymongo.collection import Collection
+from pymongo.database import Database
 from pymongo.errors import CollectionInvalid, ConnectionFailure, OperationFailure
+from pymongo.monitoring import ConnectionPoolListener
+
+from uaf.utilities.database.mongo_bulk_writer import (
+    DEFAULT_MAX_BATCH_BYTES,
+    DEFAULT_MAX_BATCH_OPERATIONS,
+    MongoBulkWriter,
+)
+from uaf.utilities.database.mongo_read_cache import MongoReadCache
+
+
+class PoolStatsListener(ConnectionPoolListener):
+    """Counts connection pool events of a mongo client, across all the servers it talks to
+
+    Stats:
+        - open_connections: connections currently open
+        - checked_out: connections currently lent to an operation
+        - checkouts: connections lent since the client was created
+        - checkout_failures: operations which could not get a connection, ex: pool wait timeout
+        - pool_clears: times a pool was cleared, ex: after a network error or failover
+    """
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self._counters: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def _add(self, counter: str, value: int = 1):
+        with self._lock:
+            self._counters[counter] += value
+
+    def stats(self) -> dict[str, int]:
+        """Fetches a snapshot of the counters
+
+        Returns:
+            dict[str, int]: counter name => value
+        """
+        with self._lock:
+            return {
+                counter: self._counters[counter]
+                for counter in (
+                    "open_connections",
+                    "checked_out",
+                    "checkouts",
+                    "checkout_failures",
+                    "pool_clears",
+                )
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add("pool_clears")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add("open_connections")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add("open_connections", -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._add("checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._add("checked_out")
+        self._add("checkouts")
+
+    def connection_checked_in(self, event):
+        self._add("checked_out", -1)
+
+
+def read_options(
+    projection: dict[str, Any] | list[str] | None = None,
+    hint: str | list[tuple[str, int]] | None = None,
+    limit: int | None = None,
+    batch_size: int | None = None,
+) -> dict[str, Any]:
+    """Builds the keyword arguments of a pymongo read, leaving out the options not set
+
+    Args:
+        projection (dict[str, Any] | list[str] | None, optional): fields to return, ex: ["device_id"] or {"_id": False, "device_id": True}. Defaults to None, i.e. whole documents.
+        hint (str | list[tuple[str, int]] | None, optional): index name or keys the server must use. Defaults to None.
+        limit (int | None, optional): max number of documents. Defaults to None, i.e. no limit.
+        batch_size (int | None, optional): documents fetched per round trip. Defaults to None, i.e. server default.
+
+    Returns:
+        dict[str, Any]: keyword arguments for find, find_one, find_one_and_*
+    """
+    options = {
+        "projection": projection,
+        "hint": hint,
+        "limit": limit,
+        "batch_size": batch_size,
+    }
+    return {option: value for option, value in options.items() if value is not None}
+
+
+def redact_connection_string(connection_string: str) -> str:
+    """Hides the password of a connection string, ex: to log it or use it as a stats key
+
+    Args:
+        connection_string (str): mongodb connection string
+
+    Returns:
+        str: connection string with the password replaced by ***
+    """
+    scheme, separator, rest = connection_string.partition("://")
+    hosts, slash, options = rest.partition("/")
+    credentials, at, hosts = hosts.rpartition("@")
+    username, colon, _ = credentials.partition(":")
+    if not colon:
+        return connection_string
+    return f"{scheme}{separator}{username}:***{at}{hosts}{slash}{options}"
+
+
+class MongoClientRegistry:
+    """Process wide registry of mongo clients, one per connection string
+
+    MongoClient is thread safe and pools its connections, so every MongoUtility of a process
+    pointing at the same server should share one client instead of opening its own pool. A
+    client must not cross a fork though: the registry forgets the parent's clients in a forked
+    child, ex: a celery prefork worker, and the child lazily connects its own on first use.
+    """
+
+    _lock = threading.Lock()
+    _clients: dict[tuple[str, str], tuple[MongoClient, PoolStatsListener]] = {}
+    _pid = os.getpid()
+
+    @classmethod
+    def get_client(
+        cls,
+        connection_string: str,
+        pool_size: int = 10,
+        uuid_representation: str = "standard",
+    ) -> MongoClient:
+        """Fetches the client of a connection string, connecting it on first use in this process
+
+        Args:
+            connection_string (str): mongodb connection string
+            pool_size (int, optional): max pool size, only the first caller's value is used. Defaults to 10.
+            uuid_representation (str, optional): uuid representation value. Defaults to "standard".
+
+        Raises:
+            ConnectionFailure: if failed to connect to mongodb
+
+        Returns:
+            MongoClient: client shared by the process
+        """
+        key = (connection_string, uuid_representation)
+        with cls._lock:
+            if cls._pid != os.getpid():
+                cls._forget()
+            if key not in cls._clients:
+                listener = PoolStatsListener()
+                try:
+                    client = MongoClient(
+                        connection_string,
+                        maxPoolSize=pool_size,
+                        uuidRepresentation=uuid_representation,
+                        event_listeners=[listener],
+                    )
+                except ConnectionFailure as e:
+                    raise ConnectionFailure(f"Failed to connect to MongoDB: {e}")
+                cls._clients[key] = (client, listener)
+            return cls._clients[key][0]
+
+    @classmethod
+    def _forget(cls):
+        """Drops the clients inherited from a parent process without closing them, their
+        sockets and monitor threads belong to the parent"""
+        cls._clients = {}
+        cls._pid = os.getpid()
+
+    @classmethod
+    def reset(cls):
+        """Forgets every client, to be called right after a fork, ex: on celery worker_process_init"""
+        with cls._lock:
+            cls._forget()
+
+    @classmethod
+    def _after_fork_in_child(cls):
+        # the lock may have been held by another thread of the parent at fork time
+        cls._lock = threading.Lock()
+        cls._forget()
+
+    @classmethod
+    def close_all(cls):
+        """Closes every client of this process, ex: on worker shutdown"""
+        with cls._lock:
+            clients, cls._clients = cls._clients, {}
+        for client, _ in clients.values():
+            client.close()
+
+    @classmethod
+    def pool_stats(cls) -> dict[str, dict[str, int]]:
+        """Fetches the connection pool counters of every client of this process
+
+        Returns:
+            dict[str, dict[str, int]]: redacted connection string => pool counters, see PoolStatsListener
+        """
+        with cls._lock:
+            if cls._pid != os.getpid():
+                return {}
+            stats: dict[str, dict[str, int]] = {}
+            for (connection_string, _), (_, listener) in cls._clients.items():
+                counters = stats.setdefault(
+                    redact_connection_string(connection_string), Counter()
+                )
+                counters.update(listener.stats())
+            return {key: dict(value) for key, value in stats.items()}
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=MongoClientRegistry._after_fork_in_child)
 
 
 class MongoUtility:
-    def __init__(self, connection_string, pool_size=10, uuid_representation="standard"):
+    def __init__(
+        self,
+        connection_string,
+        pool_size=10,
+        uuid_representation="standard",
+        shared=False,
+        cache: MongoReadCache | None = None,
+    ):
         """constructor
 
         Args:
             connection_string (_type_): connection string - format : mongodb://[username:password@]host1[:port1][,...hostN[:portN]][/[defaultauthdb][?options]]
             pool_size (int, optional): max connection that can be open at the same time between application and mongodb. Defaults to 10.
             uuid_representation (str, optional): uuid representation value. Defaults to "standard".
+            shared (bool, optional): use the process wide client of MongoClientRegistry instead of a client of its own, connects lazily and reconnects after a fork. Defaults to False.
+            cache (MongoReadCache | None, optional): serve find_one lookups through this read-through cache, writes made through this utility invalidate it. Defaults to None, i.e. no caching.
         """
-        self._client = None
+        self.cache = cache
+        self._client: MongoClient[dict[str, Any]] | None = None
+        self._pid: int | None = None
+        self.shared = shared
         self.connection_string = connection_string
         self.pool_size = pool_size
-        self._database = None
-        self.collections = {}
+        self._database: Database[dict[str, Any]] | None = None
+        self.collections: dict[str, Collection[dict[str, Any]]] | None = {}
         self._uuid_representation = uuid_representation
 
     def __enter__(self) -> "MongoUtility":
@@ -51,10 +294,18 @@ class MongoUtility:
         Returns:
             MongoClient: mongo client instance
         """
-        if not self._client:
+        if not self._client or self._is_stale():
             self.connect()
         return self._client
 
+    def _is_stale(self) -> bool:
+        """Checks if a shared client was connected by a parent process, i.e. before a fork
+
+        Returns:
+            bool: True if the client must be fetched again from the registry
+        """
+        return self.shared and self._pid != os.getpid()
+
     @property
     def database(self):
         """Fetches the default database
@@ -130,6 +381,9 @@ class MongoUtility:
                 self._client.drop_database(database_name)
         except OperationFailure as e:
             raise OperationFailure(f"Failed to delete database: {e}")
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate()
 
     def delete_collection(self, collection_name: str):
         """Deletes a collection in active database in focus
@@ -143,10 +397,12 @@ class MongoUtility:
         try:
             if self._database is not None:
                 self._database.drop_collection(collection_name)
-            if collection_name in self.collections:
-                self.collections.pop(collection_name)
+            if self.collections is not None:
+                self.collections.pop(collection_name, None)
         except OperationFailure as e:
             raise OperationFailure(f"Failed to delete collection: {e}")
+        finally:
+            self._invalidate(collection_name)
 
     def connect(self):
         """Connect to default database
@@ -154,6 +410,14 @@ class MongoUtility:
         Raises:
             ConnectionFailure: if failed to connect to mongodb
         """
+        if self.shared:
+            self._client = MongoClientRegistry.get_client(
+                self.connection_string, self.pool_size, self._uuid_representation
+            )
+            self._pid = os.getpid()
+            self._database = self._client.get_default_database()
+            self.collections = {}
+            return
         try:
             self._client = MongoClient(
                 self.connection_string,
@@ -165,11 +429,23 @@ class MongoUtility:
             raise ConnectionFailure(f"Failed to connect to MongoDB: {e}")
 
     def disconnect(self):
-        """Disconnects from mongo database"""
-        if self._client is not None:
+        """Disconnects from mongo database, a shared client is left open for the other users"""
+        if self._client is not None and not self.shared:
             self._client.close()
-            self._client = None
+        self._client = None
         self._database = None
+        if self.shared:
+            self.collections = {}
+
+    def pool_stats(self) -> dict[str, int]:
+        """Fetches the connection pool counters of the shared client
+
+        Returns:
+            dict[str, int]: pool counters, see PoolStatsListener, empty if not connected or not shared
+        """
+        return MongoClientRegistry.pool_stats().get(
+            redact_connection_string(self.connection_string), {}
+        )
 
     def get_collection(self, collection_name: str):
         """Fetches collection from current active database
@@ -184,6 +460,10 @@ class MongoUtility:
             _type_: _description_
         """
         collection = None
+        if self.shared and (self._database is None or self._is_stale()):
+            self.connect()
+        if self.collections is None:
+            self.collections = {}
         if collection_name not in self.collections.keys():
             try:
                 if self._database is not None:
@@ -195,6 +475,15 @@ class MongoUtility:
             collection = self.collections[collection_name]
         return collection
 
+    def _invalidate(self, collection_name: str):
+        """Drops the cached lookups of a collection this utility just wrote to
+
+        Args:
+            collection_name (str): name of the collection
+        """
+        if self.cache is not None:
+            self.cache.invalidate(collection_name)
+
     def create_collection(self, collection_name: str, **kwargs: Any):
         try:
             if self._database is not None:
@@ -202,6 +491,106 @@ class MongoUtility:
         except CollectionInvalid as e:
             raise CollectionInvalid(f"Error creating collection: {e}")
 
+    def create_indexes(
+        self, collection_name: str, indexes: list[IndexModel], **kwargs: Any
+    ):
+        """Creates the given indexes on a collection of current active database in focus
+
+        Creating an index that already exists with the same keys and options is a no-op on the server,
+        so this is safe to call on every startup.
+
+        Args:
+            collection_name (str): name of the collection
+            indexes (list[IndexModel]): index definitions
+
+        Raises:
+            OperationFailure: if failed to create indexes, ex: an existing index has conflicting options
+
+        Returns:
+            list[str]: names of the indexes
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return collection.create_indexes(indexes, **kwargs)
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to create indexes: {e}")
+
+    def fetch_index_information(self, collection_name: str):
+        """Fetches the indexes present on a collection of current active database in focus
+
+        Args:
+            collection_name (str): name of the collection
+
+        Raises:
+            OperationFailure: if failed to get index information
+
+        Returns:
+            dict[str, Any]: index name mapped to its keys and options
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return collection.index_information()
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to get index information: {e}")
+
+    def explain(
+        self,
+        collection_name: str,
+        filter: dict[str, Any] | None = None,
+        projection: dict[str, Any] | list[str] | None = None,
+        hint: str | list[tuple[str, int]] | None = None,
+        limit: int | None = None,
+        **kwargs: Any,
+    ):
+        """Fetches the query plan the server would use for a find query
+
+        Args:
+            collection_name (str): name of the collection
+            filter (Optional[dict[str, Any]], optional): filter query. Defaults to None.
+            projection (dict[str, Any] | list[str] | None, optional): see read_options. Defaults to None.
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
+            limit (int | None, optional): see read_options. Defaults to None.
+
+        Raises:
+            OperationFailure: if failed to explain query
+
+        Returns:
+            dict[str, Any]: explain output
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return collection.find(
+                filter, **read_options(projection, hint, limit), **kwargs
+            ).explain()
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to explain query: {e}")
+
+    @staticmethod
+    def winning_plan_stages(explain_output: dict[str, Any]) -> list[str]:
+        """Flattens the winning plan of an explain output into its stage names, outermost first
+
+        Ex: MongoUtility.winning_plan_stages(mongo.explain("device_stats", {"device_id": "x"}))
+            => ["FETCH", "IXSCAN"]
+
+        Args:
+            explain_output (dict[str, Any]): output of explain
+
+        Returns:
+            list[str]: stage names
+        """
+        plan = explain_output["queryPlanner"]["winningPlan"]
+        # servers running the slot based engine nest the classic plan under queryPlan
+        plan = plan.get("queryPlan", plan)
+        stages: list[str] = []
+        pending = [plan]
+        while pending:
+            stage = pending.pop(0)
+            stages.append(stage["stage"])
+            if "inputStage" in stage:
+                pending.append(stage["inputStage"])
+            pending.extend(stage.get("inputStages", []))
+        return stages
+
     def fetch_collection_names(self):
         try:
             if self._database is not None:
@@ -242,6 +631,8 @@ class MongoUtility:
             return collection.insert_one(document, **kwargs)
         except OperationFailure as e:
             raise OperationFailure(f"Failed to insert document: {e}")
+        finally:
+            self._invalidate(collection_name)
 
     def insert_many(
         self, collection_name: str, documents: list[dict[str, Any]], **kwargs: Any
@@ -263,11 +654,106 @@ class MongoUtility:
             return collection.insert_many(documents, **kwargs)
         except OperationFailure as e:
             raise OperationFailure(f"Failed to insert documents: {e}")
+        finally:
+            self._invalidate(collection_name)
+
+    def bulk_write(
+        self,
+        collection_name: str,
+        requests: list[Any],
+        ordered: bool = False,
+        **kwargs: Any,
+    ):
+        """Sends a batch of write operations to the given collection in a single round trip
+
+        Args:
+            collection_name (str): name of the collection
+            requests (list[Any]): write operations, ex: InsertOne, UpdateOne, DeleteMany
+            ordered (bool, optional): stop at the first failing operation when True, otherwise the server applies
+                every operation and may parallelise them. Defaults to False.
+
+        Raises:
+            OperationFailure: if failed to write documents
+
+        Returns:
+            BulkWriteResult | None: bulk write result or None when there is nothing to write
+        """
+        if not requests:
+            return None
+        try:
+            collection = self.get_collection(collection_name)
+            return collection.bulk_write(requests, ordered=ordered, **kwargs)
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to bulk write documents: {e}")
+        finally:
+            self._invalidate(collection_name)
+
+    def bulk_writer(
+        self,
+        collection_name: str,
+        ordered: bool = False,
+        max_operations: int = DEFAULT_MAX_BATCH_OPERATIONS,
+        max_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+    ) -> MongoBulkWriter:
+        """Creates a writer accumulating mixed operations and sending them in bounded batches
+
+        Ex: with mongo.bulk_writer("accounts") as writer: writer.delete_one({"user": "x"})
+
+        Args:
+            collection_name (str): name of the collection
+            ordered (bool, optional): stop a batch at its first failing operation. Defaults to False.
+            max_operations (int, optional): operations per batch. Defaults to 1000.
+            max_bytes (int, optional): estimated bytes per batch, 16MB by default.
+
+        Returns:
+            MongoBulkWriter: bulk writer, see MongoBulkWriter
+        """
+        return MongoBulkWriter(
+            self, collection_name, ordered, max_operations, max_bytes
+        )
+
+    def upsert_many(
+        self,
+        collection_name: str,
+        documents: list[dict[str, Any]],
+        key_fields: list[str],
+        on_insert_only: bool = False,
+        ordered: bool = False,
+    ):
+        """Inserts documents which don't exist yet and updates the ones that do, matched on the key fields
+
+        Ex: mongo.upsert_many("device_stats", [{"device_id": "x", "status": "available"}], ["device_id"], on_insert_only=True)
+
+        Args:
+            collection_name (str): name of the collection
+            documents (list[dict[str, Any]]): documents to upsert
+            key_fields (list[str]): fields identifying a document, should be backed by a unique index
+            on_insert_only (bool, optional): leave existing documents untouched and only insert missing ones. Defaults to False.
+            ordered (bool, optional): see bulk_write. Defaults to False.
+
+        Raises:
+            OperationFailure: if failed to upsert documents
+
+        Returns:
+            BulkWriteResult | None: bulk write result or None when there is nothing to write
+        """
+        operator = "$setOnInsert" if on_insert_only else "$set"
+        requests = [
+            UpdateOne(
+                {field: document[field] for field in key_fields},
+                {operator: document},
+                upsert=True,
+            )
+            for document in documents
+        ]
+        return self.bulk_write(collection_name, requests, ordered=ordered)
 
     def find_one(
         self,
         collection_name: str,
         filter: dict[str, Any] | None = None,
+        projection: dict[str, Any] | list[str] | None = None,
+        hint: str | list[tuple[str, int]] | None = None,
         **kwargs: Any,
     ):
         """Fetches a document with respect to filter query provided
@@ -275,6 +761,8 @@ class MongoUtility:
         Args:
             collection_name (str): name of the collection
             filter (Optional[dict[str, Any]], optional): filter query. Defaults to None.
+            projection (dict[str, Any] | list[str] | None, optional): see read_options. Defaults to None.
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
 
         Raises:
             OperationFailure: if failed to find a document
@@ -284,7 +772,18 @@ class MongoUtility:
         """
         try:
             collection = self.get_collection(collection_name)
-            return collection.find_one(filter, **kwargs)
+
+            def load():
+                return collection.find_one(
+                    filter, **read_options(projection, hint), **kwargs
+                )
+
+            # lookups with extra options, ex: sort or session, bypass the cache
+            if self.cache is None or hint is not None or kwargs:
+                return load()
+            return self.cache.get_or_load(
+                self.cache.key(collection_name, filter, projection), load
+            )
         except OperationFailure as e:
             raise OperationFailure(f"Failed to find document: {e}")
 
@@ -293,6 +792,8 @@ class MongoUtility:
         collection_name: str,
         filter: dict[str, Any],
         replacement: dict[str, Any],
+        projection: dict[str, Any] | list[str] | None = None,
+        hint: str | list[tuple[str, int]] | None = None,
         **kwargs: Any,
     ):
         """Fetches a document with respect to filter query provided and replaces it with replacement document
@@ -301,21 +802,67 @@ class MongoUtility:
             collection_name (str): name of the collection
             filter (dict[str, Any]): filter query
             replacement (dict[str, Any]): replacement document
+            projection (dict[str, Any] | list[str] | None, optional): see read_options. Defaults to None.
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
 
         Raises:
             OperationFailure: if failed to find and replace document
+
+        Returns:
+            _DocumentType | None: matched document or None if nothing matched
         """
         try:
-            self.get_collection(collection_name).find_one_and_replace(
-                filter, replacement, kwargs
+            return self.get_collection(collection_name).find_one_and_replace(
+                filter, replacement, **read_options(projection, hint), **kwargs
             )
         except OperationFailure as e:
             raise OperationFailure(f"Failed to find and replace document: {e}")
+        finally:
+            self._invalidate(collection_name)
+
+    def find_one_and_update(
+        self,
+        collection_name: str,
+        filter: dict[str, Any],
+        update: dict[str, Any],
+        projection: dict[str, Any] | list[str] | None = None,
+        hint: str | list[tuple[str, int]] | None = None,
+        **kwargs: Any,
+    ):
+        """Atomically fetches a document with respect to filter query provided and applies the update to it
+
+        Args:
+            collection_name (str): name of the collection
+            filter (dict[str, Any]): filter query
+            update (dict[str, Any]): update data
+            projection (dict[str, Any] | list[str] | None, optional): see read_options. Defaults to None.
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
+
+        Raises:
+            OperationFailure: if failed to find and update document
+
+        Returns:
+            _DocumentType | None: matched document (before or after the update depending on return_document) or None if nothing matched
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            return collection.find_one_and_update(
+                filter, update, **read_options(projection, hint), **kwargs
+            )
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to find and update document: {e}")
+        finally:
+            self._invalidate(collection_name)
 
     def find_many(
         self,
         collection_name: str,
         filter: dict[str, Any] | None = None,
+        lazy: bool = False,
+        projection: dict[str, Any] | list[str] | None = None,
+        hint: str | list[tuple[str, int]] | None = None,
+        limit: int | None = None,
+        batch_size: int | None = None,
         **kwargs: Any,
     ):
         """Fetches list of documents with respect to filter query provided
@@ -323,20 +870,155 @@ class MongoUtility:
         Args:
             collection_name (str): name of the collection
             filter (Optional[dict[str, Any]], optional): filter query. Defaults to None.
+            lazy (bool, optional): return the cursor instead of a list, documents are then fetched batch by batch while iterating. Defaults to False.
+            projection (dict[str, Any] | list[str] | None, optional): see read_options. Defaults to None.
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
+            limit (int | None, optional): see read_options. Defaults to None.
+            batch_size (int | None, optional): see read_options. Defaults to None.
 
         Raises:
             OperationFailure: if failed to find documents
 
         Returns:
-            list[Cursor[_DocumentType]]: list of matching documents
+            list[_DocumentType] | Cursor[_DocumentType]: list of matching documents, or the cursor when lazy
         """
         try:
             collection = self.get_collection(collection_name)
-            cursor = collection.find(filter, **kwargs)
+            cursor = collection.find(
+                filter, **read_options(projection, hint, limit, batch_size), **kwargs
+            )
+            if lazy:
+                return cursor
             return [doc for doc in cursor]
         except OperationFailure as e:
             raise OperationFailure(f"Failed to find documents: {e}")
 
+    def count_documents(
+        self,
+        collection_name: str,
+        filter: dict[str, Any] | None = None,
+        limit: int | None = None,
+        **kwargs: Any,
+    ) -> int:
+        """Counts the documents matching the filter query, without fetching them
+
+        Args:
+            collection_name (str): name of the collection
+            filter (Optional[dict[str, Any]], optional): filter query. Defaults to None.
+            limit (int | None, optional): stop counting after this many documents. Defaults to None.
+
+        Raises:
+            OperationFailure: if failed to count documents
+
+        Returns:
+            int: number of matching documents, at most limit
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if limit is not None:
+                kwargs["limit"] = limit
+            return cast(int, collection.count_documents(filter or {}, **kwargs))
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to count documents: {e}")
+
+    def iter_many(
+        self,
+        collection_name: str,
+        filter: dict[str, Any] | None = None,
+        projection: dict[str, Any] | list[str] | None = None,
+        sort: list[tuple[str, int]] | None = None,
+        batch_size: int = 1000,
+        hint: str | list[tuple[str, int]] | None = None,
+        limit: int | None = None,
+        **kwargs: Any,
+    ) -> Iterator[dict[str, Any]]:
+        """Streams documents with respect to filter query provided, holding one batch in memory at a time
+
+        Ex: for session in mongo.iter_many("device_sessions", {"device_id": "x"}, ["start_time"], [("start_time", 1)]):
+
+        Args:
+            collection_name (str): name of the collection
+            filter (Optional[dict[str, Any]], optional): filter query. Defaults to None.
+            projection (dict[str, Any] | list[str] | None, optional): fields to return. Defaults to None, i.e. whole documents.
+            sort (list[tuple[str, int]] | None, optional): sort keys and directions. Defaults to None.
+            batch_size (int, optional): documents fetched per round trip. Defaults to 1000.
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
+            limit (int | None, optional): see read_options. Defaults to None.
+
+        Raises:
+            OperationFailure: if failed to find documents
+
+        Yields:
+            Iterator[dict[str, Any]]: matching documents
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            cursor = collection.find(
+                filter,
+                sort=sort,
+                **read_options(projection, hint, limit, batch_size),
+                **kwargs,
+            )
+            with cursor:
+                yield from cursor
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to find documents: {e}")
+
+    def aggregate(
+        self,
+        collection_name: str,
+        pipeline: list[dict[str, Any]],
+        hint: str | list[tuple[str, int]] | None = None,
+        batch_size: int | None = None,
+        **kwargs: Any,
+    ):
+        """Runs an aggregation pipeline on the server, project early in the pipeline to keep documents small
+
+        Args:
+            collection_name (str): name of the collection
+            pipeline (list[dict[str, Any]]): aggregation stages
+            hint (str | list[tuple[str, int]] | None, optional): see read_options. Defaults to None.
+            batch_size (int | None, optional): see read_options. Defaults to None.
+
+        Raises:
+            OperationFailure: if failed to run the aggregation
+
+        Returns:
+            list[_DocumentType]: resulting documents, empty when the pipeline ends with $merge/$out
+        """
+        try:
+            collection = self.get_collection(collection_name)
+            if hint is not None:
+                kwargs["hint"] = hint
+            if batch_size is not None:
+                kwargs["batchSize"] = batch_size
+            return [doc for doc in collection.aggregate(pipeline, **kwargs)]
+        except OperationFailure as e:
+            raise OperationFailure(f"Failed to aggregate documents: {e}")
+        finally:
+            output_collection = self._pipeline_output(pipeline)
+            if output_collection is not None:
+                self._invalidate(output_collection)
+
+    @staticmethod
+    def _pipeline_output(pipeline: list[dict[str, Any]]) -> str | None:
+        """Fetches the collection a pipeline writes to through a final $merge or $out stage
+
+        Args:
+            pipeline (list[dict[str, Any]]): aggregation stages
+
+        Returns:
+            str | None: output collection name, None if the pipeline writes nothing
+        """
+        if not pipeline:
+            return None
+        output = pipeline[-1].get("$merge", pipeline[-1].get("$out"))
+        if isinstance(output, dict):
+            output = output.get("into", output)
+        if isinstance(output, dict):
+            output = output.get("coll")
+        return output if isinstance(output, str) else None
+
     def update_one(
         self,
         collection_name: str,
@@ -362,12 +1044,14 @@ class MongoUtility:
             return collection.update_one(filter, update, **kwargs)
         except OperationFailure as e:
             raise OperationFailure(f"Failed to update document: {e}")
+        finally:
+            self._invalidate(collection_name)
 
     def update_many(
         self,
         collection_name: str,
         filter: dict[str, Any],
-        update: dict[str, Any],
+        update: dict[str, Any] | list[dict[str, Any]],
         **kwargs: Any,
     ):
         """Updates one or more filtered documents from a collection
@@ -375,7 +1059,7 @@ class MongoUtility:
         Args:
             collection_name (str): name of the collection
             filter (dict[str, Any]): filter query
-            update (dict[str, Any]): update data
+            update (dict[str, Any] | list[dict[str, Any]]): update data or an aggregation pipeline update
 
         Raises:
             OperationFailure: if failed to update documents
@@ -388,6 +1072,8 @@ class MongoUtility:
             return collection.update_many(filter, update, **kwargs)
         except OperationFailure as e:
             raise OperationFailure(f"Failed to update documents: {e}")
+        finally:
+            self._invalidate(collection_name)
 
     def delete_one(self, collection_name: str, filter: dict[str, Any]):
         try:
@@ -395,6 +1081,8 @@ class MongoUtility:
             collection.delete_one(filter)
         except OperationFailure as e:
             raise OperationFailure(f"Failed to delete document: {e}")
+        finally:
+            self._invalidate(collection_name)
 
     def delete_many(self, collection_name: str, filter: dict[str, Any]):
         """Deletes one or more filtered documents from a collection
@@ -411,3 +1099,5 @@ class MongoUtility:
             collection.delete_many(filter)
         except OperationFailure as e:
             raise OperationFailure(f"Failed to delete documents: {e}")
+        finally:
+            self._invalidate(collection_name)
@@ -1,18 +1,198 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Iterable, Iterator, cast
+from uuid import uuid4
+
 import psycopg
-from typing import Any
+from psycopg import sql
+from psycopg.conninfo import conninfo_to_dict
+from psycopg_pool import ConnectionPool
+
+# bytes read from a CSV file per COPY message
+COPY_CHUNK_BYTES = 64 * 1024
+# a query run this many times on a connection is prepared on the server, psycopg's default
+DEFAULT_PREPARE_THRESHOLD = 5
+
+
+def pool_name(connection_string: str) -> str:
+    """
+    Build a readable pool name out of a connection string, leaving the password out.
+
+    Args:
+        connection_string (str): PostgreSQL connection string, URL or key=value format
+
+    Returns:
+        str: ex: "tester@localhost:5432/uaf"
+    """
+    try:
+        params = conninfo_to_dict(connection_string)
+    except psycopg.ProgrammingError:
+        return "postgres"
+    return (
+        f"{params.get('user', '')}@{params.get('host', 'localhost')}"
+        f":{params.get('port', 5432)}/{params.get('dbname', '')}"
+    )
+
+
+class PostgresPoolRegistry:
+    """
+    Process wide registry of PostgreSQL connection pools, one per connection string and
+    prepare threshold.
+
+    Pooled PostgresUtility instances pointing at the same database share a pool instead of
+    opening and closing a connection per test. A pool must not cross a fork: the registry
+    forgets the parent's pools in a forked child, ex: a celery prefork or xdist worker, and
+    the child lazily opens its own.
+    """
+
+    _lock = threading.Lock()
+    _pools: dict[tuple[str, int | None], ConnectionPool] = {}
+    _pid = os.getpid()
+
+    @classmethod
+    def get_pool(
+        cls,
+        connection_string: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_idle: float = 600.0,
+        timeout: float = 30.0,
+        prepare_threshold: int | None = DEFAULT_PREPARE_THRESHOLD,
+    ) -> ConnectionPool:
+        """
+        Fetch the pool of a connection string, opening it on first use in this process.
+        Only the first caller's sizing is used, callers asking for another prepare_threshold
+        get a pool of their own as it is set on the pooled connections.
+
+        Args:
+            connection_string (str): PostgreSQL connection string
+            min_size (int): Connections kept open even when idle.
+            max_size (int): Max connections open at the same time.
+            max_idle (float): Seconds an idle connection above min_size is kept open.
+            timeout (float): Seconds a checkout waits for a free connection before failing.
+            prepare_threshold (Optional[int]): See PostgresUtility.
+
+        Returns:
+            ConnectionPool: The pool shared by the process.
+        """
+        with cls._lock:
+            if cls._pid != os.getpid():
+                cls._forget()
+            key = (connection_string, prepare_threshold)
+            if key not in cls._pools:
+                name = pool_name(connection_string)
+                if prepare_threshold != DEFAULT_PREPARE_THRESHOLD:
+                    name = f"{name} prepare_threshold={prepare_threshold}"
+                cls._pools[key] = ConnectionPool(
+                    connection_string,
+                    min_size=min_size,
+                    max_size=max_size,
+                    max_idle=max_idle,
+                    timeout=timeout,
+                    kwargs={
+                        "autocommit": True,
+                        "prepare_threshold": prepare_threshold,
+                    },
+                    # a connection broken while idle is replaced instead of being handed out
+                    check=ConnectionPool.check_connection,
+                    name=name,
+                    open=True,
+                )
+            return cls._pools[key]
+
+    @classmethod
+    def _forget(cls):
+        """
+        Drop the pools inherited from a parent process without closing them, their
+        connections and worker threads belong to the parent.
+        """
+        cls._pools = {}
+        cls._pid = os.getpid()
+
+    @classmethod
+    def reset(cls):
+        """
+        Forget every pool, to be called right after a fork.
+        """
+        with cls._lock:
+            cls._forget()
+
+    @classmethod
+    def _after_fork_in_child(cls):
+        # the lock may have been held by another thread of the parent at fork time
+        cls._lock = threading.Lock()
+        cls._forget()
+
+    @classmethod
+    def close_all(cls):
+        """
+        Close every pool of this process, ex: at the end of the test session.
+        """
+        with cls._lock:
+            pools, cls._pools = cls._pools, {}
+        for pool in pools.values():
+            pool.close()
+
+    @classmethod
+    def pool_stats(cls) -> dict[str, dict[str, int]]:
+        """
+        Fetch the usage and wait metrics of every pool of this process.
+
+        Returns:
+            dict[str, dict[str, int]]: Pool name, see pool_name => psycopg_pool stats, ex: pool_size,
+                pool_available, requests_num, requests_waiting, requests_wait_ms, usage_ms.
+        """
+        with cls._lock:
+            if cls._pid != os.getpid():
+                return {}
+            return {pool.name: pool.get_stats() for pool in cls._pools.values()}
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=PostgresPoolRegistry._after_fork_in_child)
 
 
 class PostgresUtility:
-    def __init__(self, connection_string: str):
+    def __init__(
+        self,
+        connection_string: str,
+        pooled: bool = False,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_idle: float = 600.0,
+        pool_timeout: float = 30.0,
+        prepare_threshold: int | None = DEFAULT_PREPARE_THRESHOLD,
+    ):
         """
         Constructor for PostgresUtility class.
 
         Args:
             connection_string (str): PostgreSQL connection string
+            pooled (bool): Borrow a connection per call from the process wide pool of
+                PostgresPoolRegistry instead of opening a dedicated connection.
+            min_size (int): Pooled mode, connections kept open even when idle.
+            max_size (int): Pooled mode, max connections open at the same time.
+            max_idle (float): Pooled mode, seconds an idle connection above min_size is kept open.
+            pool_timeout (float): Pooled mode, seconds a call waits for a free connection.
+            prepare_threshold (Optional[int]): Executions of the same query on a connection after
+                which it is prepared on the server, so later runs skip parsing and planning.
+                0 prepares every query, None never does.
         """
         self.connection_string = connection_string
-        self.conn = psycopg.connect(connection_string)
-        self.conn.autocommit = True
+        self.pooled = pooled
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.pool_timeout = pool_timeout
+        self.prepare_threshold = prepare_threshold
+        self.conn: psycopg.Connection | None = None
+        self._pool: ConnectionPool | None = None
+        self._pid: int | None = None
+        if not pooled:
+            self.conn = psycopg.connect(connection_string)
+            self.conn.autocommit = True
+            self.conn.prepare_threshold = self.prepare_threshold
 
     def __enter__(self) -> "PostgresUtility":
         """
@@ -29,19 +209,73 @@ class PostgresUtility:
 
     def connect(self):
         """
-        Reconnect to PostgreSQL if the connection is closed.
+        Reconnect to PostgreSQL if the connection is closed, or fetch the shared pool in pooled mode.
         """
-        if self.conn.closed:
+        if self.pooled:
+            self._fetch_pool()
+            return
+        if self.conn is None or self.conn.closed:
             self.conn = psycopg.connect(self.connection_string)
             self.conn.autocommit = True
+            self.conn.prepare_threshold = self.prepare_threshold
+
+    def _fetch_pool(self) -> ConnectionPool:
+        """
+        Fetch the shared pool of this process from PostgresPoolRegistry.
+
+        Returns:
+            ConnectionPool: The pool, also kept on the instance.
+        """
+        self._pool = PostgresPoolRegistry.get_pool(
+            self.connection_string,
+            self.min_size,
+            self.max_size,
+            self.max_idle,
+            self.pool_timeout,
+            self.prepare_threshold,
+        )
+        self._pid = os.getpid()
+        return self._pool
 
     def disconnect(self):
         """
-        Close the connection to PostgreSQL.
+        Close the connection to PostgreSQL, a shared pool is left open for the other users.
         """
-        if self.conn:
+        if self.pooled:
+            self._pool = None
+        elif self.conn:
             self.conn.close()
 
+    @contextmanager
+    def connection(self) -> Iterator[psycopg.Connection]:
+        """
+        Provide the connection to run queries on, borrowed from the pool in pooled mode.
+
+        Yields:
+            psycopg.Connection: The dedicated connection, or a pooled one returned on exit.
+        """
+        if not self.pooled:
+            if self.conn is None:
+                raise psycopg.InterfaceError("the connection is not open!!")
+            yield self.conn
+            return
+        pool = self._pool
+        if pool is None or self._pid != os.getpid():
+            pool = self._fetch_pool()
+        with pool.connection() as conn:
+            yield conn
+
+    def pool_stats(self) -> dict[str, int]:
+        """
+        Fetch the usage and wait metrics of the shared pool.
+
+        Returns:
+            dict[str, int]: psycopg_pool stats, empty if not pooled or not connected yet.
+        """
+        if self._pool is None:
+            return {}
+        return cast(dict[str, int], self._pool.get_stats())
+
     def ping(self) -> tuple[Any, ...] | None:
         """
         Ping the database to ensure connection is live.
@@ -49,7 +283,7 @@ class PostgresUtility:
         Returns:
             Optional[tuple[Any, ...]]: The result of the ping query or None if no rows are returned.
         """
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             cursor.execute("SELECT 1")
             result = cursor.fetchone()
             if result is not None:
@@ -64,7 +298,7 @@ class PostgresUtility:
             query (str): The SQL query to execute.
             params (Optional[tuple[Any, ...]]): Parameters for the query.
         """
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             cursor.execute(query, params)
 
     def fetch_one(
@@ -80,7 +314,10 @@ class PostgresUtility:
         Returns:
             Optional[dict[str, Any]]: A single row as a dictionary or None if no rows are found.
         """
-        with self.conn.cursor(row_factory=psycopg.rows.dict_row) as cursor:
+        with (
+            self.connection() as conn,
+            conn.cursor(row_factory=psycopg.rows.dict_row) as cursor,
+        ):
             cursor.execute(query, params)
             result = cursor.fetchone()
             return result if result is not None else None
@@ -98,11 +335,98 @@ class PostgresUtility:
         Returns:
             list[dict[str, Any]]: A list of rows as dictionaries.
         """
-        with self.conn.cursor(row_factory=psycopg.rows.dict_row) as cursor:
+        with (
+            self.connection() as conn,
+            conn.cursor(row_factory=psycopg.rows.dict_row) as cursor,
+        ):
             cursor.execute(query, params)
             results = cursor.fetchall()
             return results if results is not None else []
 
+    def iter_rows(
+        self,
+        query: str,
+        params: tuple[Any, ...] | None = None,
+        itersize: int = 2000,
+        as_tuples: bool = False,
+    ) -> Iterator[dict[str, Any]] | Iterator[tuple[Any, ...]]:
+        """
+        Stream the rows of a query through a named server-side cursor, in constant memory.
+
+        Unlike fetch_many, the result set stays on the server and is fetched itersize rows per
+        round trip. The cursor lives in a transaction which ends once the iterator is exhausted
+        or closed, queries run on the same utility meanwhile are part of that transaction.
+
+        Args:
+            query (str): The SQL SELECT query.
+            params (Optional[tuple[Any, ...]]): Parameters for the query.
+            itersize (int): Rows fetched per round trip.
+            as_tuples (bool): Yield tuples instead of dictionaries, cheaper for large scans.
+
+        Yields:
+            Iterator[dict[str, Any]] | Iterator[tuple[Any, ...]]: Rows as dictionaries, or tuples.
+        """
+        row_factory = psycopg.rows.tuple_row if as_tuples else psycopg.rows.dict_row
+        with self.connection() as conn, conn.transaction():
+            with conn.cursor(
+                name=f"uaf_iter_rows_{uuid4().hex}", row_factory=row_factory
+            ) as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, params)
+                yield from cursor
+
+    def execute_pipeline(
+        self, statements: Iterable[tuple[str, tuple[Any, ...] | None]]
+    ) -> list[list[dict[str, Any]] | None]:
+        """
+        Run a batch of independent statements in pipeline mode, i.e. in a single round trip
+        instead of one per statement.
+
+        Statements run in order on the same connection. If one fails, the following ones
+        are skipped and the error is raised once the batch is over.
+
+        Args:
+            statements (Iterable[tuple[str, Optional[tuple[Any, ...]]]]): (query, params) pairs.
+
+        Returns:
+            list[Optional[list[dict[str, Any]]]]: Per statement, its rows as dictionaries,
+                or None if it returns no rows (INSERT, UPDATE, DELETE...).
+        """
+        with self.connection() as conn:
+            cursors = []
+            try:
+                with conn.pipeline():
+                    for query, params in statements:
+                        cursor = conn.cursor(row_factory=psycopg.rows.dict_row)
+                        cursors.append(cursor)
+                        cursor.execute(query, params)
+                return [
+                    cursor.fetchall() if cursor.description is not None else None
+                    for cursor in cursors
+                ]
+            finally:
+                for cursor in cursors:
+                    cursor.close()
+
+    def fetch_one_pipelined(
+        self, query: str, params_list: Iterable[tuple[Any, ...]]
+    ) -> list[dict[str, Any] | None]:
+        """
+        Run the same query with every set of parameters in a single round trip, ex: to
+        assert hundreds of rows instead of calling fetch_one in a loop.
+
+        Args:
+            query (str): The SQL SELECT query.
+            params_list (Iterable[tuple[Any, ...]]): Parameters of every run.
+
+        Returns:
+            list[Optional[dict[str, Any]]]: Per run, the first row as a dictionary or None if no rows are found.
+        """
+        return [
+            rows[0] if rows else None
+            for rows in self.execute_pipeline((query, params) for params in params_list)
+        ]
+
     def modify(self, query: str, params: tuple[Any, ...] | None = None) -> None:
         """
         Generalized method to perform INSERT, UPDATE, or DELETE operations.
@@ -121,5 +445,147 @@ class PostgresUtility:
             query (str): The SQL query to execute.
             params_list (list[tuple[Any, ...]]): List of parameter tuples for the query.
         """
-        with self.conn.cursor() as cursor:
+        with self.connection() as conn, conn.cursor() as cursor:
             cursor.executemany(query, params_list)
+
+    @staticmethod
+    def _copy_source(table_or_query: str) -> sql.Composable:
+        """
+        Build the source of a COPY ... TO STDOUT, a table name or a query.
+
+        Args:
+            table_or_query (str): Table name, optionally schema qualified, or a SELECT/WITH query.
+
+        Returns:
+            sql.Composable: Quoted table name or parenthesized query.
+        """
+        statement = table_or_query.strip()
+        if statement.split(None, 1)[0].lower() in ("select", "with", "values", "table"):
+            return sql.SQL("({})").format(sql.SQL(statement))
+        return sql.Identifier(*statement.split("."))
+
+    def copy_in(
+        self,
+        table: str,
+        source: Iterable[tuple[Any, ...]] | str | os.PathLike[str],
+        columns: list[str] | None = None,
+        header: bool = True,
+    ) -> int:
+        """
+        Bulk load rows with COPY FROM STDIN, much faster than modify_many for thousands of rows.
+
+        Rows are streamed to the server as they are produced, so a generator is never fully
+        held in memory.
+
+        Args:
+            table (str): Table name, optionally schema qualified, ex: "public.users".
+            source (Iterable[tuple[Any, ...]] | str | os.PathLike[str]): Rows (list, generator...)
+                adapted like query parameters, or the path of a CSV file sent as is.
+            columns (Optional[list[str]]): Columns the values map to, all columns in table order if None.
+            header (bool): CSV file only, whether its first line holds column names to skip.
+
+        Returns:
+            int: Number of rows loaded.
+        """
+        statement = sql.SQL("COPY {table}{columns} FROM STDIN{options}").format(
+            table=sql.Identifier(*table.split(".")),
+            columns=(
+                sql.SQL(" ({})").format(
+                    sql.SQL(", ").join(map(sql.Identifier, columns))
+                )
+                if columns
+                else sql.SQL("")
+            ),
+            options=(
+                sql.SQL(" (FORMAT CSV, HEADER {})").format(
+                    sql.SQL("TRUE" if header else "FALSE")
+                )
+                if isinstance(source, (str, os.PathLike))
+                else sql.SQL("")
+            ),
+        )
+        with self.connection() as conn, conn.cursor() as cursor:
+            with cursor.copy(statement) as copy:
+                if isinstance(source, (str, os.PathLike)):
+                    with open(source, "rb") as csv_file:
+                        while data := csv_file.read(COPY_CHUNK_BYTES):
+                            copy.write(data)
+                else:
+                    for row in source:
+                        copy.write_row(row)
+            return cast(int, cursor.rowcount)
+
+    def copy_out(
+        self,
+        table_or_query: str,
+        destination: str | os.PathLike[str] | BinaryIO | None = None,
+        params: tuple[Any, ...] | None = None,
+        header: bool = True,
+    ) -> int | Iterator[bytes]:
+        """
+        Export a table or query result as CSV with COPY TO STDOUT, ex: to snapshot test data.
+
+        Args:
+            table_or_query (str): Table name, optionally schema qualified, or a SELECT/WITH query.
+            destination (str | os.PathLike[str] | BinaryIO | None): CSV file path or binary file
+                object to write to. If None, the CSV is returned as an iterator of chunks.
+            params (Optional[tuple[Any, ...]]): Parameters for the query.
+            header (bool): Whether to write the column names as first line.
+
+        Returns:
+            int | Iterator[bytes]: Number of bytes written, or the CSV chunks if no destination
+                is given. The iterator holds a connection until it is exhausted or closed.
+        """
+        statement = sql.SQL(
+            "COPY {source} TO STDOUT (FORMAT CSV, HEADER {header})"
+        ).format(
+            source=self._copy_source(table_or_query),
+            header=sql.SQL("TRUE" if header else "FALSE"),
+        )
+        if destination is None:
+            return self._iter_copy_out(statement, params)
+        if isinstance(destination, (str, os.PathLike)):
+            with open(destination, "wb") as csv_file:
+                return self._write_copy_out(statement, params, csv_file)
+        return self._write_copy_out(statement, params, destination)
+
+    def _iter_copy_out(
+        self, statement: sql.Composable, params: tuple[Any, ...] | None
+    ) -> Iterator[bytes]:
+        """
+        Stream the output of a COPY TO STDOUT statement.
+
+        Args:
+            statement (sql.Composable): COPY statement.
+            params (Optional[tuple[Any, ...]]): Parameters for the statement.
+
+        Yields:
+            Iterator[bytes]: Chunks of the output as they come from the server.
+        """
+        with self.connection() as conn, conn.cursor() as cursor:
+            with cursor.copy(statement, params) as copy:
+                for data in copy:
+                    yield bytes(data)
+
+    def _write_copy_out(
+        self,
+        statement: sql.Composable,
+        params: tuple[Any, ...] | None,
+        destination: BinaryIO,
+    ) -> int:
+        """
+        Write the output of a COPY TO STDOUT statement to a binary file object.
+
+        Args:
+            statement (sql.Composable): COPY statement.
+            params (Optional[tuple[Any, ...]]): Parameters for the statement.
+            destination (BinaryIO): File object to write to.
+
+        Returns:
+            int: Number of bytes written.
+        """
+        written = 0
+        for data in self._iter_copy_out(statement, params):
+            destination.write(data)
+            written += len(data)
+        return written
@@ -1,7 +1,11 @@
 import os
+from typing import Any
+
 import yaml  # type: ignore
 from uaf.enums.file_paths import FilePaths
 
+_MISSING: Any = object()
+
 
 class YamlParser:
     """Utility class for parsing yaml documents"""
@@ -38,21 +42,24 @@ class YamlParser:
         else:
             raise ValueError(f"Selected {section} section is invalid/doesn't exist!")
 
-    def get_value(self, section, key):
+    def get_value(self, section, key, default=_MISSING):
         """Fetches specified key value from a specified section
 
         Args:
             section (str): name of the section
             key (str): name of the key
+            default (Any, optional): value returned when the section-key pair doesn't exist. Raises if not provided.
 
         Raises:
-            ValueError: if section-key pair is invalid/doesn't exist
+            ValueError: if section-key pair is invalid/doesn't exist and no default is provided
 
         Returns:
             Any: value
         """
         if section in self.config and key in self.config[section]:
             return self.config[section][key]
+        elif default is not _MISSING:
+            return default
         else:
             raise ValueError(
                 f"Selected {section}-{key} section-key pair is invalid/doesn't exist!"
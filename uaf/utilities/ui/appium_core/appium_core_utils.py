@@ -1,6 +1,7 @@
 import socket
 import time
 import requests
+from typing import Any, cast
 from . import (
     FakerUtils,
     FilePaths,
@@ -340,3 +341,58 @@ class CoreUtils:
                 ]
             case _:
                 raise TypeError("Supports only physical and simulator type!!")
+
+    @staticmethod
+    def fetch_android_device_attributes(device_id: str) -> dict[str, Any]:
+        """Fetch os version, screen size and installed apps of a connected android device
+
+        Args:
+            device_id (str): adb serial of the device
+
+        Returns:
+            dict[str, Any]: os_version, screen_size and installed_apps ([{"package": ..., "version": ...}])
+        """
+
+        def adb_shell(*command: str) -> str:
+            return cast(
+                str,
+                CoreUtils.execute_commands(["adb", "-s", device_id, "shell", *command]),
+            )
+
+        os_version = adb_shell("getprop", "ro.build.version.release").strip()
+        # "Physical size: 1080x2400" optionally followed by "Override size: ..."
+        screen_size = adb_shell("wm", "size").splitlines()[0].split(":")[-1].strip()
+        installed_apps = []
+        for line in adb_shell("pm", "list", "packages", "--show-versioncode").split():
+            if line.startswith("package:"):
+                installed_apps.append({"package": line[len("package:") :]})
+            elif line.startswith("versionCode:") and installed_apps:
+                installed_apps[-1]["version"] = line[len("versionCode:") :]
+        return {
+            "os_version": os_version,
+            "screen_size": screen_size,
+            "installed_apps": installed_apps,
+        }
+
+    @staticmethod
+    def fetch_ios_device_attributes(device_id: str) -> dict[str, Any]:
+        """Fetch os version and installed apps of a connected ios device
+
+        Args:
+            device_id (str): udid of the device
+
+        Returns:
+            dict[str, Any]: os_version and installed_apps ([{"package": ..., "version": ...}])
+        """
+        os_version = CoreUtils.execute_commands(
+            ["ideviceinfo", "-u", device_id, "-k", "ProductVersion"]
+        ).strip()
+        # first line is the "CFBundleIdentifier, CFBundleVersion, CFBundleDisplayName" header
+        installed_apps = []
+        for line in CoreUtils.execute_commands(
+            ["ideviceinstaller", "-u", device_id, "-l"]
+        ).splitlines()[1:]:
+            fields = [field.strip().strip('"') for field in line.split(",")]
+            if len(fields) >= 2 and fields[0]:
+                installed_apps.append({"package": fields[0], "version": fields[1]})
+        return {"os_version": os_version, "installed_apps": installed_apps}